@@ -2,7 +2,6 @@ import os
 from datetime import timedelta
 from flask import Flask, redirect, url_for, session  # Add session import
 from app import create_app
-from app.certificate import certificate_bp
 from jinja2 import ChoiceLoader, FileSystemLoader
 
 app = create_app()
@@ -20,10 +19,6 @@ app.jinja_loader = ChoiceLoader([
     app.jinja_loader
 ])
 
-# Register certificate blueprint only if not already added
-if 'certificate' not in app.blueprints:
-    app.register_blueprint(certificate_bp)
-
 # Register main routes blueprint (not registered in create_app)
 try:
     from app.main import main_bp
@@ -33,44 +28,6 @@ try:
 except ImportError as e:
     print(f"Failed to import main blueprint: {e}")
 
-# Register auth blueprint only if not already registered
-try:
-    from app.auth import auth_bp
-    if 'auth' not in app.blueprints:
-        app.register_blueprint(auth_bp)
-        print("Auth blueprint registered successfully")
-    else:
-        print("Auth blueprint already registered (skipped)")
-except ImportError as e:
-    print(f"Failed to import auth blueprint: {e}")
-
-# Register staff API blueprint (for /staff/api endpoints)
-try:
-    from app.staff.api import staff_api_bp, staff_bp
-    if 'staff_api' not in app.blueprints:
-        app.register_blueprint(staff_api_bp)
-        print("Staff API blueprint registered successfully")
-    else:
-        print("Staff API blueprint already registered (skipped)")
-    if 'staff' not in app.blueprints:
-        app.register_blueprint(staff_bp)
-        print("Staff blueprint registered successfully")
-    else:
-        print("Staff blueprint already registered (skipped)")
-except ImportError as e:
-    print(f"Failed to import staff blueprint: {e}")
-
-# Register finance blueprint only if not already registered
-try:
-    from app.finance import finance_bp
-    if 'finance' not in app.blueprints:
-        app.register_blueprint(finance_bp)
-        print("Finance blueprint registered successfully")
-    else:
-        print("Finance blueprint already registered (skipped)")
-except ImportError as e:
-    print(f"Failed to import finance blueprint: {e}")
-
 # --- Proxy endpoints to support /finance/api/* paths if blueprint uses a different prefix ---
 try:
     # import the view functions from finance API
@@ -125,17 +82,6 @@ except Exception as _e:
     print(f"❌ [ERROR] Failed to register finance API proxies: {_e}")
     # if finance.api isn't available yet, skip proxy registration
 
-# Register standalone api handlers in the project root (e.g. api/check_expenses.py)
-try:
-    from api.check_expenses import bp_expenses
-    if 'check_expenses_api' not in app.blueprints:
-        app.register_blueprint(bp_expenses)
-        print("check_expenses blueprint registered successfully")
-    else:
-        print("check_expenses blueprint already registered (skipped)")
-except ImportError as e:
-    print(f"api.check_expenses not found or failed to import: {e}")
-
 try:
     from app.finance.api import get_loan
     from flask import request
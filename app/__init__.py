@@ -12,6 +12,9 @@ def create_app():
     templates_dir = os.path.join(root_dir, 'templates')
     app = Flask(__name__, static_folder=static_dir, static_url_path='/static', template_folder=templates_dir)
     app.config.from_object(Config)
+    # Token-only endpoints (validate-token, session-events) skip the cookie session
+    from .auth.session import SelectiveSessionInterface
+    app.session_interface = SelectiveSessionInterface()
 
     # Register blueprints
     from .auth import auth_bp
@@ -56,6 +59,19 @@ def create_app():
     if bp_expenses is not None:
         app.register_blueprint(bp_expenses)
 
+    # Request timing: Server-Timing header, Supabase/SMTP/PDF attribution, query budget
+    from . import instrumentation
+    instrumentation.init_app(app)
+    # Prometheus /metrics (after instrumentation so request stats are still on g)
+    from . import metrics
+    metrics.init_app(app)
+    # /media/... image proxy + `media` template filter
+    from . import media_cache
+    media_cache.init_app(app)
+    # Background notification emails (drained on worker exit)
+    from .notification import outbox
+    outbox.init_app(app)
+
     # Register CLI commands and init login manager for manager blueprint
     try:
         register_cli(app)
@@ -104,4 +120,12 @@ def list_routes(app):
 # In your app.py, after creating the app:
 # from app import list_routes
 # list_routes(app)
-app = create_app()
+
+
+def __getattr__(name):
+    # `from app import app` / `gunicorn app:app` still work, but the app is only
+    # built when asked for, not on every `import app.<module>`.
+    if name == 'app':
+        globals()['app'] = create_app()
+        return globals()['app']
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
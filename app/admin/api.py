@@ -1,5 +1,6 @@
 import os
 from flask import Blueprint, request, jsonify, session
+from app.auth.decorators import login_required, role_required
 
 from supabase import create_client
 from dotenv import load_dotenv
@@ -15,7 +16,6 @@ load_dotenv()
 SUPABASE_URL = os.environ.get("SUPABASE_URL")
 SUPABASE_KEY = os.environ.get("SUPABASE_KEY")
 supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
-import pandas as pd
 from io import BytesIO
 from flask import make_response
 # --- Excel Export Endpoints for Audit Sections ---
@@ -25,6 +25,7 @@ def audit_summary_excel():
     credit_total = float(request.args.get('credit_total', 0))
     debit_total = float(request.args.get('debit_total', 0))
     expense_total = float(request.args.get('expense_total', 0))
+    import pandas as pd
     df = pd.DataFrame([{
         'Total Credit': credit_total,
         'Total Debit': debit_total,
@@ -47,6 +48,7 @@ def audit_transactions_excel():
     try:
         resp = supabase.table('transactions').select('*').execute()
         txs = resp.data if hasattr(resp, 'data') and resp.data else []
+        import pandas as pd
         df = pd.DataFrame(txs)
         output = BytesIO()
         with pd.ExcelWriter(output, engine="openpyxl") as writer:
@@ -104,6 +106,7 @@ def audit_loans_excel():
                 'Remaining Principle Amount': loan_record.get('remaining_principle_amount', 0)
             })
         
+        import pandas as pd
         df = pd.DataFrame(excel_data)
         output = BytesIO()
         with pd.ExcelWriter(output, engine="openpyxl") as writer:
@@ -126,6 +129,7 @@ def audit_expenses_excel():
     try:
         resp = supabase.table('expenses').select('*').execute()
         expenses = resp.data if hasattr(resp, 'data') and resp.data else []
+        import pandas as pd
         df = pd.DataFrame(expenses)
         output = BytesIO()
         with pd.ExcelWriter(output, engine="openpyxl") as writer:
@@ -146,6 +150,7 @@ def audit_salaries_excel():
     try:
         resp = supabase.table('staff_salaries').select('*').execute()
         salaries = resp.data if hasattr(resp, 'data') and resp.data else []
+        import pandas as pd
         df = pd.DataFrame(salaries)
         output = BytesIO()
         with pd.ExcelWriter(output, engine="openpyxl") as writer:
@@ -158,6 +163,31 @@ def audit_salaries_excel():
     except Exception as e:
         return jsonify({'status': 'error', 'message': f'Failed to generate salaries Excel: {str(e)}'}), 500
 
+def _bucket_totals(rows, amount_key, date_key, slots, part, positive_only=False):
+    """
+    Sum row amounts into `slots` buckets by the month (part=1) or day (part=2)
+    of the row's 'YYYY-MM-DD' date. Non-numeric amounts count as 0 and rows
+    with an unparseable date are skipped. Returns (totals, grand_total).
+    """
+    totals = [0.0] * slots
+    grand_total = 0.0
+    for row in rows:
+        try:
+            amt = float(row.get(amount_key) or 0)
+        except Exception:
+            amt = 0.0
+        if positive_only and amt <= 0:
+            continue
+        d = str(row.get(date_key) or '')[:10]
+        try:
+            idx = int(d.split('-')[part]) - 1
+        except Exception:
+            continue
+        if 0 <= idx < slots:
+            totals[idx] += amt
+            grand_total += amt
+    return totals, grand_total
+
 @admin_api_bp.route('/fd-yearly-summary', methods=['GET'])
 def fd_yearly_summary():
     """
@@ -263,6 +293,7 @@ def audit_fd_excel():
                 'Withdrawal ID': fd.get('withdrawal_id', '')
             })
         
+        import pandas as pd
         df = pd.DataFrame(excel_data)
         output = BytesIO()
         with pd.ExcelWriter(output, engine="openpyxl") as writer:
@@ -276,6 +307,185 @@ def audit_fd_excel():
     except Exception as e:
         return jsonify({'status': 'error', 'message': f'Failed to generate FD Excel: {str(e)}'}), 500
 
+def _fd_projection_from_request():
+    """Run the FD book projection for ?months= (1-36, default 12) and ?as_of=YYYY-MM-DD."""
+    from app.finance.fd_projection import project_fd_book
+    months = min(36, max(1, int(request.args.get('months', 12))))
+    as_of = request.args.get('as_of')
+    as_of = datetime.strptime(as_of, '%Y-%m-%d').date() if as_of else datetime.utcnow().date()
+    from app.supabase_pages import fetch_all
+    deposits = fetch_all('fixed_deposits', 'id,amount,interest_rate,tenure,deposit_date', status='approved')
+    return project_fd_book(deposits, as_of=as_of, months=months)
+
+@admin_api_bp.route('/fd-projection', methods=['GET'])
+@login_required
+@role_required('admin', 'manager')
+def fd_projection():
+    """
+    Interest liability and maturity cash outflow of all active FDs, per month.
+    Query params (optional): months (1-36, default 12), as_of (YYYY-MM-DD, default today)
+    Returns: { status, as_of, months[{month, maturing_count, maturing_principal, maturing_interest,
+               maturity_outflow, active_count, active_principal, accrued_interest,
+               premature_payable_interest}], overdue, totals }
+    """
+    try:
+        projection = _fd_projection_from_request()
+    except ValueError:
+        return jsonify({'status': 'error', 'message': 'months must be a number and as_of YYYY-MM-DD'}), 400
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+    return jsonify({'status': 'success', **projection}), 200
+
+@admin_api_bp.route('/fd-projection/excel', methods=['GET'])
+@login_required
+@role_required('admin', 'manager')
+def fd_projection_excel():
+    """FD projection report as Excel (default) or CSV (?format=csv); same params as /fd-projection."""
+    try:
+        projection = _fd_projection_from_request()
+    except ValueError:
+        return jsonify({'status': 'error', 'message': 'months must be a number and as_of YYYY-MM-DD'}), 400
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': f'Failed to build FD projection: {str(e)}'}), 500
+
+    import pandas as pd
+    df = pd.DataFrame(projection['months']).rename(columns={
+        'month': 'Month',
+        'month_end': 'Month End',
+        'maturing_count': 'FDs Maturing',
+        'maturing_principal': 'Maturing Principal',
+        'maturing_interest': 'Maturing Interest',
+        'maturity_outflow': 'Maturity Outflow',
+        'active_count': 'Active FDs (Month End)',
+        'active_principal': 'Active Principal',
+        'accrued_interest': 'Accrued Interest',
+        'premature_payable_interest': 'Payable If Closed Early',
+    })
+    overdue = projection['overdue']
+    summary = pd.DataFrame([
+        {'Item': 'As of', 'Value': projection['as_of']},
+        {'Item': 'Active FDs', 'Value': projection['totals']['fd_count']},
+        {'Item': 'Active principal', 'Value': projection['totals']['principal']},
+        {'Item': 'Overdue FDs (matured, not closed)', 'Value': overdue['count']},
+        {'Item': 'Overdue outflow', 'Value': overdue['outflow']},
+        {'Item': 'Maturity outflow in horizon', 'Value': projection['totals']['maturity_outflow']},
+    ])
+    filename = f"fd_projection_{projection['as_of']}"
+    if request.args.get('format') == 'csv':
+        response = make_response(df.to_csv(index=False))
+        response.headers["Content-Disposition"] = f"attachment; filename={filename}.csv"
+        response.headers["Content-Type"] = "text/csv"
+        return response
+    output = BytesIO()
+    with pd.ExcelWriter(output, engine="openpyxl") as writer:
+        df.to_excel(writer, index=False, sheet_name="Projection")
+        summary.to_excel(writer, index=False, sheet_name="Summary")
+    output.seek(0)
+    response = make_response(output.read())
+    response.headers["Content-Disposition"] = f"attachment; filename={filename}.xlsx"
+    response.headers["Content-Type"] = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    return response
+
+def _par_report_from_request():
+    """PAR report for ?as_of= (default today), from app.local_store unless ?refresh=1."""
+    from flask import current_app
+    from app.local_store import get_store
+    from app.metrics import record_cache
+    as_of = request.args.get('as_of')
+    as_of = datetime.strptime(as_of, '%Y-%m-%d').date() if as_of else datetime.utcnow().date()
+    key = f"par_report:{as_of.isoformat()}"
+    store = get_store()
+    cached = None if request.args.get('refresh') == '1' else store.get(key)
+    record_cache('par_report', cached is not None)
+    if cached is None:
+        from app.finance.delinquency import par_report
+        rows, summary = par_report(as_of)
+        cached = {'rows': rows, 'summary': summary, 'generated_at': datetime.utcnow().isoformat()}
+        store.set(key, cached, current_app.config.get('PAR_REPORT_CACHE_SECONDS', 300))
+    return cached
+
+@admin_api_bp.route('/par-report', methods=['GET'])
+@login_required
+@role_required('admin', 'manager')
+def par_report():
+    """
+    Portfolio-at-risk and overdue aging of all approved loans.
+    Query params (optional): as_of (YYYY-MM-DD), min_dpd (default 1; 0 lists every loan),
+                             bucket (current|1-30|31-60|61-90|90+), refresh=1 (skip the cache)
+    Returns: { status, summary{loans, outstanding, overdue_loans, buckets[], par30, par30_pct, ...},
+               loans[{loan_id, customer_id, name, outstanding, emi, dpd, bucket, overdue_installments, oldest_due_date}],
+               generated_at }
+    """
+    try:
+        report = _par_report_from_request()
+        min_dpd = int(request.args.get('min_dpd', 1))
+    except ValueError:
+        return jsonify({'status': 'error', 'message': 'as_of must be YYYY-MM-DD and min_dpd a number'}), 400
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+    bucket = request.args.get('bucket')
+    loans = [r for r in report['rows'] if r['dpd'] >= min_dpd and (not bucket or r['bucket'] == bucket)]
+    return jsonify({
+        'status': 'success',
+        'summary': report['summary'],
+        'loans': loans,
+        'generated_at': report['generated_at'],
+    }), 200
+
+@admin_api_bp.route('/par-report/excel', methods=['GET'])
+@login_required
+@role_required('admin', 'manager')
+def par_report_excel():
+    """PAR / aging report as Excel (Summary + Loans sheets) or CSV of the loans (?format=csv)."""
+    try:
+        report = _par_report_from_request()
+    except ValueError:
+        return jsonify({'status': 'error', 'message': 'as_of must be YYYY-MM-DD'}), 400
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': f'Failed to build PAR report: {str(e)}'}), 500
+
+    import pandas as pd
+    summary = report['summary']
+    df = pd.DataFrame(report['rows'], columns=[
+        'loan_id', 'customer_id', 'name', 'loan_amount', 'outstanding', 'emi', 'dpd', 'bucket',
+        'overdue_installments', 'oldest_due_date',
+    ]).rename(columns={
+        'loan_id': 'Loan ID',
+        'customer_id': 'Customer ID',
+        'name': 'Name',
+        'loan_amount': 'Loan Amount',
+        'outstanding': 'Outstanding Principal',
+        'emi': 'EMI',
+        'dpd': 'Days Past Due',
+        'bucket': 'Aging Bucket',
+        'overdue_installments': 'Overdue Installments',
+        'oldest_due_date': 'Oldest Unpaid Due Date',
+    })
+    filename = f"par_report_{summary['as_of']}"
+    if request.args.get('format') == 'csv':
+        response = make_response(df.to_csv(index=False))
+        response.headers["Content-Disposition"] = f"attachment; filename={filename}.csv"
+        response.headers["Content-Type"] = "text/csv"
+        return response
+
+    buckets = pd.DataFrame(summary['buckets']).rename(columns={
+        'bucket': 'Aging Bucket', 'loans': 'Loans', 'outstanding': 'Outstanding Principal', 'share_pct': 'Share %',
+    })
+    par = pd.DataFrame([
+        {'Measure': f'PAR{days}', 'Outstanding Principal': summary[f'par{days}'], 'Share %': summary[f'par{days}_pct']}
+        for days in (30, 60, 90)
+    ])
+    output = BytesIO()
+    with pd.ExcelWriter(output, engine="openpyxl") as writer:
+        buckets.to_excel(writer, index=False, sheet_name="Summary")
+        par.to_excel(writer, index=False, sheet_name="Summary", startrow=len(buckets) + 2)
+        df.to_excel(writer, index=False, sheet_name="Loans")
+    output.seek(0)
+    response = make_response(output.read())
+    response.headers["Content-Disposition"] = f"attachment; filename={filename}.xlsx"
+    response.headers["Content-Type"] = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    return response
+
 @admin_api_bp.route('/share-amount-summary', methods=['GET'])
 def share_amount_summary():
     """
@@ -336,6 +546,7 @@ def share_amount_excel():
                     'Share Amount': share_amount
                 })
         
+        import pandas as pd
         df = pd.DataFrame(excel_data)
         output = BytesIO()
         with pd.ExcelWriter(output, engine="openpyxl") as writer:
@@ -350,6 +561,104 @@ def share_amount_excel():
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
 
+def _dividend_params(args):
+    """(fy, rate, prorate) from request args/JSON; fy defaults to the last completed April-March year."""
+    today = datetime.utcnow().date()
+    fy = int(args.get('fy') or (today.year if today.month >= 4 else today.year - 1))
+    if 'rate' not in args or args.get('rate') in (None, ''):
+        raise ValueError('rate (dividend %) is required')
+    prorate = str(args.get('prorate', '1')).lower() not in ('0', 'false', 'no', 'off')
+    return fy, float(args.get('rate')), prorate
+
+@admin_api_bp.route('/dividend/preview', methods=['GET'])
+@login_required
+@role_required('admin', 'manager')
+def dividend_preview():
+    """
+    Dividend on share capital for a financial year, without posting.
+    Query params: rate (% , required), fy (year the April-March year ends in; default last completed),
+                  prorate (default 1: share credited during the year counts for the days held)
+    Returns: { status, financial_year, period, rate, prorate, transaction_id, members, members_due,
+               already_paid, total_share_at_year_end, total_eligible_share, total_dividend,
+               rows[{customer_id, name, share_amount, share_at_year_end, opening_share, share_added,
+                     eligible_share, dividend, status}] }
+    """
+    from app.finance.dividends import preview
+    try:
+        report = preview(*_dividend_params(request.args))
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+    return jsonify({'status': 'success', **report}), 200
+
+@admin_api_bp.route('/dividend/excel', methods=['GET'])
+@login_required
+@role_required('admin', 'manager')
+def dividend_excel():
+    """Dividend preview as Excel (default) or CSV (?format=csv); same params as /dividend/preview."""
+    from app.finance.dividends import preview
+    try:
+        report = preview(*_dividend_params(request.args))
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': f'Failed to build dividend report: {str(e)}'}), 500
+
+    import pandas as pd
+    df = pd.DataFrame(report['rows'], columns=[
+        'customer_id', 'name', 'share_amount', 'share_at_year_end', 'opening_share', 'share_added',
+        'eligible_share', 'dividend', 'status',
+    ]).rename(columns={
+        'customer_id': 'Customer ID',
+        'name': 'Name',
+        'share_amount': 'Share Amount (today)',
+        'share_at_year_end': 'Share at Year End',
+        'opening_share': 'Opening Share',
+        'share_added': 'Share Added in Year',
+        'eligible_share': 'Eligible Share',
+        'dividend': 'Dividend',
+        'status': 'Status',
+    })
+    filename = f"dividend_{report['financial_year']}"
+    if request.args.get('format') == 'csv':
+        response = make_response(df.to_csv(index=False))
+        response.headers["Content-Disposition"] = f"attachment; filename={filename}.csv"
+        response.headers["Content-Type"] = "text/csv"
+        return response
+    output = BytesIO()
+    with pd.ExcelWriter(output, engine="openpyxl") as writer:
+        df.to_excel(writer, index=False, sheet_name="Dividend")
+    output.seek(0)
+    response = make_response(output.read())
+    response.headers["Content-Disposition"] = f"attachment; filename={filename}.xlsx"
+    response.headers["Content-Type"] = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    return response
+
+@admin_api_bp.route('/dividend/post', methods=['POST'])
+@login_required
+@role_required('admin', 'manager')
+def dividend_post():
+    """
+    Credit the dividends shown by /dividend/preview to members' balance as one deposit batch.
+    JSON: { rate, fy?, prorate?, date? (posting date, default today), notify? (receipt emails, default true) }
+    Members already credited for the year are skipped, so repeating the call is safe.
+    """
+    from app.finance.dividends import post
+    data = request.get_json(silent=True) or {}
+    try:
+        fy, rate, prorate = _dividend_params(data)
+        posted_on = datetime.strptime(data['date'], '%Y-%m-%d').date() if data.get('date') else None
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    try:
+        report = post(fy, rate, prorate, posted_on, notify=data.get('notify', True) is not False)
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': f'Posting failed: {e}'}), 500
+    return jsonify({'status': 'success', **report}), 200
+
 @admin_api_bp.route('/loan-info', methods=['GET'])
 def loan_info():
     """
@@ -468,32 +777,16 @@ def monthly_summary():
         # Aggregate totals and per-day series
         days_in_month = (next_dt - start_dt).days
         labels = list(range(1, days_in_month + 1))
-        deposits = [0.0 for _ in labels]
-        withdrawals = [0.0 for _ in labels]
-        total_deposit = 0.0
-        total_withdrawal = 0.0
-
+        deposit_rows = []
+        withdrawal_rows = []
         for tx in txs:
-            try:
-                amt = float(tx.get('amount') or 0)
-            except Exception:
-                # Skip rows with non-numeric amount
-                continue
             tx_type = str(tx.get('type') or '').lower()
-            # Extract day from date string (supports 'YYYY-MM-DD' or ISO datetime)
-            dstr = str(tx.get('date') or '')[:10]
-            try:
-                day = int(dstr.split('-')[2])
-            except Exception:
-                continue
-            idx = day - 1
-            if 0 <= idx < len(labels):
-                if tx_type == 'deposit':
-                    deposits[idx] += amt
-                    total_deposit += amt
-                elif tx_type in ('withdraw', 'withdrawal'):
-                    withdrawals[idx] += amt
-                    total_withdrawal += amt
+            if tx_type == 'deposit':
+                deposit_rows.append(tx)
+            elif tx_type in ('withdraw', 'withdrawal'):
+                withdrawal_rows.append(tx)
+        deposits, total_deposit = _bucket_totals(deposit_rows, 'amount', 'date', days_in_month, 2)
+        withdrawals, total_withdrawal = _bucket_totals(withdrawal_rows, 'amount', 'date', days_in_month, 2)
 
         # Round for neatness
         deposits = [round(x, 2) for x in deposits]
@@ -536,9 +829,7 @@ def loan_yearly_summary():
         # Labels for 12 months
         labels = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
         disbursed = [0.0] * 12
-        recovered = [0.0] * 12
         total_disbursed = 0.0
-        total_recovered = 0.0
 
         # Fetch loans created within the year (treat as disbursed when approved)
         loan_resp = supabase.table('loans') \
@@ -577,21 +868,7 @@ def loan_yearly_summary():
             .execute()
         recs = rec_resp.data if hasattr(rec_resp, 'data') and rec_resp.data else []
         
-        for rec in recs:
-            try:
-                amt = float(rec.get('repayment_amount') or 0)
-            except Exception:
-                amt = 0.0
-            if amt <= 0:
-                continue
-            d = str(rec.get('repayment_date') or '')[:10]
-            try:
-                month_idx = int(d.split('-')[1]) - 1
-            except Exception:
-                continue
-            if 0 <= month_idx < 12:
-                recovered[month_idx] += amt
-                total_recovered += amt
+        recovered, total_recovered = _bucket_totals(recs, 'repayment_amount', 'repayment_date', 12, 1, positive_only=True)
 
         # Round values
         disbursed = [round(x, 2) for x in disbursed]
@@ -625,8 +902,6 @@ def staff_salary_yearly_summary():
         end_str = next_dt.strftime('%Y-%m-%d')
 
         labels = ['Jan','Feb','Mar','Apr','May','Jun','Jul','Aug','Sep','Oct','Nov','Dec']
-        totals = [0.0] * 12
-        total_year = 0.0
 
         resp = supabase.table('staff_salaries') \
             .select('salary,date') \
@@ -634,19 +909,7 @@ def staff_salary_yearly_summary():
             .lt('date', end_str) \
             .execute()
         rows = resp.data if hasattr(resp, 'data') and resp.data else []
-        for r in rows:
-            try:
-                amt = float(r.get('salary') or 0)
-            except Exception:
-                amt = 0.0
-            d = str(r.get('date') or '')[:10]
-            try:
-                midx = int(d.split('-')[1]) - 1
-            except Exception:
-                continue
-            if 0 <= midx < 12:
-                totals[midx] += amt
-                total_year += amt
+        totals, total_year = _bucket_totals(rows, 'salary', 'date', 12, 1)
 
         totals = [round(x, 2) for x in totals]
         return jsonify({'status': 'success', 'year': year, 'labels': labels, 'totals': totals, 'total_year': round(total_year, 2)}), 200
@@ -672,8 +935,6 @@ def staff_salary_monthly_summary():
         end_str = next_dt.strftime('%Y-%m-%d')
         days = (next_dt - start_dt).days
         labels = list(range(1, days + 1))
-        totals = [0.0] * days
-        total_month = 0.0
 
         resp = supabase.table('staff_salaries') \
             .select('salary,date') \
@@ -681,20 +942,7 @@ def staff_salary_monthly_summary():
             .lt('date', end_str) \
             .execute()
         rows = resp.data if hasattr(resp, 'data') and resp.data else []
-        for r in rows:
-            try:
-                amt = float(r.get('salary') or 0)
-            except Exception:
-                amt = 0.0
-            d = str(r.get('date') or '')[:10]
-            try:
-                day = int(d.split('-')[2])
-            except Exception:
-                continue
-            idx = day - 1
-            if 0 <= idx < len(totals):
-                totals[idx] += amt
-                total_month += amt
+        totals, total_month = _bucket_totals(rows, 'salary', 'date', days, 2)
 
         totals = [round(x, 2) for x in totals]
         return jsonify({'status': 'success', 'year': year, 'month': month, 'labels': labels, 'totals': totals, 'total_month': round(total_month, 2)}), 200
@@ -720,8 +968,6 @@ def expenses_monthly_summary():
         end_str = next_dt.strftime('%Y-%m-%d')
         days = (next_dt - start_dt).days
         labels = list(range(1, days + 1))
-        totals = [0.0] * days
-        total_month = 0.0
 
         # Use Supabase client directly to query 'expenses'
         resp = supabase.table('expenses') \
@@ -730,20 +976,7 @@ def expenses_monthly_summary():
             .lt('date', end_str) \
             .execute()
         rows = resp.data if hasattr(resp, 'data') and resp.data else []
-        for r in rows:
-            try:
-                amt = float(r.get('amount') or 0)
-            except Exception:
-                amt = 0.0
-            d = str(r.get('date') or '')[:10]
-            try:
-                day = int(d.split('-')[2])
-            except Exception:
-                continue
-            idx = day - 1
-            if 0 <= idx < len(totals):
-                totals[idx] += amt
-                total_month += amt
+        totals, total_month = _bucket_totals(rows, 'amount', 'date', days, 2)
 
         totals = [round(x, 2) for x in totals]
         return jsonify({'status': 'success', 'year': year, 'month': month, 'labels': labels, 'totals': totals, 'total_month': round(total_month, 2)}), 200
@@ -1019,7 +1252,8 @@ def customer_info():
         ).eq("customer_id", customer_id)
         member_resp = member_query.limit(1).execute()
         if not member_resp.data or len(member_resp.data) == 0:
-            return jsonify({'status': 'error', 'message': 'Member not found'}), 404
+            from app.member_search import suggest
+            return jsonify({'status': 'error', 'message': 'Member not found', 'suggestions': suggest(customer_id)}), 404
         member = member_resp.data[0]
 
         # Fetch loans for the member
@@ -1069,7 +1303,8 @@ def member_details_by_kgid():
         resp = supabase.table("members").select("customer_id,kgid").eq("kgid", kgid).limit(1).execute()
         if resp.data and len(resp.data) > 0:
             return jsonify({'status': 'success', 'member': resp.data[0]}), 200
-        return jsonify({'status': 'error', 'message': 'KGID not found'}), 404
+        from app.member_search import suggest
+        return jsonify({'status': 'error', 'message': 'KGID not found', 'suggestions': suggest(kgid)}), 404
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
@@ -1473,6 +1708,7 @@ def recent_transactions_excel():
             return jsonify({'status': 'error', 'message': 'No transactions found for the specified period'}), 404
 
         # Create DataFrame and Excel file
+        import pandas as pd
         df = pd.DataFrame(excel_data)
         output = BytesIO()
         with pd.ExcelWriter(output, engine="openpyxl") as writer:
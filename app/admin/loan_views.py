@@ -1,6 +1,7 @@
 from flask import render_template, jsonify, request, redirect, url_for, session
 from . import admin_bp
 from app.auth.routes import supabase
+from app.metrics import SUPABASE_RETRIES
 from datetime import datetime, date
 import math  # NEW
 try:
@@ -20,6 +21,7 @@ def sb_exec(qb, attempts=3):
         except RemoteProtocolError as e:
             last_err = e
             if i < attempts - 1:
+                SUPABASE_RETRIES.inc()
                 continue
             raise
         except Exception as e:
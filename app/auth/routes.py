@@ -1,6 +1,8 @@
 from . import auth_bp
-from flask import request, jsonify, session, render_template, redirect, url_for, current_app
+from flask import request, jsonify, session, render_template, redirect, url_for, current_app, Response
 import time
+import json
+import threading
 from werkzeug.security import generate_password_hash, check_password_hash
 import os
 import uuid
@@ -9,6 +11,7 @@ import smtplib
 from email.mime.text import MIMEText
 from supabase import create_client, Client
 from dotenv import load_dotenv
+from app.rate_limit import rate_limit
 import jwt
 from datetime import datetime, timedelta
 
@@ -27,6 +30,7 @@ def create_jwt(email, role, expires_minutes=5):
         'role': role,
         'iat': int(now.timestamp()),
         'exp': int((now + timedelta(minutes=expires_minutes)).timestamp()),
+        'iat_ms': int(time.time() * 1000),  # compared against revocation times
         'rnd': uuid.uuid4().hex  # prevent token reuse detection collisions
     }
     return jwt.encode(payload, _jwt_secret(), algorithm='HS256')
@@ -113,6 +117,7 @@ def find_role(email):
     return None
 
 @auth_bp.route('/login', methods=['GET', 'POST'])
+@rate_limit('login')
 def login():
     if request.method == 'GET':
         return render_template('login.html')
@@ -157,6 +162,7 @@ def login():
             blocked = attempts >= 3
             supabase.table(role).update({"login_attempts": attempts, "blocked": blocked}).eq("email", email).execute()
             if blocked:
+                revoke_tokens(email)
                 return jsonify({'status': 'error', 'message': 'Account blocked due to 3 failed attempts. Please contact staff to unblock.'}), 403
             return jsonify({'status': 'error', 'message': f'Invalid password. {3 - attempts} attempts left'}), 401
 
@@ -193,29 +199,115 @@ def login():
     except Exception as e:
         print(f"Failed to set session variables: {e}")
     
-    # Issue short-lived JWT for front-end heartbeat checks (per-tab via sessionStorage)
+    # Issue short-lived JWT for front-end expiry checks (per-tab via sessionStorage)
     token = create_jwt(email, role)
     # Redirect according to role (for API, just return role)
     return jsonify({'status': 'success', 'role': role, 'id': user['id'], 'token': token}), 200
 
-@auth_bp.route('/validate-token', methods=['POST'])
-def validate_token():
-    """Validate a JWT sent by the client. Returns 200 if valid, 401 otherwise."""
+def _bearer_token():
+    """Token from JSON body, Authorization header or ?token= (EventSource cannot set headers)."""
     data = request.get_json(silent=True) or {}
-    token = data.get('token')
+    token = data.get('token') or request.args.get('token')
     if not token:
         authz = request.headers.get('Authorization', '')
         if authz.lower().startswith('bearer '):
             token = authz[7:]
+    return token
+
+# Revocation registry in app.local_store (shared by the workers): tokens for an
+# email issued at or before the recorded time are refused, so a later login is
+# unaffected while tokens revoked earlier stay revoked. Fed by logout/block; open
+# session-event streams in this worker are woken immediately, those in other
+# workers notice on their next check.
+_session_waiters = {}
+_session_lock = threading.Lock()
+_REVOCATION_KEEP_SECONDS = 3600
+
+def _revocation_key(email):
+    return f"revoked:{email}"
+
+def revoke_tokens(email):
+    """Revoke every JWT issued so far for email and notify its open event streams."""
+    if not email:
+        return
+    from app.local_store import get_store
+    get_store().set(_revocation_key(email), int(time.time() * 1000), _REVOCATION_KEEP_SECONDS)
+    with _session_lock:
+        waiters = list(_session_waiters.get(email, ()))
+    for waiter in waiters:
+        waiter.set()
+
+def token_revoked(info):
+    from app.local_store import get_store
+    email = info.get('sub')
+    revoked_ms = get_store().get(_revocation_key(email)) if email else None
+    if revoked_ms is None:
+        return False
+    issued_ms = info.get('iat_ms') or int(info.get('iat') or 0) * 1000
+    return int(issued_ms) <= int(revoked_ms)
+
+@auth_bp.route('/validate-token', methods=['POST'])
+def validate_token():
+    """Validate a JWT sent by the client without opening the cookie session.
+
+    The dashboard checks expiry locally and only calls this to confirm a token;
+    signature, expiry and revocation are enough, so no session or database work
+    happens here (see app.auth.session.SESSIONLESS_ENDPOINTS).
+    """
+    token = _bearer_token()
     ok, info = verify_jwt(token) if token else (False, 'missing token')
     if not ok:
         # Never 401 here to prevent client redirect loops; just warn
         return jsonify({'status': 'success', 'warn': 'invalid_token'}), 200
-    # optional: ensure token subject matches session user to bind tab to session
-    if not session.get('email') or session.get('email') != info.get('sub'):
-        # Return success but annotate mismatch to avoid disrupting UX; routes remain server-guarded.
-        return jsonify({'status': 'success', 'warn': 'session_mismatch'}), 200
-    return jsonify({'status': 'success'}), 200
+    if token_revoked(info):
+        return jsonify({'status': 'success', 'warn': 'revoked'}), 200
+    return jsonify({'status': 'success', 'exp': info.get('exp')}), 200
+
+@auth_bp.route('/session-events', methods=['GET'])
+def session_events():
+    """Server-sent events for one tab's token: pushes `revoked` or `expired`.
+
+    The stream ends once the token expires, so each connection lives at most one
+    token lifetime. Only enable it (SESSION_EVENTS_ENABLED) on threaded/async
+    workers, since every open tab holds a connection.
+    """
+    if not current_app.config.get('SESSION_EVENTS_ENABLED'):
+        return jsonify({'status': 'error', 'message': 'Not found'}), 404
+    token = _bearer_token()
+    ok, info = verify_jwt(token) if token else (False, 'missing token')
+    headers = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    if not ok:
+        return Response('retry: 30000\nevent: expired\ndata: {}\n\n', mimetype='text/event-stream', headers=headers)
+    email = info.get('sub')
+    exp = int(info.get('exp') or 0)
+    waiter = threading.Event()
+    with _session_lock:
+        _session_waiters.setdefault(email, set()).add(waiter)
+
+    def stream():
+        try:
+            yield f"retry: 30000\nevent: session\ndata: {json.dumps({'exp': exp})}\n\n"
+            while True:
+                if token_revoked(info):
+                    yield "event: revoked\ndata: {}\n\n"
+                    return
+                remaining = exp - time.time()
+                if remaining <= 0:
+                    yield "event: expired\ndata: {}\n\n"
+                    return
+                if waiter.wait(timeout=min(remaining, 25)):
+                    waiter.clear()
+                    continue
+                yield ": keep-alive\n\n"
+        finally:
+            with _session_lock:
+                waiters = _session_waiters.get(email)
+                if waiters is not None:
+                    waiters.discard(waiter)
+                    if not waiters:
+                        _session_waiters.pop(email, None)
+
+    return Response(stream(), mimetype='text/event-stream', headers=headers)
 
 @auth_bp.route('/refresh-token', methods=['POST'])
 def refresh_token():
@@ -237,6 +329,7 @@ def first_time_signin_page():
     return render_template('first_time_signin.html')
 
 @auth_bp.route('/first-time-signin', methods=['POST'])
+@rate_limit('password_email')
 def first_time_signin():
     email = request.form.get('email')
     if not email or not re.match(r"[^@]+@[^@]+\.[^@]+", email):
@@ -275,6 +368,7 @@ def set_password():
     return jsonify({'status': 'error', 'message': 'Invalid or expired token'}), 400
 
 @auth_bp.route('/forgot_password', methods=['GET', 'POST'])
+@rate_limit('password_email')
 def forgot_password():
     if request.method == 'GET':
         return render_template('forgot_password.html')
@@ -347,6 +441,7 @@ def logout():
     Uses explicit path '/login' per requirement.
     """
     try:
+        revoke_tokens(session.get('email'))
         session.clear()
     except Exception:
         # if session cannot be cleared for some reason, ignore and continue to redirect
@@ -0,0 +1,22 @@
+from flask.sessions import SecureCookieSessionInterface
+
+# Endpoints that authenticate with the short-lived JWT alone. They are polled by
+# every open dashboard tab, so they skip opening (and re-signing) the cookie session.
+SESSIONLESS_ENDPOINTS = {
+    'auth.validate_token',
+    'auth.session_events',
+}
+
+
+class SelectiveSessionInterface(SecureCookieSessionInterface):
+    """Cookie session interface that hands out a null session to token-only endpoints."""
+
+    def open_session(self, app, request):
+        if request.endpoint in SESSIONLESS_ENDPOINTS:
+            return self.make_null_session(app)
+        return super().open_session(app, request)
+
+    def save_session(self, app, session, response):
+        if session is None or self.is_null_session(session):
+            return None
+        return super().save_session(app, session, response)
@@ -57,8 +57,9 @@ def certificate_pdf(stid):
 
     if action == "download":
         from xhtml2pdf import pisa
+        from app.media_cache import link_callback
         pdf = BytesIO()
-        pisa.CreatePDF(html, dest=pdf, encoding='utf-8')
+        pisa.CreatePDF(html, dest=pdf, encoding='utf-8', link_callback=link_callback)
         response = make_response(pdf.getvalue())
         response.headers['Content-Type'] = 'application/pdf'
         response.headers['Content-Disposition'] = f'attachment; filename={stid}.pdf'
@@ -12,4 +12,53 @@ class Config:
     MAIL_PASSWORD = os.environ.get("MAIL_PASSWORD")
     # Session lifetime: 1 hour
     PERMANENT_SESSION_LIFETIME = timedelta(hours=1)
+    # Push token revocation/expiry to dashboards over SSE (/auth/session-events).
+    # Keep off on sync gunicorn workers: each open tab holds a connection.
+    SESSION_EVENTS_ENABLED = os.environ.get("SESSION_EVENTS_ENABLED", "false").lower() == "true"
+    # Per-host shared state (rate-limit buckets, OTPs): "sqlite:///path.db" (default: in the
+    # instance folder) or "memory" (single process only)
+    LOCAL_STORE_URL = os.environ.get("LOCAL_STORE_URL")
+    RATE_LIMIT_ENABLED = os.environ.get("RATE_LIMIT_ENABLED", "true").lower() == "true"
+    # Number of trusted reverse proxies in front of the app (X-Forwarded-For hops)
+    RATE_LIMIT_PROXY_HOPS = int(os.environ.get("RATE_LIMIT_PROXY_HOPS", "0"))
+    # scope -> {key kind: (requests, per seconds)}
+    RATE_LIMITS = {
+        'login': {'ip': (20, 60), 'email': (5, 60)},
+        'otp': {'ip': (10, 600), 'email': (3, 600)},
+        'password_email': {'ip': (10, 600), 'email': (3, 600)},
+        'civil_score': {'ip': (30, 60)},
+    }
+    OTP_TTL_SECONDS = int(os.environ.get("OTP_TTL_SECONDS", "600"))
+    OTP_MAX_ATTEMPTS = int(os.environ.get("OTP_MAX_ATTEMPTS", "5"))
+    # Request instrumentation (app.instrumentation)
+    SERVER_TIMING_ENABLED = os.environ.get("SERVER_TIMING_ENABLED", "true").lower() == "true"
+    PERF_LOG_ENABLED = os.environ.get("PERF_LOG_ENABLED", "true").lower() == "true"
+    # Warn when one request issues more Supabase queries than this (0 disables)
+    QUERY_BUDGET = int(os.environ.get("QUERY_BUDGET", "25"))
+    # Prometheus metrics: shared snapshot dir for multi-worker servers, scraper token
+    METRICS_DIR = os.environ.get("METRICS_DIR")
+    METRICS_TOKEN = os.environ.get("METRICS_TOKEN")
+    METRICS_FLUSH_SECONDS = float(os.environ.get("METRICS_FLUSH_SECONDS", "5"))
+    # Uploaded photos/signatures (app.image_utils): uploads larger than
+    # IMAGE_POOL_MIN_KB are processed in a pool of IMAGE_POOL_WORKERS processes
+    IMAGE_POOL_WORKERS = int(os.environ.get("IMAGE_POOL_WORKERS", "2"))
+    IMAGE_POOL_MIN_KB = int(os.environ.get("IMAGE_POOL_MIN_KB", "512"))
+    # Local cache of Supabase Storage images (app.media_cache, /media/...)
+    MEDIA_CACHE_ENABLED = os.environ.get("MEDIA_CACHE_ENABLED", "true").lower() == "true"
+    MEDIA_CACHE_DIR = os.environ.get("MEDIA_CACHE_DIR")  # default: <tmp>/society_media_cache
+    MEDIA_CACHE_MAX_MB = float(os.environ.get("MEDIA_CACHE_MAX_MB", "200"))
+    MEDIA_CACHE_REVALIDATE_SECONDS = int(os.environ.get("MEDIA_CACHE_REVALIDATE_SECONDS", "3600"))
+    # Portfolio-at-risk report (/admin/api/par-report) is cached this long
+    PAR_REPORT_CACHE_SECONDS = int(os.environ.get("PAR_REPORT_CACHE_SECONDS", "300"))
+    # Browser cache lifetime of /loan/api/check-civil-score responses
+    CIVIL_SCORE_MAX_AGE = int(os.environ.get("CIVIL_SCORE_MAX_AGE", "300"))
+    # Notification emails are sent by a background thread (app.notification.outbox);
+    # on worker exit queued emails get EMAIL_OUTBOX_DRAIN_SECONDS to go out
+    EMAIL_OUTBOX_ENABLED = os.environ.get("EMAIL_OUTBOX_ENABLED", "true").lower() == "true"
+    EMAIL_OUTBOX_DRAIN_SECONDS = float(os.environ.get("EMAIL_OUTBOX_DRAIN_SECONDS", "10"))
+    # Member search (app.member_search): 'memory' keeps a trigram index per worker,
+    # refreshed from members.updated_at; 'postgres' uses the search_members RPC
+    MEMBER_SEARCH_BACKEND = os.environ.get("MEMBER_SEARCH_BACKEND", "memory")
+    MEMBER_SEARCH_REFRESH_SECONDS = float(os.environ.get("MEMBER_SEARCH_REFRESH_SECONDS", "30"))
+    MEMBER_SEARCH_FULL_REFRESH_SECONDS = float(os.environ.get("MEMBER_SEARCH_FULL_REFRESH_SECONDS", "600"))
     # ...add other config as needed...
@@ -4,10 +4,10 @@ from flask import request, jsonify, render_template, make_response, abort, sessi
 import os
 import uuid
 import re
+from app.number_words import inflect_engine
 from supabase import create_client, Client
 from dotenv import load_dotenv
 import pdfkit
-import inflect
 import smtplib
 from email.mime.text import MIMEText
 from datetime import datetime
@@ -17,6 +17,8 @@ from email.mime.application import MIMEApplication
 
 # Import notify_admin_loan_application to fix NameError
 from app.auth.routes import notify_admin_loan_application
+from app.rate_limit import rate_limit
+from app.auth.decorators import login_required, role_required
 
 # Use the shared finance blueprint defined in app.finance.__init__
 from . import finance_bp
@@ -129,7 +131,6 @@ import re
 from supabase import create_client, Client
 from dotenv import load_dotenv
 import pdfkit
-import inflect
 import smtplib
 from email.mime.text import MIMEText
 from datetime import datetime
@@ -147,7 +148,6 @@ load_dotenv()
 SUPABASE_URL = os.environ.get("SUPABASE_URL")
 SUPABASE_KEY = os.environ.get("SUPABASE_KEY")
 supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-p = inflect.engine()
 
 def generate_loan_id():
     """Generate a unique loan ID in format LNXXXX"""
@@ -174,6 +174,70 @@ def generate_loan_id():
         # Fallback to timestamp-based ID if database query fails
         return f"LN{int(datetime.now().timestamp())%10000:04d}"
 
+APPLY_LOAN_RPC = "apply_loan_with_sureties"
+_apply_rpc_missing = False
+
+def _is_missing_function(error):
+    text = str(error)
+    return 'PGRST202' in text or 'Could not find the function' in text
+
+def _post_loan_application(loan_insert, surety_ids):
+    """
+    Insert a loan application, its LNxxxx id and its surety rows.
+    Returns (loan UUID, LNxxxx), or (None, None) if the loan could not be created.
+    Done in one transaction by the apply_loan_with_sureties database function
+    (supabase/migrations/20261019000300); until that is deployed the rows are
+    written call by call as before.
+    """
+    global _apply_rpc_missing
+    if not _apply_rpc_missing:
+        try:
+            resp = supabase.rpc(APPLY_LOAN_RPC, {"p_loan": loan_insert, "p_sureties": surety_ids}).execute()
+            row = resp.data[0] if isinstance(resp.data, list) else resp.data
+            return row["id"], row["loan_id"]
+        except Exception as e:
+            if not _is_missing_function(e):
+                raise
+            _apply_rpc_missing = True
+            print(f"[WARN] {APPLY_LOAN_RPC} not deployed, posting loan applications without it")
+
+    ins_resp = supabase.table("loans").insert(loan_insert).execute()
+    if not ins_resp.data:
+        return None, None
+    loan_uuid = ins_resp.data[0].get('id')
+    unique_loan_id = generate_loan_id()
+    supabase.table("loans").update({"loan_id": unique_loan_id}).eq("id", loan_uuid).execute()
+    try:
+        from app.finance.sureties import surety_exposure
+        surety_members = surety_exposure(surety_ids)
+        surety_rows = []
+        for s in surety_ids:
+            sm = surety_members.get(s, {})
+            surety_rows.append({
+                "loan_id": loan_uuid,          # use UUID for sureties linkage
+                "surety_customer_id": s,
+                "surety_name": sm.get("name") or "",
+                "surety_mobile": sm.get("phone") or "",
+                "surety_signature_url": sm.get("signature_url"),
+                "surety_photo_url": sm.get("photo_url"),
+                "active": False
+            })
+        supabase.table("sureties").insert(surety_rows).execute()
+    except Exception as e:
+        print(f"[WARN] inserting sureties for loan {unique_loan_id} failed: {e}")
+    return loan_uuid, unique_loan_id
+
+def _send_application_received_email(customer_id, loan_id):
+    """Applicant's 'application received' email (runs on the email outbox thread)."""
+    member_email_resp = supabase.table("members").select("email,name").eq("customer_id", customer_id).limit(1).execute()
+    if member_email_resp.data and member_email_resp.data[0].get("email"):
+        send_loan_status_email(
+            member_email_resp.data[0]["email"],
+            member_email_resp.data[0].get("name") or "Member",
+            loan_id,
+            "pending"
+        )
+
 def get_member_by_customer_id(customer_id):
     resp = supabase.table("members").select("customer_id,name,phone,signature_url,photo_url").eq("customer_id", customer_id).execute()
     return resp.data[0] if resp.data else None
@@ -187,7 +251,7 @@ def get_staff_by_email(email):
 def amount_to_words(amount):
     try:
         n = int(float(amount))
-        words = p.number_to_words(n, andword='').replace(',', '')
+        words = inflect_engine().number_to_words(n, andword='').replace(',', '')
         return words.title() + " Rupees Only"
     except Exception:
         return str(amount)
@@ -250,6 +314,46 @@ def send_loan_status_email(email, name, loan_id, status):
     except Exception as e:
         print(f"Failed to send loan status email: {e}")
 
+def send_repayment_receipts(receipts):
+    """
+    Email repayment certificate links for [(customer_id, loan_id, repayment_id), ...].
+    Member addresses are read in one query and all mails share one SMTP connection.
+    Returns the number of emails sent.
+    """
+    EMAIL_USER = os.environ.get("EMAIL_USER")
+    EMAIL_PASSWORD = os.environ.get("EMAIL_PASSWORD")
+    if not receipts or not EMAIL_USER or not EMAIL_PASSWORD:
+        return 0
+    from email.mime.text import MIMEText
+    import smtplib
+    from app.supabase_pages import fetch_in
+    members = {m["customer_id"]: m for m in fetch_in("members", "customer_id,email,name", "customer_id",
+                                                     [r[0] for r in receipts])}
+    base_url = "https://ksthstsociety.com"
+    sent = 0
+    with smtplib.SMTP_SSL('smtp.gmail.com', 465) as server:
+        server.login(EMAIL_USER, EMAIL_PASSWORD)
+        for customer_id, loan_id, repayment_id in receipts:
+            member = members.get(customer_id) or {}
+            if not member.get("email") or not repayment_id:
+                continue
+            certificate_url = f"{base_url}/loan/repayment-certificate/{repayment_id}?action=view"
+            body = (
+                f"Dear {member.get('name') or 'Member'},\n\n"
+                f"Your loan repayment has been received. You can view and download your repayment certificate at the following link:\n"
+                f"{certificate_url}\n\nThank you."
+            )
+            msg = MIMEText(body)
+            msg['Subject'] = f"Loan Repayment Certificate - {loan_id}"
+            msg['From'] = EMAIL_USER
+            msg['To'] = member["email"]
+            try:
+                server.sendmail(EMAIL_USER, [member["email"]], msg.as_string())
+                sent += 1
+            except Exception as e:
+                print(f"Failed to send repayment certificate email for {loan_id}: {e}")
+    return sent
+
 def _auto_complete_loan_if_fully_repaid(loan_row, total_repaid):
     """
     If outstanding <= 0 and loan is approved, mark it completed.
@@ -262,6 +366,10 @@ def _auto_complete_loan_if_fully_repaid(loan_row, total_repaid):
             # Update DB status to completed
             supabase.table("loans").update({"status": "completed"}).eq("id", loan_row["id"]).execute()
             loan_row["status"] = "completed"
+            from app.finance.sureties import deactivate_for_loan
+            deactivate_for_loan(loan_row["id"])
+            from app.finance.credit_scores import refresh_member
+            refresh_member(loan_row.get("customer_id"))
     except Exception as e:
         print(f"Auto-complete check failed for loan {loan_row.get('id')}: {e}")
     return loan_row
@@ -317,6 +425,15 @@ def apply_loan():
             except Exception:
                 pass
 
+        # Exactly two sureties (IDs), checked before anything is written
+        clean_sureties = []
+        for s in data.get('sureties') or []:
+            sid = str(s).strip()
+            if sid and len(clean_sureties) < 2:
+                clean_sureties.append(sid)
+        if len(clean_sureties) != 2:
+            return jsonify({"status": "error", "message": "Exactly two sureties are required."}), 400
+
         loan_insert = {
             "customer_id": customer_id,
             "loan_type": loan_type,
@@ -330,80 +447,20 @@ def apply_loan():
             **purpose_field
         }
 
-        ins_resp = supabase.table("loans").insert(loan_insert).execute()
-        if not ins_resp.data:
+        loan_uuid, unique_loan_id = _post_loan_application(loan_insert, clean_sureties)
+        if not loan_uuid:
             return jsonify({"status": "error", "message": "Failed to create loan"}), 500
-        loan_row = ins_resp.data[0]
-        loan_uuid = loan_row.get('id')
-
-
-        # Generate LNxxxx and update loan row immediately
-        unique_loan_id = generate_loan_id()
-        supabase.table("loans").update({"loan_id": unique_loan_id}).eq("id", loan_uuid).execute()
 
-        # Insert sureties (array of IDs passed) using loan UUID (loan_uuid)
-        sureties = data.get('sureties') or []
-        clean_sureties = []
-        for s in sureties:
-            sid = str(s).strip()
-            if sid and len(clean_sureties) < 2:
-                clean_sureties.append(sid)
-
-        # NEW: enforce exactly two sureties
-        if len(clean_sureties) != 2:
-            return jsonify({"status": "error", "message": "Exactly two sureties are required."}), 400
-        for s in clean_sureties:
-            try:
-                # Fetch surety member details for required fields
-                surety_member = supabase.table("members").select("name,phone,signature_url,photo_url").eq("customer_id", s).limit(1).execute()
-                if surety_member.data and len(surety_member.data) > 0:
-                    sm = surety_member.data[0]
-                    supabase.table("sureties").insert({
-                        "loan_id": loan_uuid,          # use UUID for sureties linkage
-                        "surety_customer_id": s,
-                        "surety_name": sm.get("name", ""),
-                        "surety_mobile": sm.get("phone", ""),
-                        "surety_signature_url": sm.get("signature_url"),
-                        "surety_photo_url": sm.get("photo_url"),
-                        "active": False
-                    }).execute()
-                else:
-                    # Insert with minimal info if member not found
-                    supabase.table("sureties").insert({
-                        "loan_id": loan_uuid,
-                        "surety_customer_id": s,
-                        "surety_name": "",
-                        "surety_mobile": "",
-                        "surety_signature_url": None,
-                        "surety_photo_url": None,
-                        "active": False
-                    }).execute()
-            except Exception:
-                pass  # continue inserting others
-
-        # Notify admins (use LNxxxx)
-        try:
-            notify_admin_loan_application(
-                loan_id=unique_loan_id,
-                customer_id=customer_id,
-                loan_type=loan_type,
-                amount=loan_amount
-            )
-        except Exception as e:
-            print(f"[WARN] notify_admin_loan_application failed: {e}")
-
-        # Member confirmation email
-        try:
-            member_email_resp = supabase.table("members").select("email,name").eq("customer_id", customer_id).limit(1).execute()
-            if member_email_resp.data and member_email_resp.data[0].get("email"):
-                send_loan_status_email(
-                    member_email_resp.data[0]["email"],
-                    member_email_resp.data[0].get("name") or "Member",
-                    unique_loan_id,
-                    "pending"
-                )
-        except Exception as e:
-            print(f"[WARN] member email send failed: {e}")
+        # Manager notification and applicant email go out after the response
+        from app.notification.outbox import send_later
+        send_later(
+            notify_admin_loan_application,
+            loan_id=unique_loan_id,
+            customer_id=customer_id,
+            loan_type=loan_type,
+            amount=loan_amount
+        )
+        send_later(_send_application_received_email, customer_id, unique_loan_id)
 
         return jsonify({
             "status": "success",
@@ -485,6 +542,14 @@ def get_loan(loan_id):
     loan_obj["interest_repaid"] = interest_repaid
     loan_obj["remaining_principal"] = remaining_principal
     loan_obj["last_repayment"] = last_repayment
+    # EMI, overdue installments and the suggested interest for the repayment page
+    try:
+        from app.finance.loan_schedule import cached_schedule_view
+        view = cached_schedule_view(loan_data, lambda: records)
+        loan_obj["schedule"] = dict(view["summary"], emi=view["emi"]) if view else None
+    except Exception as e:
+        print(f"Loan schedule unavailable for {loan_id}: {e}")
+        loan_obj["schedule"] = None
 
     return jsonify(
         status="success",
@@ -545,20 +610,34 @@ def check_surety_available():
     if not customer_id:
         return jsonify({"available": False, "reason": "Missing customer_id"}), 400
 
-    # Check if member exists
-    member_resp = supabase.table("members").select("customer_id").eq("customer_id", customer_id).execute()
-    if not member_resp.data or len(member_resp.data) == 0:
-        return jsonify({"available": False, "reason": "Customer not found"}), 200
-
-    # Count active sureties (active loans)
-    surety_resp = supabase.table("sureties").select("id").eq("surety_customer_id", customer_id).eq("active", True).execute()
-    active_count = len(surety_resp.data) if surety_resp.data else 0
-
-    if active_count >= 2:
-        return jsonify({"available": False, "reason": "Customer is already a surety for 2 active loans"}), 200
-
+    from app.finance.sureties import check_guarantors
+    result = check_guarantors([customer_id])[0]
+    if not result["available"]:
+        return jsonify({"available": False, "reason": result["reason"]}), 200
     return jsonify({"available": True}), 200
 
+@finance_bp.route('/surety/check-bulk', methods=['POST'])
+def check_sureties_bulk():
+    """
+    Validate several guarantors in one call.
+    Body: {customer_ids: [...], borrower_id?: str}
+    Returns per-ID name, phone, photo_url, signature_url, active_loan_count,
+    available and reason (borrower or repeated IDs are reported unavailable).
+    """
+    data = request.get_json(silent=True) or {}
+    customer_ids = data.get("customer_ids")
+    if not isinstance(customer_ids, list) or not customer_ids:
+        return jsonify({"status": "error", "message": "customer_ids must be a non-empty list"}), 400
+    if len(customer_ids) > 20:
+        return jsonify({"status": "error", "message": "At most 20 customer_ids per request"}), 400
+    from app.finance.sureties import check_guarantors
+    results = check_guarantors(customer_ids, data.get("borrower_id"))
+    return jsonify({
+        "status": "success",
+        "all_available": all(r["available"] for r in results),
+        "sureties": results
+    }), 200
+
 @finance_bp.route('/certificate/<loan_id>')
 def loan_certificate(loan_id):
     """
@@ -650,23 +729,14 @@ def check_surety_get():
     if not customer_id:
         return jsonify({"available": False, "reason": "Missing customer_id"}), 400
 
-    member_resp = supabase.table("members") \
-        .select("customer_id,name,phone") \
-        .eq("customer_id", customer_id) \
-        .execute()
-    if not member_resp.data:
+    from app.finance.sureties import surety_exposure, MAX_ACTIVE_SURETIES
+    member = surety_exposure([customer_id]).get(customer_id)
+    if not member:
         return jsonify({"available": False, "reason": "Customer not found"}), 200
 
-    member = member_resp.data[0]
-    surety_resp = supabase.table("sureties") \
-        .select("id") \
-        .eq("surety_customer_id", customer_id) \
-        .eq("active", True) \
-        .execute()
-    active_count = len(surety_resp.data or [])
-
+    active_count = member["active_surety_count"]
     return jsonify({
-        "available": active_count < 2,
+        "available": active_count < MAX_ACTIVE_SURETIES,
         "member": {"customer_id": member["customer_id"], "name": member["name"], "phone": member["phone"]},
         "active_loan_count": active_count
     }), 200
@@ -676,11 +746,10 @@ def surety_info(customer_id):
     """
     Fetch surety details by customer_id: name, phone, signature_url, photo_url, and active loan count.
     """
-    member = get_member_by_customer_id(customer_id)
+    from app.finance.sureties import surety_exposure
+    member = surety_exposure([customer_id]).get(customer_id)
     if not member:
         return jsonify({"status": "error", "message": "Surety not found"}), 404
-    # Count active loans backed as surety
-    active_loans = supabase.table("sureties").select("id").eq("surety_customer_id", customer_id).eq("active", True).execute()
     return jsonify({
         "status": "success",
         "member": {
@@ -690,7 +759,7 @@ def surety_info(customer_id):
             "signature_url": member.get("signature_url"),
             "photo_url": member.get("photo_url")
         },
-        "active_loan_count": len(active_loans.data)
+        "active_loan_count": member["active_surety_count"]
     }), 200
 
 @finance_bp.route('/fetch-account', methods=['GET'])
@@ -804,6 +873,10 @@ def fetch_customer_details():
                 if loan_details.get("status") == "approved" and loan_details.get("remaining_balance", 0) <= 0:
                     supabase.table("loans").update({"status": "completed"}).eq("id", loan_details["id"]).execute()
                     loan_details["status"] = "completed"
+                    from app.finance.sureties import deactivate_for_loan
+                    deactivate_for_loan(loan_details["id"])
+                    from app.finance.credit_scores import refresh_member
+                    refresh_member(customer_id)
             except Exception as e:
                 pass
 
@@ -941,49 +1014,23 @@ def repay_loan():
         if insert_resp.data and len(insert_resp.data) > 0:
             repayment_id = insert_resp.data[0].get("id")
 
-        # No summary row update needed; legacy only
+        # Cached schedule view (paid/overdue installments, suggested interest) is now stale
+        from app.finance.loan_schedule import invalidate
+        invalidate(loan.get("loan_id"), loan.get("id"))
+        from app.finance.credit_scores import refresh_member
+        refresh_member(loan.get("customer_id"))
 
-        # Send repayment email with repayment certificate download URL (no PDF attachment)
-        member_email = None
-        member_name = None
-        member_resp = supabase.table("members").select("email,name").eq("customer_id", loan["customer_id"]).execute()
-        if member_resp.data and member_resp.data[0].get("email"):
-            member_email = member_resp.data[0]["email"]
-            member_name = member_resp.data[0].get("name") or "Member"
+        # No summary row update needed; legacy only
 
-        # Build repayment certificate URL (public site)
-        base_url = "https://ksthstsociety.com"
+        # Repayment certificate link goes out by email after the response
         if repayment_id:
-            certificate_url = f"{base_url}/loan/repayment-certificate/{repayment_id}?action=view"
-        else:
-            certificate_url = ""
-
-        # Send email with repayment certificate link (no PDF)
-        if member_email and certificate_url:
-            EMAIL_USER = os.environ.get("EMAIL_USER")
-            EMAIL_PASSWORD = os.environ.get("EMAIL_PASSWORD")
-            if EMAIL_USER and EMAIL_PASSWORD:
-                from email.mime.text import MIMEText
-                import smtplib
-                subject = f"Loan Repayment Certificate - {loan.get('loan_id')}"
-                body = (
-                    f"Dear {member_name},\n\n"
-                    f"Your loan repayment has been received. You can view and download your repayment certificate at the following link:\n"
-                    f"{certificate_url}\n\nThank you."
-                )
-                msg = MIMEText(body)
-                msg['Subject'] = subject
-                msg['From'] = EMAIL_USER
-                msg['To'] = member_email
-                try:
-                    with smtplib.SMTP_SSL('smtp.gmail.com', 465) as server:
-                        server.login(EMAIL_USER, EMAIL_PASSWORD)
-                        server.sendmail(EMAIL_USER, [member_email], msg.as_string())
-                except Exception as e:
-                    current_app.logger.error(f"Failed to send repayment certificate email: {e}")
+            from app.notification.outbox import send_later
+            send_later(send_repayment_receipts, [(loan["customer_id"], loan.get("loan_id"), repayment_id)])
 
         if new_remaining_principal == 0 and loan.get("status") == "approved":
             supabase.table("loans").update({"status": "completed"}).eq("id", loan["id"]).execute()
+            from app.finance.sureties import deactivate_for_loan
+            deactivate_for_loan(loan["id"])
 
         # Build repayment certificate URL with action=view for API response
         from flask import url_for
@@ -1016,96 +1063,59 @@ def repay_loan():
 
 from flask import request, jsonify
 
-@finance_bp.route('/api/check-civil-score', methods=['GET'])
-def check_civil_score():
+def _civil_score_for_loan(loan, records):
     """
-    Check civil score for a customer by customer_id or kgid.
-    Returns: { status, score, message, details }
+    Score one loan from its repayment records.
+    Returns the detail dict, or None when the loan has no repayments or is not fully repaid.
     """
-    customer_id = request.args.get('customer_id')
-    kgid = request.args.get('kgid')
-    if not customer_id and not kgid:
-        return jsonify({"status": "error", "message": "customer_id or kgid required"}), 400
-
-    # Fetch customer by customer_id or kgid
-    customer = None
-    if customer_id:
-        resp = supabase.table("members").select("*").eq("customer_id", customer_id).execute()
-        if resp.data:
-            customer = resp.data[0]
-    elif kgid:
-        resp = supabase.table("members").select("*").eq("kgid", kgid).execute()
-        if resp.data:
-            customer = resp.data[0]
-    if not customer:
-        return jsonify({"status": "error", "message": "Customer not found"}), 404
+    loan_id = loan.get("loan_id") or loan.get("id")
+    loan_term = int(loan.get("loan_term_months") or 0)
+    records = [r for r in records if r.get("repayment_amount") not in (None, "")]
+    if not records:
+        return None
+    # Find first and last repayment date
+    repayment_dates = sorted([r["repayment_date"] for r in records if r.get("repayment_date")])
+    if not repayment_dates:
+        return None
+    first_date = repayment_dates[0]
+    last_date = repayment_dates[-1]
+    # Calculate months taken to repay (difference in months)
+    try:
+        d1 = datetime.strptime(first_date, "%Y-%m-%d")
+        d2 = datetime.strptime(last_date, "%Y-%m-%d")
+        months_taken = (d2.year - d1.year) * 12 + (d2.month - d1.month) + 1
+    except Exception:
+        months_taken = loan_term
+    # Only consider fully repaid loans
+    outstanding = 0
+    for r in records:
+        if r.get("outstanding_balance") is not None:
+            try:
+                outstanding = float(r["outstanding_balance"])
+            except Exception:
+                outstanding = 0
+    if outstanding != 0:
+        return None
+    # Score logic
+    if months_taken < loan_term:
+        score = "EXCELLENT"
+        msg = f"Loan {loan_id}: Repaid in {months_taken} months (before {loan_term} months)."
+    elif months_taken == loan_term:
+        score = "GOOD"
+        msg = f"Loan {loan_id}: Repaid on time ({months_taken} months)."
+    else:
+        score = "AVERAGE"
+        msg = f"Loan {loan_id}: Repaid in {months_taken} months (after term)."
+    return {
+        "loan_id": loan_id,
+        "loan_term": loan_term,
+        "months_taken": months_taken,
+        "score": score,
+        "message": msg
+    }
 
-    # Fetch all loans for this customer
-    loans_resp = supabase.table("loans").select("*").eq("customer_id", customer["customer_id"]).execute()
-    loans = loans_resp.data or []
-
-    # Analyze each loan's repayment history
-    civil_results = []
-    for loan in loans:
-        loan_id = loan.get("loan_id") or loan.get("id")
-        loan_term = int(loan.get("loan_term_months") or 0)
-        # Fetch all repayments for this loan
-        records_resp = supabase.table("loan_records").select("*").eq("loan_id", loan_id).execute()
-        records = [r for r in (records_resp.data or []) if r.get("repayment_amount") not in (None, "")]
-        if not records:
-            continue
-        # Find first and last repayment date
-        repayment_dates = sorted([r["repayment_date"] for r in records if r.get("repayment_date")])
-        if not repayment_dates:
-            continue
-        first_date = repayment_dates[0]
-        last_date = repayment_dates[-1]
-        # Calculate months taken to repay (difference in months)
-        from datetime import datetime
-        try:
-            d1 = datetime.strptime(first_date, "%Y-%m-%d")
-            d2 = datetime.strptime(last_date, "%Y-%m-%d")
-            months_taken = (d2.year - d1.year) * 12 + (d2.month - d1.month) + 1
-        except Exception:
-            months_taken = loan_term
-        # Only consider fully repaid loans
-        outstanding = 0
-        for r in records:
-            if r.get("outstanding_balance") is not None:
-                try:
-                    outstanding = float(r["outstanding_balance"])
-                except Exception:
-                    outstanding = 0
-        fully_repaid = outstanding == 0
-        if not fully_repaid:
-            continue
-        # Score logic
-        if months_taken < loan_term:
-            score = "EXCELLENT"
-            msg = f"Loan {loan_id}: Repaid in {months_taken} months (before {loan_term} months)."
-        elif months_taken == loan_term:
-            score = "GOOD"
-            msg = f"Loan {loan_id}: Repaid on time ({months_taken} months)."
-        else:
-            score = "AVERAGE"
-            msg = f"Loan {loan_id}: Repaid in {months_taken} months (after term)."
-        civil_results.append({
-            "loan_id": loan_id,
-            "loan_term": loan_term,
-            "months_taken": months_taken,
-            "score": score,
-            "message": msg
-        })
-
-    # Determine overall score
-    if not civil_results:
-        return jsonify({
-            "status": "success",
-            "score": "NO HISTORY",
-            "message": "No fully repaid loans found for this customer.",
-            "details": []
-        })
-    # If any EXCELLENT, show EXCELLENT, else if any GOOD, show GOOD, else AVERAGE
+def _overall_civil_score(civil_results):
+    """Best per-loan score wins: any EXCELLENT, else any GOOD, else AVERAGE. Returns (score, message)."""
     overall = "AVERAGE"
     for r in civil_results:
         if r["score"] == "EXCELLENT":
@@ -1119,13 +1129,127 @@ def check_civil_score():
         msg = "Good repayment history. Can provide loan."
     else:
         msg = "Average repayment history."
+    return overall, msg
 
-    return jsonify({
+@finance_bp.route('/api/check-civil-score', methods=['GET'])
+@rate_limit('civil_score', methods=('GET',))
+def check_civil_score():
+    """
+    Check civil score for a customer by customer_id or kgid.
+    Reads the precomputed row in member_credit_scores (see app.finance.credit_scores).
+    Returns: { status, score, message, details, computed_at }
+    """
+    from app.finance.credit_scores import get_score
+    customer_id = request.args.get('customer_id')
+    kgid = request.args.get('kgid')
+    if not customer_id and not kgid:
+        return jsonify({"status": "error", "message": "customer_id or kgid required"}), 400
+
+    row = get_score(customer_id=customer_id, kgid=kgid)
+    if not row:
+        return jsonify({"status": "error", "message": "Customer not found"}), 404
+
+    response = jsonify({
         "status": "success",
-        "score": overall,
-        "message": msg,
-        "details": civil_results
+        "score": row["score"],
+        "message": row["message"],
+        "details": row.get("details") or [],
+        "computed_at": row.get("computed_at"),
     })
+    # Scores only change on repayment; let the browser reuse and revalidate them
+    response.headers["Cache-Control"] = f"private, max-age={current_app.config.get('CIVIL_SCORE_MAX_AGE', 300)}"
+    response.set_etag(f"{row['customer_id']}:{row.get('computed_at')}")
+    return response.make_conditional(request)
+
+@finance_bp.route('/api/schedule/<loan_id>', methods=['GET'])
+@login_required
+@role_required('admin', 'manager', 'staff')
+def get_loan_schedule(loan_id):
+    """
+    Reducing-balance EMI schedule of a loan (LNxxxx or UUID) with repayment progress.
+    Query params (optional): as_of (YYYY-MM-DD, default today)
+    Returns: { status, loan_id, emi, term_months, total_interest, installments[], summary, as_of }
+    """
+    from app.finance.loan_schedule import cached_schedule_view
+    try:
+        as_of = request.args.get('as_of')
+        as_of = datetime.strptime(as_of, '%Y-%m-%d').date() if as_of else None
+    except ValueError:
+        return jsonify({"status": "error", "message": "as_of must be YYYY-MM-DD"}), 400
+
+    loan_resp = supabase.table("loans").select("*").eq("loan_id", loan_id).limit(1).execute()
+    if not loan_resp.data and re.match(r"^[0-9a-fA-F-]{32,36}$", loan_id):
+        loan_resp = supabase.table("loans").select("*").eq("id", loan_id).limit(1).execute()
+    if not loan_resp.data:
+        return jsonify({"status": "error", "message": "Loan not found"}), 404
+    loan = loan_resp.data[0]
+
+    def load_records():
+        keys = [k for k in (loan.get("loan_id"), loan.get("id")) if k]
+        resp = supabase.table("loan_records").select("*").in_("loan_id", keys).execute()
+        return resp.data or []
+
+    view = cached_schedule_view(loan, load_records, as_of)
+    if not view:
+        return jsonify({"status": "error", "message": "Loan has no amount, term or start date to schedule"}), 400
+    return jsonify({"status": "success", **view}), 200
+
+
+@finance_bp.route('/api/demand-list', methods=['GET'])
+@login_required
+@role_required('admin', 'manager', 'staff')
+def loan_demand_list():
+    """
+    Month-end demand list: scheduled installment (interest + principal) of every
+    approved loan falling due in the month, plus principal arrears from earlier months.
+    Query params (optional): month (YYYY-MM, default current month)
+    Returns: { status, month, month_end, rows[], totals }
+    """
+    from app.finance.loan_schedule import demand_list, month_end_of
+    from app.supabase_pages import fetch_all
+    try:
+        month_end = month_end_of(request.args.get('month') or datetime.now().date())
+    except ValueError:
+        return jsonify({"status": "error", "message": "month must be YYYY-MM"}), 400
+
+    loans = fetch_all("loans", "id,loan_id,customer_id,loan_amount,interest_rate,loan_term_months,created_at",
+                      status="approved")
+    records = fetch_all("loan_records", "id,loan_id,repayment_amount,principal_amount")
+    rows, totals = demand_list(loans, records, month_end)
+    return jsonify({
+        "status": "success",
+        "month": month_end.strftime('%Y-%m'),
+        "month_end": month_end.isoformat(),
+        "rows": rows,
+        "totals": totals,
+    }), 200
+
+@finance_bp.route('/api/batch-repayments', methods=['POST'])
+@login_required
+@role_required('admin', 'staff', 'manager')
+def batch_repayments():
+    """
+    Post a month's payroll-deduction file (CSV/XLSX) as one batch.
+    Form fields: file (required), repayment_date (YYYY-MM-DD, default today,
+    used for rows without a date), dry_run (1 = validate only).
+    Returns the batch report with one result per row; bad rows are reported, not posted.
+    """
+    from app.finance.batch_repayments import BatchFileError, run
+    upload = request.files.get('file')
+    if not upload or not upload.filename:
+        return jsonify({"status": "error", "message": "Upload a CSV or XLSX file as 'file'"}), 400
+    try:
+        default_date = request.form.get('repayment_date')
+        default_date = datetime.strptime(default_date, '%Y-%m-%d').date() if default_date else None
+    except ValueError:
+        return jsonify({"status": "error", "message": "repayment_date must be YYYY-MM-DD"}), 400
+    dry_run = request.form.get('dry_run', '').lower() in ('1', 'true', 'yes')
+    try:
+        report = run(upload.filename, upload.read(), default_date, dry_run)
+    except BatchFileError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    return jsonify({"status": "success", **report}), 200
+
 @finance_bp.route('/fd/certificate/<fdid>')
 def fd_certificate(fdid):
     """
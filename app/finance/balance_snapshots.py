@@ -0,0 +1,214 @@
+"""Month-end closing balances per member, and statements anchored on them.
+
+member_balance_snapshots holds, for every member and month-end, the savings
+balance and share capital at the close of that day
+(supabase/migrations/20261019000600). `flask close-balances` fills the months
+closed since the last run: it reads members once and the transactions dated
+after the last snapshot once, and works every month back from today's
+members.balance / share_amount in one NumPy pass. The first run backfills
+from the oldest transaction.
+
+Balances follow the statement convention: a deposit adds its amount, any
+other type takes it off. Share capital per deposit is recovered as in
+dividends.share_credits.
+
+A statement for an older window then starts from the nearest snapshot before
+it (balance_before) and reads only the days between that snapshot and the end
+of the window. Posting a transaction into an already closed month drops that
+member's later snapshots (reopen) and records the month in
+member_balance_reopened (supabase/migrations/20261019000900), so
+balance_before falls back to an earlier one until the next close-balances
+run, which starts from the earliest reopened month and fills them again;
+without any snapshot it walks back from members.balance as before.
+"""
+from datetime import date, timedelta
+
+from flask import current_app
+
+from app.supabase_pages import fetch_all
+
+TABLE = 'member_balance_snapshots'
+REOPENED = 'member_balance_reopened'
+UPSERT_CHUNK = 1000
+
+
+def _supabase():
+    from app.auth.routes import supabase
+    return supabase
+
+
+def movement(tx):
+    """Effect of a transaction (or statement event) on the savings balance.
+
+    Loan disbursements merged into statements (source 'loan') are listed as
+    deposits but never reach the savings balance.
+    """
+    if tx.get('source') == 'loan':
+        return 0.0
+    amount = float(tx.get('amount') or 0)
+    return amount if str(tx.get('type') or '').lower() == 'deposit' else -amount
+
+
+def last_month_end(today=None):
+    today = today or date.today()
+    return today.replace(day=1) - timedelta(days=1)
+
+
+def month_ends(first, last):
+    """Month-end dates from `first`'s month to `last`'s month, inclusive."""
+    ends = []
+    year, month = first.year, first.month
+    while (year, month) <= (last.year, last.month):
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+        ends.append(date(year, month, 1) - timedelta(days=1))
+    return ends
+
+
+def latest_period():
+    rows = _supabase().table(TABLE).select('period_end').order('period_end', desc=True).limit(1).execute().data
+    return date.fromisoformat(str(rows[0]['period_end'])[:10]) if rows else None
+
+
+def _reopened():
+    try:
+        return fetch_all(REOPENED, 'id,period_end')
+    except Exception as e:
+        current_app.logger.warning(f"{REOPENED} unavailable, reopened months are not refilled: {e}")
+        return []
+
+
+def close_periods(first=None, until=None):
+    """Write snapshots for each month-end from `first` to `until`.
+
+    `first` defaults to the month after the latest snapshot, or the earliest
+    reopened month if that is older; `until` to the end of last month.
+    Existing rows in the range are overwritten. Returns the number of rows
+    written.
+    """
+    import numpy as np
+    from app.finance.dividends import share_credits, transaction_arrays
+
+    until = until or last_month_end()
+    reopened = _reopened()
+    if first is None:
+        latest = latest_period()
+        first = latest + timedelta(days=1) if latest else None
+        earliest = min((date.fromisoformat(str(r['period_end'])[:10]) for r in reopened), default=None)
+        if first and earliest and earliest < first:
+            first = earliest.replace(day=1)
+    filters = (('gte', 'date', first.isoformat()),) if first else ()
+    transactions = fetch_all('transactions', 'id,customer_id,type,amount,balance_after,date,transaction_id',
+                             filters=filters)
+    if first is None:
+        dated = [str(t['date'])[:10] for t in transactions if t.get('date')]
+        first = date.fromisoformat(min(dated)) if dated else until
+    periods = month_ends(first, until)
+    if not periods:
+        return 0
+
+    members = fetch_all('members', 'id,customer_id,balance,share_amount,created_at')
+    n, k = len(members), len(periods)
+    balance = np.array([float(m.get('balance') or 0) for m in members], dtype=float)
+    share = np.array([float(m.get('share_amount') or 0) for m in members], dtype=float)
+    tx = transaction_arrays({m['customer_id']: i for i, m in enumerate(members)}, transactions)
+    signed = np.where(tx['deposit'], tx['amount'], -tx['amount'])
+    to_share = share_credits(share, tx['member'], tx['day'], tx['amount'], tx['balance_after'],
+                             tx['share_eligible'])
+    # Month of each transaction: index of the first period ending on or after it (k = after `until`)
+    bucket = np.searchsorted(np.array(periods, dtype='datetime64[D]'), tx['day'], side='left')
+    cell = tx['member'] * (k + 1) + bucket
+
+    def closing(current, weights):
+        per_month = np.bincount(cell, weights=weights, minlength=n * (k + 1)).reshape(n, k + 1)
+        later = per_month[:, ::-1].cumsum(axis=1)[:, ::-1]  # moved in this month or after
+        return np.round(current[:, None] - later[:, 1:], 2)
+
+    balances, shares = closing(balance, signed), closing(share, to_share)
+    joined = [str(m.get('created_at') or '')[:10] for m in members]
+    rows = []
+    for j, period in enumerate(periods):
+        end = period.isoformat()
+        for i, m in enumerate(members):
+            if joined[i] and joined[i] > end:
+                continue
+            rows.append({'customer_id': m['customer_id'], 'period_end': end,
+                         'balance': float(balances[i, j]), 'share_amount': float(shares[i, j])})
+    supabase = _supabase()
+    for start in range(0, len(rows), UPSERT_CHUNK):
+        supabase.table(TABLE).upsert(rows[start:start + UPSERT_CHUNK], on_conflict='customer_id,period_end').execute()
+    # Only the markers read above: a month reopened during the run stays marked
+    first_end, last_end = periods[0].isoformat(), periods[-1].isoformat()
+    refilled = [r['id'] for r in reopened if first_end <= str(r['period_end'])[:10] <= last_end]
+    for start in range(0, len(refilled), UPSERT_CHUNK):
+        supabase.table(REOPENED).delete().in_('id', refilled[start:start + UPSERT_CHUNK]).execute()
+    return len(rows)
+
+
+def reopen(customer_ids, day):
+    """Drop snapshots made stale by a transaction dated `day` (YYYY-MM-DD or date)."""
+    day = date.fromisoformat(str(day)[:10])
+    if day > last_month_end() or not customer_ids:
+        return
+    month_end = month_ends(day, day)[0]
+    supabase = _supabase()
+    try:
+        supabase.table(REOPENED).insert([{'customer_id': cid, 'period_end': month_end.isoformat()}
+                                         for cid in customer_ids]).execute()
+    except Exception as e:
+        current_app.logger.warning(f"{REOPENED} not recorded for {day}; use close-balances --from: {e}")
+    try:
+        supabase.table(TABLE).delete().in_('customer_id', list(customer_ids)) \
+            .gte('period_end', day.isoformat()).execute()
+    except Exception as e:
+        current_app.logger.warning(f"{TABLE} not reopened for {day}: {e}")
+
+
+def _snapshot_before(customer_id, day):
+    try:
+        rows = _supabase().table(TABLE).select('period_end,balance') \
+            .eq('customer_id', customer_id).lt('period_end', day.isoformat()) \
+            .order('period_end', desc=True).limit(1).execute().data
+    except Exception as e:
+        current_app.logger.warning(f"{TABLE} unavailable, walking back from members.balance: {e}")
+        return None
+    return rows[0] if rows else None
+
+
+def balance_before(customer_id, day, current_balance):
+    """Savings balance at the close of the day before `day`."""
+    supabase = _supabase()
+    snapshot = _snapshot_before(customer_id, day)
+    if snapshot:
+        gap = supabase.table('transactions').select('type,amount') \
+            .eq('customer_id', customer_id).gt('date', str(snapshot['period_end'])[:10]) \
+            .lt('date', day.isoformat()).execute().data or []
+        return round(float(snapshot['balance']) + sum(movement(t) for t in gap), 2)
+    newer = supabase.table('transactions').select('type,amount') \
+        .eq('customer_id', customer_id).gte('date', day.isoformat()).execute().data or []
+    return round(float(current_balance or 0) - sum(movement(t) for t in newer), 2)
+
+
+def statement_window(range_type, from_date, to_date):
+    """(since, until) dates of a custom statement range, else (None, None)."""
+    if range_type != 'custom' or not from_date or not to_date:
+        return None, None
+    return date.fromisoformat(from_date), date.fromisoformat(to_date)
+
+
+def with_balances(events, customer_id, current_balance, since=None, until=None):
+    """Set balance_after on statement `events` (newest first) for the window since..until.
+
+    A window reaching today is walked back from the current balance; an older
+    one is walked forward from balance_before(since).
+    """
+    if until is None or until >= date.today() or since is None:
+        running = float(current_balance or 0)
+        for ev in events:
+            ev['balance_after'] = round(running, 2)
+            running = round(running - movement(ev), 2)
+        return events
+    running = balance_before(customer_id, since, current_balance)
+    for ev in reversed(events):
+        running = round(running + movement(ev), 2)
+        ev['balance_after'] = running
+    return events
@@ -0,0 +1,259 @@
+"""Monthly payroll-deduction repayments posted as one batch.
+
+The salary-deduction file (CSV or XLSX, one row per deduction) names the
+loan by loan_id (LNxxxx or UUID) or the member by KGID, plus the amount and
+optionally the interest part and date. Each row is checked against loan
+state loaded up front - loans, members and loan_records in a few bulk reads -
+and the rows that pass are posted together:
+
+  * every loan_records row in bulk inserts;
+  * loans fully repaid by the batch marked completed in one update (their
+    sureties released in another);
+  * schedule caches and civil scores refreshed once for the whole batch;
+  * repayment receipts queued on the email outbox.
+
+Rows follow the same arithmetic as finance.repay_loan: the amount is capped
+at the outstanding principal, interest comes off the top and the rest
+reduces the principal. When the file has no interest column the interest
+is the reducing-balance figure the repayment page suggests. A bad row is
+reported and skipped; it never stops the rest of the batch.
+"""
+import re
+from datetime import date
+
+from app.supabase_pages import fetch_in
+from app.tabular_upload import UploadError as BatchFileError, read_table
+
+MAX_ROWS = 5000
+INSERT_CHUNK = 500
+
+# Accepted header spellings for each field (lower case, spaces as _)
+COLUMNS = {
+    'loan_id': ('loan_id', 'loan', 'loan_no', 'loan_number'),
+    'kgid': ('kgid', 'kgid_no', 'employee_id', 'emp_id'),
+    'amount': ('amount', 'repayment_amount', 'deduction', 'deduction_amount', 'emi'),
+    'interest_amount': ('interest_amount', 'interest'),
+    'repayment_date': ('repayment_date', 'date', 'deduction_date'),
+}
+LOAN_COLUMNS = 'id,loan_id,customer_id,loan_amount,interest_rate,status,created_at'
+RECORD_COLUMNS = 'loan_id,repayment_date,repayment_amount,remaining_principal_amount'
+UUID_RE = re.compile(r"^[0-9a-fA-F-]{32,36}$")
+
+
+def read_rows(filename, data):
+    """Rows of a CSV or XLSX deduction file."""
+    fields, rows = read_table(filename, data, COLUMNS, MAX_ROWS)
+    if 'amount' not in fields or not ({'loan_id', 'kgid'} & fields):
+        raise BatchFileError('Header must have an amount column and a loan_id or kgid column')
+    return rows
+
+
+def _money(value):
+    return round(float(value), 2)
+
+
+def _parse_date(value):
+    try:
+        return date.fromisoformat(str(value)[:10])
+    except (TypeError, ValueError):
+        return None
+
+
+def _last_repayment(records):
+    paid = [r for r in records if r.get('repayment_amount') is not None]
+    return max(paid, key=lambda r: r.get('repayment_date') or '') if paid else None
+
+
+def load_state(rows):
+    """Loans referenced by the rows, with their outstanding principal, from bulk reads."""
+    refs = [r['loan_id'] for r in rows if r.get('loan_id')]
+    uuids = [ref for ref in refs if UUID_RE.match(ref)]
+    members = fetch_in('members', 'customer_id,kgid', 'kgid', [r['kgid'] for r in rows if r.get('kgid')])
+    loans = {}
+    for column, values in (('loan_id', [ref for ref in refs if ref not in uuids]), ('id', uuids),
+                           ('customer_id', [m['customer_id'] for m in members])):
+        for loan in fetch_in('loans', LOAN_COLUMNS, column, values):
+            loans[loan['id']] = loan
+    records = fetch_in('loan_records', RECORD_COLUMNS, 'loan_id',
+                       [loan.get('loan_id') for loan in loans.values()])
+    by_loan = {}
+    for record in records:
+        by_loan.setdefault(record.get('loan_id'), []).append(record)
+    for loan in loans.values():
+        history = by_loan.get(loan.get('loan_id'), [])
+        last = _last_repayment(history)
+        if last and last.get('remaining_principal_amount') is not None:
+            loan['_remaining'] = float(last['remaining_principal_amount'])
+        else:
+            loan['_remaining'] = float(loan.get('loan_amount') or 0)
+        loan['_since'] = _parse_date((last or {}).get('repayment_date') or loan.get('created_at'))
+        loan['_posted'] = {(str(r.get('repayment_date'))[:10], _money(r['repayment_amount']))
+                           for r in history if r.get('repayment_amount') is not None}
+    return {
+        'loans': loans,
+        'by_ref': {key: loan for loan in loans.values() for key in (loan['id'], loan.get('loan_id')) if key},
+        'kgid_customer': {m['kgid']: m['customer_id'] for m in members},
+    }
+
+
+def _find_loan(row, state):
+    if row.get('loan_id'):
+        loan = state['by_ref'].get(row['loan_id'])
+        return (loan, None) if loan else (None, f"Loan {row['loan_id']} not found")
+    customer_id = state['kgid_customer'].get(row['kgid'])
+    if not customer_id:
+        return None, f"No member with KGID {row['kgid']}"
+    active = [loan for loan in state['loans'].values()
+              if loan.get('customer_id') == customer_id and loan.get('status') == 'approved']
+    if not active:
+        return None, f"Member {customer_id} has no approved loan"
+    if len(active) > 1:
+        return None, f"Member {customer_id} has {len(active)} approved loans; give the loan_id"
+    return active[0], None
+
+
+def plan(rows, state, default_date=None):
+    """Validate rows in file order against `state`, updating it as rows are accepted.
+
+    Returns one result per row: status 'ok' with the loan_records values to
+    insert, or 'error' with a message.
+    """
+    from app.finance.loan_schedule import expected_interest
+    default_date = default_date or date.today()
+    results = []
+    for row in rows:
+        result = {'row': row['row'], 'loan_id': row.get('loan_id'), 'kgid': row.get('kgid')}
+        results.append(result)
+
+        def fail(message):
+            result.update(status='error', message=message)
+
+        loan, error = _find_loan(row, state)
+        if error:
+            fail(error)
+            continue
+        result.update(loan_id=loan.get('loan_id'), customer_id=loan.get('customer_id'))
+        if loan.get('status') != 'approved':
+            fail(f"Loan status is {loan.get('status')}")
+            continue
+        try:
+            amount = _money(row['amount'].replace(',', ''))
+        except (KeyError, ValueError):
+            fail('Invalid amount')
+            continue
+        try:
+            paid_on = date.fromisoformat(row['repayment_date'][:10]) if row.get('repayment_date') else default_date
+        except ValueError:
+            fail('Invalid repayment_date (use YYYY-MM-DD)')
+            continue
+        outstanding = loan['_remaining']
+        if amount <= 0 or outstanding <= 0:
+            fail('No outstanding balance or invalid amount.')
+            continue
+        if (paid_on.isoformat(), amount) in loan['_posted']:
+            fail('Already posted (same loan, date and amount)')
+            continue
+
+        repayment = min(amount, outstanding)
+        if row.get('interest_amount'):
+            try:
+                interest = _money(row['interest_amount'].replace(',', ''))
+            except ValueError:
+                fail('Invalid interest_amount')
+                continue
+        else:
+            interest, _ = expected_interest(outstanding, loan.get('interest_rate'), loan['_since'], paid_on)
+        interest = max(0.0, min(interest, repayment))
+        principal = _money(repayment - interest)
+        remaining = _money(max(outstanding - principal, 0))
+
+        loan['_remaining'] = remaining
+        loan['_since'] = paid_on
+        loan['_posted'].add((paid_on.isoformat(), amount))
+        result.update(status='ok', loan_uuid=loan['id'], record={
+            'loan_id': loan.get('loan_id'),
+            'repayment_date': paid_on.isoformat(),
+            'repayment_amount': repayment,
+            'principal_amount': principal,
+            'interest_amount': interest,
+            'outstanding_balance': remaining,  # legacy column, as in repay_loan
+            'remaining_principal_amount': remaining,
+            'status': 'completed' if remaining == 0 else 'active',
+        })
+        if repayment < amount:
+            result['message'] = f'Amount capped at outstanding principal {repayment:.2f}'
+    return results
+
+
+def post(results):
+    """Insert the accepted rows and apply their side effects. Marks rows 'posted' or 'error'."""
+    from app.auth.routes import supabase
+    accepted = [r for r in results if r['status'] == 'ok']
+    # plan() chained each loan's remaining principal through its rows, so once a
+    # row of a loan fails its later rows would post wrong balances
+    failed_loans = set()
+    for start in range(0, len(accepted), INSERT_CHUNK):
+        chunk = []
+        for r in accepted[start:start + INSERT_CHUNK]:
+            if r['loan_uuid'] in failed_loans:
+                r.update(status='error', message='Not posted: an earlier repayment of this loan in the batch failed')
+            else:
+                chunk.append(r)
+        if not chunk:
+            continue
+        try:
+            inserted = supabase.table('loan_records').insert([r['record'] for r in chunk]).execute().data or []
+        except Exception as e:
+            for r in chunk:
+                r.update(status='error', message=f'Not posted: {e}')
+            failed_loans.update(r['loan_uuid'] for r in chunk)
+            continue
+        for r, row in zip(chunk, inserted + [{}] * (len(chunk) - len(inserted))):
+            r.update(status='posted', repayment_id=row.get('id'))
+
+    posted = [r for r in results if r['status'] == 'posted']
+    # A loan is completed by its last posted row in the batch
+    final = {}
+    for r in posted:
+        final[r['loan_uuid']] = r['record']['remaining_principal_amount']
+    completed = [loan_uuid for loan_uuid, remaining in final.items() if remaining == 0]
+    if completed:
+        supabase.table('loans').update({'status': 'completed'}).in_('id', completed) \
+            .eq('status', 'approved').execute()
+        supabase.table('sureties').update({'active': False}).in_('loan_id', completed).execute()
+
+    if posted:
+        from app.finance.loan_schedule import invalidate
+        from app.finance.credit_scores import refresh_members
+        from app.finance.api import send_repayment_receipts
+        from app.notification.outbox import send_later
+        invalidate(*{key for r in posted for key in (r['loan_id'], r['loan_uuid'])})
+        refresh_members(sorted({r['customer_id'] for r in posted}))
+        send_later(send_repayment_receipts,
+                   [(r['customer_id'], r['loan_id'], r['repayment_id']) for r in posted if r.get('repayment_id')])
+    return completed
+
+
+def run(filename, data, default_date=None, dry_run=False):
+    """Read, validate and (unless dry_run) post a deduction file. Returns the batch report."""
+    rows = read_rows(filename, data)
+    results = plan(rows, load_state(rows), default_date)
+    completed = [] if dry_run else post(results)
+    ok = [r for r in results if r['status'] in ('ok', 'posted')]
+    for r in results:
+        r.pop('loan_uuid', None)
+        record = r.pop('record', None)
+        if record:
+            r.update({k: record[k] for k in ('repayment_date', 'repayment_amount', 'principal_amount',
+                                             'interest_amount', 'remaining_principal_amount')})
+    return {
+        'dry_run': dry_run,
+        'rows': len(results),
+        'accepted': len(ok),
+        'errors': len(results) - len(ok),
+        'loans_completed': len(completed),
+        'total_amount': _money(sum(r['repayment_amount'] for r in ok)),
+        'total_interest': _money(sum(r['interest_amount'] for r in ok)),
+        'total_principal': _money(sum(r['principal_amount'] for r in ok)),
+        'results': results,
+    }
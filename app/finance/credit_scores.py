@@ -0,0 +1,146 @@
+"""Precomputed civil (credit) scores, one row per member in member_credit_scores.
+
+The scoring rules are unchanged (_civil_score_for_loan and
+_overall_civil_score in app.finance.api); what changes is when they run:
+
+  refresh_all()            every member from three bulk reads
+                           (`flask refresh-credit-scores`, e.g. nightly from cron)
+  refresh_member(cid)      one member, after a repayment or loan completion
+  refresh_members(cids)    a set of members, after a batch of repayments
+  get_score(...)           one indexed read; members not scored yet are
+                           scored on first request
+
+Table definition: supabase/migrations/20261019000100_member_credit_scores.sql
+"""
+from datetime import datetime, timezone
+
+from flask import current_app
+
+from app.supabase_pages import fetch_all, fetch_in
+
+TABLE = 'member_credit_scores'
+NO_HISTORY = 'NO HISTORY'
+NO_HISTORY_MESSAGE = 'No fully repaid loans found for this customer.'
+UPSERT_CHUNK = 500
+
+LOAN_COLUMNS = 'id,loan_id,customer_id,loan_term_months'
+RECORD_COLUMNS = 'id,loan_id,repayment_date,repayment_amount,outstanding_balance'
+
+
+def _supabase():
+    from app.auth.routes import supabase
+    return supabase
+
+
+def score_member(member, loans, records_by_loan, computed_at):
+    """member_credit_scores row for one member from their loans and {loan key: records}."""
+    from app.finance.api import _civil_score_for_loan, _overall_civil_score
+    details = []
+    for loan in loans:
+        result = _civil_score_for_loan(loan, records_by_loan.get(loan.get('loan_id') or loan.get('id'), []))
+        if result:
+            details.append(result)
+    if details:
+        score, message = _overall_civil_score(details)
+    else:
+        score, message = NO_HISTORY, NO_HISTORY_MESSAGE
+    return {
+        'customer_id': member['customer_id'],
+        'kgid': member.get('kgid'),
+        'score': score,
+        'message': message,
+        'details': details,
+        'loans_scored': len(details),
+        'computed_at': computed_at,
+    }
+
+
+def _group(rows, key):
+    groups = {}
+    for row in rows:
+        groups.setdefault(row.get(key), []).append(row)
+    return groups
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _store(members, loans, records, chunk):
+    loans_by_member = _group(loans, 'customer_id')
+    records_by_loan = _group(records, 'loan_id')
+    computed_at = _now()
+    rows = [score_member(m, loans_by_member.get(m['customer_id'], []), records_by_loan, computed_at)
+            for m in members if m.get('customer_id')]
+    supabase = _supabase()
+    for start in range(0, len(rows), chunk):
+        supabase.table(TABLE).upsert(rows[start:start + chunk], on_conflict='customer_id').execute()
+    return len(rows)
+
+
+def refresh_all(chunk=UPSERT_CHUNK):
+    """Recompute and store every member's score. Returns the number of rows written."""
+    return _store(fetch_all('members', 'id,customer_id,kgid'), fetch_all('loans', LOAN_COLUMNS),
+                  fetch_all('loan_records', RECORD_COLUMNS), chunk)
+
+
+def refresh_members(customer_ids, chunk=UPSERT_CHUNK):
+    """refresh_member() for many members with three reads in total. Returns rows written (0 on failure)."""
+    try:
+        members = fetch_in('members', 'customer_id,kgid', 'customer_id', customer_ids)
+        loans = fetch_in('loans', LOAN_COLUMNS, 'customer_id', [m['customer_id'] for m in members])
+        records = fetch_in('loan_records', RECORD_COLUMNS, 'loan_id',
+                           [loan.get('loan_id') or loan.get('id') for loan in loans])
+        return _store(members, loans, records, chunk)
+    except Exception as e:
+        current_app.logger.warning(f"credit score refresh failed for {len(customer_ids)} members: {e}")
+        return 0
+
+
+def refresh_member(customer_id):
+    """Recompute and store one member's score. Returns the row, or None if there is no such member.
+
+    Called from repayment paths, so failures are logged rather than raised;
+    a row that could not be stored is still returned.
+    """
+    if not customer_id:
+        return None
+    supabase = _supabase()
+    try:
+        member = supabase.table('members').select('customer_id,kgid').eq('customer_id', customer_id) \
+            .limit(1).execute().data
+        if not member:
+            return None
+        loans = supabase.table('loans').select(LOAN_COLUMNS).eq('customer_id', customer_id).execute().data or []
+        keys = [loan.get('loan_id') or loan.get('id') for loan in loans]
+        records = []
+        if keys:
+            records = supabase.table('loan_records').select(RECORD_COLUMNS).in_('loan_id', keys).execute().data or []
+        row = score_member(member[0], loans, _group(records, 'loan_id'), _now())
+    except Exception as e:
+        current_app.logger.warning(f"credit score refresh failed for {customer_id}: {e}")
+        return None
+    try:
+        supabase.table(TABLE).upsert(row, on_conflict='customer_id').execute()
+    except Exception as e:
+        current_app.logger.warning(f"credit score for {customer_id} not stored: {e}")
+    return row
+
+
+def get_score(customer_id=None, kgid=None):
+    """Stored score row by customer_id or kgid; scores the member on first use. None if unknown."""
+    column, value = ('customer_id', customer_id) if customer_id else ('kgid', kgid)
+    supabase = _supabase()
+    try:
+        rows = supabase.table(TABLE).select('*').eq(column, value).limit(1).execute().data
+    except Exception as e:
+        current_app.logger.warning(f"{TABLE} read failed, scoring live: {e}")
+        rows = None
+    if rows:
+        return rows[0]
+    if column == 'kgid':
+        member = supabase.table('members').select('customer_id').eq('kgid', kgid).limit(1).execute().data
+        if not member:
+            return None
+        customer_id = member[0]['customer_id']
+    return refresh_member(customer_id)
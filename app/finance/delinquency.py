@@ -0,0 +1,98 @@
+"""Portfolio-at-risk (PAR) and overdue aging for all approved loans.
+
+Days past due (DPD) of a loan = days since the earliest installment of its
+EMI schedule (app.finance.loan_schedule) that the principal repaid so far
+does not cover. Loans are bucketed by DPD and PAR-n is the share of the
+outstanding principal sitting in loans more than n days past due.
+
+Everything is computed over (loan x installment) arrays in one pass; the
+only per-row Python work is reading the Supabase rows.
+
+Imports NumPy; load it lazily from request handlers.
+"""
+from datetime import date
+
+import numpy as np
+
+from app.finance.loan_schedule import build_schedules, repaid_principal
+from app.supabase_pages import fetch_all
+
+# (label, lowest DPD in bucket); a loan goes in the last bucket whose bound it reaches
+AGING_BUCKETS = (('current', 0), ('1-30', 1), ('31-60', 31), ('61-90', 61), ('90+', 91))
+PAR_THRESHOLDS = (30, 60, 90)
+
+
+def aging(loans, records, as_of=None):
+    """Per-loan DPD rows plus bucket and PAR summaries.
+
+    Returns (rows, summary). rows are in `loans` order (unschedulable loans
+    left out) with loan_id, customer_id, outstanding, dpd, bucket,
+    overdue_installments and oldest_due_date.
+    """
+    as_of = as_of or date.today()
+    sched = build_schedules(loans)
+    n = len(sched.loans)
+    repaid = repaid_principal(sched.loans, records)
+    outstanding = np.maximum(np.round(sched.amount - repaid, 2), 0.0)
+
+    if n:
+        cum_principal = np.cumsum(sched.principal, axis=1)
+        paid = ((cum_principal <= repaid[:, None] + 1.0) & sched.valid).sum(axis=1)
+        today = np.datetime64(as_of, 'D')
+        due = ((sched.due <= today) & sched.valid).sum(axis=1)
+        open_loan = (paid < sched.term) & (outstanding > 0)
+        oldest_unpaid = sched.due[np.arange(n), np.minimum(paid, sched.term - 1)]
+        dpd = np.where(open_loan, np.maximum((today - oldest_unpaid).astype(int), 0), 0)
+        overdue_installments = np.maximum(due - paid, 0)
+    else:
+        dpd = overdue_installments = np.zeros(0, dtype=int)
+        oldest_unpaid = np.zeros(0, dtype='datetime64[D]')
+
+    bounds = np.array([low for _, low in AGING_BUCKETS])
+    bucket = np.searchsorted(bounds, dpd, side='right') - 1
+    labels = [label for label, _ in AGING_BUCKETS]
+
+    total = float(outstanding.sum())
+    counts = np.bincount(bucket, minlength=len(labels)) if n else np.zeros(len(labels), dtype=int)
+    amounts = np.bincount(bucket, weights=outstanding, minlength=len(labels)) if n else np.zeros(len(labels))
+    summary = {
+        'as_of': as_of.isoformat(),
+        'loans': n,
+        'outstanding': round(total, 2),
+        'overdue_loans': int((dpd > 0).sum()),
+        'buckets': [{'bucket': labels[i], 'loans': int(counts[i]), 'outstanding': round(float(amounts[i]), 2),
+                     'share_pct': round(100.0 * float(amounts[i]) / total, 2) if total else 0.0}
+                    for i in range(len(labels))],
+    }
+    for days in PAR_THRESHOLDS:
+        at_risk = float(outstanding[dpd > days].sum())
+        summary[f'par{days}'] = round(at_risk, 2)
+        summary[f'par{days}_pct'] = round(100.0 * at_risk / total, 2) if total else 0.0
+
+    rows = []
+    for i, loan in enumerate(sched.loans):
+        rows.append({
+            'loan_id': loan.get('loan_id'),
+            'customer_id': loan.get('customer_id'),
+            'loan_amount': float(sched.amount[i]),
+            'outstanding': float(outstanding[i]),
+            'emi': float(sched.emi[i]),
+            'dpd': int(dpd[i]),
+            'bucket': labels[bucket[i]],
+            'overdue_installments': int(overdue_installments[i]),
+            'oldest_due_date': str(oldest_unpaid[i]) if dpd[i] > 0 else None,
+        })
+    return rows, summary
+
+
+def par_report(as_of=None):
+    """Aging of every approved loan, loading loans, loan_records and member names in bulk."""
+    loans = fetch_all('loans', 'id,loan_id,customer_id,loan_amount,interest_rate,loan_term_months,created_at',
+                      status='approved')
+    records = fetch_all('loan_records', 'id,loan_id,repayment_amount,principal_amount')
+    rows, summary = aging(loans, records, as_of)
+    names = {m['customer_id']: m.get('name') for m in fetch_all('members', 'id,customer_id,name')}
+    for row in rows:
+        row['name'] = names.get(row['customer_id'])
+    rows.sort(key=lambda r: (-r['dpd'], -r['outstanding']))
+    return rows, summary
@@ -0,0 +1,202 @@
+"""Year-end dividend on share capital.
+
+The dividend for financial year `fy` (April-March, named by the year it
+ends in: fy=2026 is 2025-04-01..2026-03-31) is `rate` % of each member's
+share capital at the end of that year. With prorate the share credited
+during the year only counts for the days it was held (product method):
+
+    eligible = opening share + sum(share credited x days held / days in year)
+
+Share capital is members.share_amount. Deposits fill it up to SHARE_CAP
+before anything reaches balance (bulk_deposits.split_deposit) but the
+transaction rows do not record the split, so each deposit's share part is
+recovered from the rows read once for the whole society:
+
+  * the member's balance moved by less than the deposit -> the difference
+    went to share (balance_after against the previous row);
+  * for the first row of a member, where there is no previous balance, the
+    deposit went to share only as far as the share after it was still
+    below the cap; a member already at the cap is taken to have been there.
+
+Share credited after the year end (the run is usually made in April or
+later) is taken off first, so the result does not depend on the run date.
+Everything after the reads is NumPy over all members at once.
+
+Credits are posted through bulk_deposits.run with max_share=0, so a
+dividend always lands in balance, as one transaction per member sharing
+transaction_id DIV-<year label>. Members who already have a transaction with
+that id are reported as already paid and skipped, so a repeated run pays
+nobody twice.
+
+Imports NumPy; load it lazily from request handlers.
+"""
+from datetime import date
+
+import numpy as np
+
+from app.staff.bulk_deposits import SHARE_CAP
+from app.supabase_pages import fetch_all
+
+MAX_RATE = 25.0
+TX_COLUMNS = 'id,customer_id,type,amount,balance_after,date,transaction_id'
+
+
+def financial_year(fy):
+    """(first day, last day, label) of the April-March year ending in `fy`."""
+    fy = int(fy)
+    return date(fy - 1, 4, 1), date(fy, 3, 31), f"{fy - 1}-{str(fy)[-2:]}"
+
+
+def transaction_id(fy):
+    return f"DIV-{financial_year(fy)[2]}"
+
+
+def _floats(rows, key):
+    return np.array([float(r[key]) if r.get(key) is not None else np.nan for r in rows], dtype=float)
+
+
+def share_credits(closing_share, member_index, days, amounts, balances, is_deposit, cap=SHARE_CAP):
+    """Share part of each transaction; arrays sorted by (member, date).
+
+    closing_share is indexed by member; the other arrays are per transaction.
+    """
+    n = len(member_index)
+    if n == 0:
+        return np.zeros(0)
+    same_member = np.r_[False, member_index[1:] == member_index[:-1]]
+    prev_balance = np.r_[np.nan, balances[:-1]]
+    known = is_deposit & same_member & np.isfinite(balances) & np.isfinite(prev_balance)
+    from_balance = np.where(known, np.clip(amounts - (balances - prev_balance), 0.0, amounts), 0.0)
+
+    # Share after each row = closing share - share credited by later rows of the member
+    running = np.cumsum(from_balance)
+    member_total = np.bincount(member_index, weights=from_balance, minlength=len(closing_share))
+    first_row = np.r_[True, ~same_member[1:]]
+    group_start = np.maximum.accumulate(np.where(first_row, np.arange(n), 0))
+    credited_so_far = running - (running[group_start] - from_balance[group_start])
+    share_after = closing_share[member_index] - (member_total[member_index] - credited_so_far)
+    by_cap = np.where(share_after < cap - 0.005, np.clip(np.minimum(amounts, share_after), 0.0, None), 0.0)
+    return np.where(known, from_balance, np.where(is_deposit, by_cap, 0.0))
+
+
+def transaction_arrays(index, transactions):
+    """Transactions of the members in `index` (customer_id -> position) as arrays sorted by (member, date, id).
+
+    Keys: member, day, amount, balance_after, deposit (type is deposit) and
+    share_eligible (a deposit that may have gone to share - not a dividend credit).
+    """
+    txs = [t for t in transactions if t.get('customer_id') in index and t.get('date')]
+    member = np.array([index[t['customer_id']] for t in txs], dtype=int)
+    days = np.array([str(t['date'])[:10] for t in txs], dtype='datetime64[D]')
+    order = np.lexsort((np.array([t.get('id') or 0 for t in txs]), days, member)) if txs else np.zeros(0, int)
+    deposit = np.array([t.get('type') == 'deposit' for t in txs], dtype=bool)
+    # Earlier dividend credits went straight to balance
+    dividend = np.array([str(t.get('transaction_id') or '').startswith('DIV-') for t in txs], dtype=bool)
+    return {
+        'member': member[order],
+        'day': days[order],
+        'amount': np.nan_to_num(_floats(txs, 'amount'))[order],
+        'balance_after': _floats(txs, 'balance_after')[order],
+        'deposit': deposit[order],
+        'share_eligible': (deposit & ~dividend)[order],
+    }
+
+
+def compute(members, transactions, fy, rate, prorate=True, cap=SHARE_CAP):
+    """Per-member dividend arrays for `members` (customer_id, share_amount) in one pass.
+
+    Returns a dict of NumPy arrays aligned with `members`: share_at_year_end,
+    opening_share, share_added, eligible_share, dividend.
+    """
+    start, end, _ = financial_year(fy)
+    closing = np.array([float(m.get('share_amount') or 0) for m in members], dtype=float)
+    tx = transaction_arrays({m['customer_id']: i for i, m in enumerate(members)}, transactions)
+    member_index, days = tx['member'], tx['day']
+    credits = share_credits(closing, member_index, days, tx['amount'], tx['balance_after'], tx['share_eligible'], cap)
+    n = len(members)
+    after_year = days > np.datetime64(end)
+    in_year = (days >= np.datetime64(start)) & ~after_year
+    year_end = np.maximum(closing - np.bincount(member_index, weights=credits * after_year, minlength=n), 0.0)
+    added = np.bincount(member_index, weights=credits * in_year, minlength=n)
+    opening = np.maximum(year_end - added, 0.0)
+    if prorate:
+        days_in_year = (end - start).days + 1
+        held = (np.datetime64(end) - days).astype(int) + 1
+        weighted = np.bincount(member_index, weights=credits * in_year * held / days_in_year, minlength=n)
+        eligible = np.minimum(opening + weighted, year_end)
+    else:
+        eligible = year_end
+    return {
+        'share_at_year_end': np.round(year_end, 2),
+        'opening_share': np.round(opening, 2),
+        'share_added': np.round(np.minimum(added, year_end), 2),
+        'eligible_share': np.round(eligible, 2),
+        'dividend': np.round(eligible * float(rate) / 100.0, 2),
+    }
+
+
+def preview(fy, rate, prorate=True):
+    """Dividend report for every member holding shares, without posting anything."""
+    rate = float(rate)
+    if not 0 < rate <= MAX_RATE:
+        raise ValueError(f'rate must be above 0 and at most {MAX_RATE:g}%')
+    start, end, label = financial_year(fy)
+    members = [m for m in fetch_all('members', 'id,customer_id,name,share_amount')
+               if float(m.get('share_amount') or 0) > 0]
+    transactions = fetch_all('transactions', TX_COLUMNS, filters=(('gte', 'date', start.isoformat()),))
+    paid = {t['customer_id'] for t in fetch_all('transactions', 'id,customer_id', transaction_id=transaction_id(fy))}
+    values = compute(members, transactions, fy, rate, prorate)
+
+    rows = []
+    for i, m in enumerate(members):
+        row = {'customer_id': m['customer_id'], 'name': m.get('name'),
+               'share_amount': round(float(m.get('share_amount') or 0), 2)}
+        row.update({key: float(column[i]) for key, column in values.items()})
+        if m['customer_id'] in paid:
+            row['status'] = 'already paid'
+        elif row['dividend'] < 0.01:
+            row['status'] = 'nothing due'
+        else:
+            row['status'] = 'ok'
+        rows.append(row)
+    due = [r for r in rows if r['status'] == 'ok']
+    return {
+        'financial_year': label,
+        'period': [start.isoformat(), end.isoformat()],
+        'rate': rate,
+        'prorate': bool(prorate),
+        'transaction_id': transaction_id(fy),
+        'members': len(rows),
+        'members_due': len(due),
+        'already_paid': sum(1 for r in rows if r['status'] == 'already paid'),
+        'total_share_at_year_end': round(float(values['share_at_year_end'].sum()), 2),
+        'total_eligible_share': round(float(values['eligible_share'].sum()), 2),
+        'total_dividend': round(sum(r['dividend'] for r in due), 2),
+        'rows': rows,
+    }
+
+
+def post(fy, rate, prorate=True, posted_on=None, notify=True):
+    """Credit every dividend still due to balance as one bulk deposit batch."""
+    from app.staff import bulk_deposits
+    report = preview(fy, rate, prorate)
+    due = [r for r in report['rows'] if r['status'] == 'ok']
+    fields = {
+        'date': (posted_on or date.today()).isoformat(),
+        'transaction_id': report['transaction_id'],
+        'from_account': 'society',
+        'to_account': 'member',
+        'from_bank_name': 'Dividend',
+        'to_bank_name': 'Savings',
+        'remarks': f"Dividend {report['financial_year']} @ {report['rate']:g}% on share capital",
+    }
+    batch = bulk_deposits.run([{'customer_id': r['customer_id'], 'amount': r['dividend']} for r in due],
+                              fields, dry_run=False, notify=notify, max_share=0)
+    for r, result in zip(due, batch['results']):
+        r['status'] = 'posted' if result['status'] == 'posted' else 'error'
+        r['stid'] = result.get('stid')
+        if result.get('message'):
+            r['message'] = result['message']
+    report.update(posted=batch['accepted'], posted_amount=batch['total_amount'],
+                  stid_from=batch['stid_from'], stid_to=batch['stid_to'])
+    return report
@@ -0,0 +1,181 @@
+"""Month-by-month projection of the whole fixed-deposit book.
+
+Uses the same interest rules as app.staff.api._fd_interest, applied to
+arrays instead of one deposit at a time:
+
+  * an FD matures after tenure x 30 days and then pays quarterly compound
+    interest at its contracted rate;
+  * closed earlier, it pays simple interest at the tiered premature rate
+    (nothing under 30 days).
+
+For each month-end in the horizon project_fd_book() reports what matures in
+that month (count, principal, interest, cash outflow) and the liability on
+the FDs still running at month-end: interest accrued on the contract, and
+what would be payable if they were all closed prematurely that day. FDs are
+assumed to be paid out at maturity and not renewed.
+
+Imports NumPy; load it lazily from request handlers.
+"""
+from datetime import date, timedelta
+
+import numpy as np
+
+QUARTERS_PER_YEAR = 4
+
+# (upper bound in months, rate % p.a.) - see _fd_premature_rate
+PREMATURE_TIERS = ((3, 3.0), (6, 6.0), (9, 7.0))
+PREMATURE_TOP_RATE = 9.0
+
+
+def premature_rates(days):
+    """Vector form of _fd_premature_rate()."""
+    days = np.asarray(days, dtype=float)
+    months = days / 30.0
+    conditions = [days < 30] + [months <= bound for bound, _ in PREMATURE_TIERS]
+    choices = [0.0] + [rate for _, rate in PREMATURE_TIERS]
+    return np.select(conditions, choices, default=PREMATURE_TOP_RATE)
+
+
+def maturity_interest(principal, rate, tenure_m):
+    """Quarterly compound interest for the full tenure, rounded to paise."""
+    principal, rate, tenure_m = (np.asarray(a, dtype=float) for a in (principal, rate, tenure_m))
+    years = tenure_m / 12.0
+    growth = (1 + (rate / 100) / QUARTERS_PER_YEAR) ** (QUARTERS_PER_YEAR * years)
+    return np.where((rate > 0) & (years > 0), np.round(principal * growth - principal, 2), 0.0)
+
+
+def fd_interest(principal, rate, tenure_m, days):
+    """Vector form of _fd_interest(): (interest, applied_rate, is_premature) arrays.
+
+    Arguments broadcast against each other, so `days` may be a matrix of
+    (deposit x date) holding periods.
+    """
+    principal, rate, tenure_m, days = np.broadcast_arrays(
+        *(np.asarray(a, dtype=float) for a in (principal, rate, tenure_m, days)))
+    full_days = np.maximum(1, tenure_m * 30)
+    is_premature = days < full_days
+    penalty_rate = premature_rates(days)
+    simple = np.round(principal * penalty_rate * (days / 365.0) / 100.0, 2)
+    interest = np.where(is_premature, simple, maturity_interest(principal, rate, tenure_m))
+    applied_rate = np.where(is_premature, penalty_rate, rate)
+    return interest, applied_rate, is_premature
+
+
+def contract_accrual(principal, rate, tenure_m, days):
+    """Compound interest earned so far on the contract (reaches the maturity interest at maturity)."""
+    principal, rate, tenure_m, days = np.broadcast_arrays(
+        *(np.asarray(a, dtype=float) for a in (principal, rate, tenure_m, days)))
+    full_days = np.maximum(1, tenure_m * 30)
+    years = tenure_m / 12.0 * np.clip(days / full_days, 0.0, 1.0)
+    growth = (1 + (rate / 100) / QUARTERS_PER_YEAR) ** (QUARTERS_PER_YEAR * years)
+    return np.where(rate > 0, principal * (growth - 1), 0.0)
+
+
+def month_ends(start, months):
+    """`months` month-end dates, the first being the end of `start`'s month."""
+    ends = []
+    year, month = start.year, start.month
+    for _ in range(months):
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+        ends.append(date(year, month, 1) - timedelta(days=1))
+    return ends
+
+
+def _parse_date(value):
+    try:
+        return date.fromisoformat(str(value)[:10])
+    except (TypeError, ValueError):
+        return None
+
+
+def book_arrays(fds):
+    """Columns (principal, rate, tenure_m, deposit ordinal) for FD rows; rows without a deposit date are skipped."""
+    rows = []
+    for fd in fds:
+        deposited = _parse_date(fd.get('deposit_date'))
+        if deposited is None:
+            continue
+        try:
+            rows.append((float(fd.get('amount') or 0), float(fd.get('interest_rate') or 0),
+                         int(fd.get('tenure') or 0), deposited.toordinal()))
+        except (TypeError, ValueError):
+            continue
+    if not rows:
+        return (np.zeros(0),) * 4
+    return tuple(np.array(col, dtype=float) for col in zip(*rows))
+
+
+def project_fd_book(fds, as_of=None, months=12):
+    """Project active FDs (rows of fixed_deposits) over `months` month-ends from `as_of`.
+
+    Returns {'as_of', 'months': [per-month dict], 'overdue': {...}, 'totals': {...}}.
+    'overdue' covers FDs already past maturity on `as_of` but not yet closed;
+    they are owed now and are not repeated in the monthly rows.
+    """
+    as_of = as_of or date.today()
+    principal, rate, tenure_m, deposited = book_arrays(fds)
+    ends = month_ends(as_of, months)
+    end_ord = np.array([d.toordinal() for d in ends], dtype=float)
+
+    full_days = np.maximum(1, tenure_m * 30)
+    matures = deposited + full_days
+    due_interest = maturity_interest(principal, rate, tenure_m)
+
+    # Month bucket of each maturity: -1 = already overdue, `months` = beyond horizon
+    bucket = np.searchsorted(end_ord, matures, side='left')
+    bucket = np.where(matures <= as_of.toordinal(), -1, bucket)
+    in_horizon = (bucket >= 0) & (bucket < months)
+    idx = bucket[in_horizon].astype(int)
+
+    def per_month(weights=None):
+        return np.bincount(idx, weights=weights, minlength=months)[:months]
+
+    count = per_month()
+    maturing_principal = per_month(principal[in_horizon])
+    maturing_interest = per_month(due_interest[in_horizon])
+
+    # (deposit x month-end) holding periods for FDs still running at each month-end
+    held = end_ord[None, :] - deposited[:, None]
+    running = (held >= 0) & (end_ord[None, :] < matures[:, None])
+    held = np.where(running, held, 0.0)
+    accrued = np.where(running, contract_accrual(principal[:, None], rate[:, None], tenure_m[:, None], held), 0.0)
+    payable, _, _ = fd_interest(principal[:, None], rate[:, None], tenure_m[:, None], held)
+    payable = np.where(running, payable, 0.0)
+    running_principal = np.where(running, principal[:, None], 0.0)
+
+    rows = []
+    for i, end in enumerate(ends):
+        rows.append({
+            'month': end.strftime('%Y-%m'),
+            'month_end': end.isoformat(),
+            'maturing_count': int(count[i]),
+            'maturing_principal': round(float(maturing_principal[i]), 2),
+            'maturing_interest': round(float(maturing_interest[i]), 2),
+            'maturity_outflow': round(float(maturing_principal[i] + maturing_interest[i]), 2),
+            'active_count': int(running[:, i].sum()),
+            'active_principal': round(float(running_principal[:, i].sum()), 2),
+            'accrued_interest': round(float(accrued[:, i].sum()), 2),
+            'premature_payable_interest': round(float(payable[:, i].sum()), 2),
+        })
+
+    overdue = bucket == -1
+    overdue_principal = float(principal[overdue].sum())
+    overdue_interest = float(due_interest[overdue].sum())
+    return {
+        'as_of': as_of.isoformat(),
+        'months': rows,
+        'overdue': {
+            'count': int(overdue.sum()),
+            'principal': round(overdue_principal, 2),
+            'interest': round(overdue_interest, 2),
+            'outflow': round(overdue_principal + overdue_interest, 2),
+        },
+        'totals': {
+            'fd_count': int(principal.size),
+            'principal': round(float(principal.sum()), 2),
+            'maturing_count': int(count.sum()),
+            'maturing_principal': round(float(maturing_principal.sum()), 2),
+            'maturing_interest': round(float(maturing_interest.sum()), 2),
+            'maturity_outflow': round(float(maturing_principal.sum() + maturing_interest.sum()), 2),
+        },
+    }
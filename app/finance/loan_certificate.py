@@ -1,18 +1,16 @@
 from flask import Blueprint, render_template, request, abort, make_response,jsonify
 from supabase import create_client
 import os
-import inflect
+from app.number_words import inflect_engine
 from datetime import datetime
 
 loan_cert_bp = Blueprint('loan_cert', __name__)
 
 # Helper for amount in words
-p = inflect.engine()
-
 def amount_to_words(amount):
     try:
         n = int(float(amount))
-        words = p.number_to_words(n, andword='').replace(',', '')
+        words = inflect_engine().number_to_words(n, andword='').replace(',', '')
         return words.title() + " Rupees Only"
     except Exception:
         return str(amount)
@@ -0,0 +1,322 @@
+"""Reducing-balance EMI schedules for the loan book.
+
+build_schedules() lays out every installment of many loans at once as
+(loan x installment) arrays. It steps through the installment columns once,
+working on all loans together rather than looping loan by loan:
+
+    EMI          E = P r (1+r)^n / ((1+r)^n - 1),  r = annual rate / 1200
+    interest k   = B(k-1) r, rounded half up to the paisa
+    principal k  = E - interest k,  B(k) = B(k-1) - principal k,  B(0) = P
+
+The ledger is kept in whole paise (and the rate in basis points), so each
+installment is worked from the rounded balance before it in exact integer
+arithmetic, as a month-by-month schedule would be.
+The last installment (or the one that clears the balance early) takes
+whatever principal is left.
+The first installment falls due one month after the loan was created.
+
+Per-loan views (schedule + repayment progress) are cached in
+app.local_store under "loan_schedule:v2:<loan_id>" and must be dropped with
+invalidate() whenever a repayment is recorded for the loan.
+
+Imports NumPy; load it lazily from request handlers.
+"""
+from collections import namedtuple
+from datetime import date, datetime
+
+import numpy as np
+
+from app.local_store import get_store
+
+CACHE_PREFIX = 'loan_schedule:v2:'
+CACHE_TTL = 24 * 3600
+# Principal paid within this much of the schedule counts as that installment paid
+PAID_TOLERANCE = 1.0
+
+Schedules = namedtuple('Schedules', 'loans amount rate term emi due interest principal closing valid')
+
+
+def _parse_date(value):
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(str(value)[:10])
+    except ValueError:
+        return None
+
+
+def monthly_rate(annual_rate):
+    return np.asarray(annual_rate, dtype=float) / 1200.0
+
+
+def emi(principal, annual_rate, months):
+    """Equated monthly installment, rounded to paise (principal / n at 0%)."""
+    principal = np.asarray(principal, dtype=float)
+    months = np.maximum(np.asarray(months, dtype=float), 1)
+    r = monthly_rate(annual_rate)
+    growth = (1 + r) ** months
+    with np.errstate(divide='ignore', invalid='ignore'):
+        amortizing = principal * r * growth / (growth - 1)
+    return np.round(np.where(r > 0, amortizing, principal / months), 2)
+
+
+def _due_dates(start, months):
+    """(loan x installment) due dates: start + k months, day clipped to month length."""
+    start = np.asarray(start, dtype='datetime64[D]')
+    start_month = start.astype('datetime64[M]')
+    day = (start - start_month.astype('datetime64[D]')).astype(int)
+    k = np.arange(1, months + 1)
+    due_month = start_month[:, None] + k[None, :]
+    month_len = ((due_month + 1).astype('datetime64[D]') - due_month.astype('datetime64[D]')).astype(int)
+    return due_month.astype('datetime64[D]') + np.minimum(day[:, None], month_len - 1)
+
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def numeric_column(rows, key):
+    """float array of rows[i][key]; missing or unparseable values become NaN."""
+    values = [row.get(key) for row in rows]
+    try:
+        return np.array(values, dtype=float)
+    except (TypeError, ValueError):
+        return np.array([_number(v) for v in values], dtype=float)
+
+
+def date_column(rows, key):
+    """datetime64[D] array of the date part of rows[i][key]; bad values become NaT."""
+    values = [str(row.get(key) or 'NaT')[:10] for row in rows]
+    try:
+        return np.array(values, dtype='datetime64[D]')
+    except ValueError:
+        parsed = [_parse_date(v) for v in values]
+        return np.array([d if d else 'NaT' for d in parsed], dtype='datetime64[D]')
+
+
+def build_schedules(loans):
+    """Schedules for rows of `loans` (loan_amount, interest_rate, loan_term_months, created_at).
+
+    Loans without a positive amount/term or a start date are left out;
+    Schedules.loans holds the rows that were scheduled, in order.
+    """
+    loans = list(loans)
+    amount = numeric_column(loans, 'loan_amount')
+    rate = np.nan_to_num(numeric_column(loans, 'interest_rate'))
+    term = np.nan_to_num(numeric_column(loans, 'loan_term_months')).astype(int)
+    start = date_column(loans, 'created_at')
+    keep = np.flatnonzero((amount > 0) & (term > 0) & ~np.isnat(start))
+
+    if not keep.size:
+        empty = np.zeros((0, 0))
+        return Schedules([], np.zeros(0), np.zeros(0), np.zeros(0, dtype=int), np.zeros(0),
+                         empty.astype('datetime64[D]'), empty, empty, empty, empty.astype(bool))
+
+    kept = [loans[i] for i in keep]
+    amount, rate, term, start = amount[keep], rate[keep], term[keep], start[keep]
+
+    months = int(term.max())
+    valid = np.arange(1, months + 1)[None, :] <= term[:, None]
+    installment = emi(amount, rate, term)
+    interest = np.zeros((len(kept), months))
+    principal = np.zeros_like(interest)
+    closing = np.zeros_like(interest)
+
+    # Paise and basis points keep every step exact; interest rounds half up
+    balance = np.rint(amount * 100).astype(np.int64)
+    installment_paise = np.rint(installment * 100).astype(np.int64)
+    rate_bp = np.rint(rate * 100).astype(np.int64)
+    for k in range(months):
+        due = valid[:, k]
+        charge = (balance * rate_bp + 60000) // 120000
+        # Last installment settles whatever principal is left after rounding
+        part = np.where(k == term - 1, balance, np.minimum(installment_paise - charge, balance))
+        interest[:, k] = np.where(due, charge, 0.0)
+        principal[:, k] = np.where(due, part, 0.0)
+        balance = balance - np.where(due, part, 0)
+        closing[:, k] = np.where(due, balance, 0.0)
+
+    return Schedules(kept, amount, rate, term, installment, _due_dates(start, months),
+                     interest / 100, principal / 100, closing / 100, valid)
+
+
+def repaid_principal(loans, records):
+    """Principal repaid per scheduled loan, from loan_records keyed by LNxxxx or UUID."""
+    index = {}
+    for i, loan in enumerate(loans):
+        for key in (loan.get('loan_id'), loan.get('id')):
+            if key:
+                index[key] = i
+    payments = [rec for rec in records if rec.get('repayment_amount') is not None]
+    idx = np.fromiter(map(index.get, (rec.get('loan_id') for rec in payments), [-1] * len(payments)),
+                      dtype=np.int64, count=len(payments))
+    amounts = np.nan_to_num(numeric_column(payments, 'principal_amount'))
+    mine = idx >= 0
+    return np.bincount(idx[mine], weights=amounts[mine], minlength=len(loans)).astype(float)
+
+
+def progress(sched, repaid, as_of):
+    """Per-loan (installments paid, installments due by as_of, principal arrears)."""
+    cum_principal = np.cumsum(sched.principal, axis=1)
+    paid = ((cum_principal <= repaid[:, None] + PAID_TOLERANCE) & sched.valid).sum(axis=1)
+    due = ((sched.due <= np.datetime64(as_of, 'D')) & sched.valid).sum(axis=1)
+    idx = np.arange(len(sched.loans))
+    scheduled_by_now = np.where(due > 0, cum_principal[idx, np.maximum(due - 1, 0)], 0.0)
+    arrears = np.maximum(np.round(scheduled_by_now - repaid, 2), 0.0)
+    return paid, due, arrears
+
+
+def _months_between(earlier, later):
+    months = (later.year - earlier.year) * 12 + later.month - earlier.month
+    if later.day < earlier.day:
+        months -= 1
+    return max(months, 0)
+
+
+def expected_interest(outstanding, annual_rate, since, as_of):
+    """Interest due on `outstanding` for whole months since `since` (at least one month).
+
+    The same reducing-balance formula staff apply by hand on the repayment
+    page: outstanding x rate x months / 12.
+    """
+    months = max(1, _months_between(since, as_of)) if since else 1
+    return round(float(outstanding) * float(annual_rate or 0) / 1200.0 * months, 2), months
+
+
+def _fingerprint(loan):
+    return [str(loan.get(k)) for k in ('loan_amount', 'interest_rate', 'loan_term_months', 'created_at', 'status')]
+
+
+def _last_repayment(records):
+    paid = [r for r in records if r.get('repayment_amount') is not None]
+    return max(paid, key=lambda r: r.get('repayment_date') or '') if paid else None
+
+
+def schedule_view(loan, records, as_of=None):
+    """JSON-ready schedule of one loan, with per-installment status and a repayment suggestion."""
+    as_of = as_of or date.today()
+    sched = build_schedules([loan])
+    if not sched.loans:
+        return None
+    repaid = repaid_principal(sched.loans, records)
+    paid, due, arrears = progress(sched, repaid, as_of)
+    n = int(sched.term[0])
+
+    last = _last_repayment(records)
+    if last and last.get('remaining_principal_amount') is not None:
+        outstanding = float(last['remaining_principal_amount'])
+    else:
+        outstanding = max(float(sched.amount[0]) - float(repaid[0]), 0.0)
+    since = _parse_date(last.get('repayment_date')) if last else _parse_date(loan.get('created_at'))
+    interest, months = expected_interest(outstanding, sched.rate[0], since, as_of)
+
+    installments = []
+    for i in range(n):
+        status = 'paid' if i < paid[0] else ('overdue' if i < due[0] else 'upcoming')
+        installments.append({
+            'no': i + 1,
+            'due_date': str(sched.due[0, i]),
+            'emi': round(float(sched.interest[0, i] + sched.principal[0, i]), 2),
+            'interest': float(sched.interest[0, i]),
+            'principal': float(sched.principal[0, i]),
+            'closing_balance': float(sched.closing[0, i]),
+            'status': status,
+        })
+    next_due = next((row for row in installments if row['status'] != 'paid'), None)
+    return {
+        'loan_id': loan.get('loan_id'),
+        'emi': float(sched.emi[0]),
+        'term_months': n,
+        'total_interest': round(float(sched.interest[0].sum()), 2),
+        'installments': installments,
+        'summary': {
+            'installments_paid': int(paid[0]),
+            'installments_due': int(due[0]),
+            'overdue_installments': max(int(due[0]) - int(paid[0]), 0),
+            'principal_arrears': float(arrears[0]),
+            'outstanding_principal': round(outstanding, 2),
+            'next_due_date': next_due['due_date'] if next_due else None,
+            'suggested_interest': interest,
+            'suggested_interest_months': months,
+        },
+        'as_of': as_of.isoformat(),
+    }
+
+
+def cached_schedule_view(loan, load_records, as_of=None):
+    """schedule_view() through the per-loan cache; load_records() is only called on a miss."""
+    from app.metrics import record_cache
+    as_of = as_of or date.today()
+    key = f"{CACHE_PREFIX}{loan.get('loan_id') or loan.get('id')}"
+    store = get_store()
+    entry = store.get(key)
+    if entry and entry.get('fingerprint') == _fingerprint(loan) and entry.get('as_of') == as_of.isoformat():
+        record_cache('loan_schedule', True)
+        return entry['view']
+    record_cache('loan_schedule', False)
+    view = schedule_view(loan, load_records(), as_of)
+    store.set(key, {'fingerprint': _fingerprint(loan), 'as_of': as_of.isoformat(), 'view': view}, CACHE_TTL)
+    return view
+
+
+def invalidate(*loan_ids):
+    """Drop cached views for these loans (pass both the LNxxxx id and the UUID when known)."""
+    store = get_store()
+    for loan_id in loan_ids:
+        if loan_id:
+            store.delete(f"{CACHE_PREFIX}{loan_id}")
+
+
+def demand_list(loans, records, month_end):
+    """Installments falling due in month_end's month for each loan, plus arrears up to the month.
+
+    Returns (rows, totals); rows only include loans with something to collect.
+    """
+    sched = build_schedules(loans)
+    if not sched.loans:
+        return [], {'loans': 0, 'interest': 0.0, 'principal': 0.0, 'arrears': 0.0, 'demand': 0.0}
+    repaid = repaid_principal(sched.loans, records)
+    month_start = np.datetime64(month_end, 'M').astype('datetime64[D]')
+    in_month = (sched.due >= month_start) & (sched.due <= np.datetime64(month_end, 'D')) & sched.valid
+    # Arrears: principal scheduled before this month but not yet repaid
+    before = (sched.due < month_start) & sched.valid
+    scheduled_before = np.where(before, sched.principal, 0.0).sum(axis=1)
+    arrears = np.maximum(np.round(scheduled_before - repaid, 2), 0.0)
+    demand_interest = np.where(in_month, sched.interest, 0.0).sum(axis=1)
+    demand_principal = np.where(in_month, sched.principal, 0.0).sum(axis=1)
+    installment_no = np.where(in_month.any(axis=1), in_month.argmax(axis=1) + 1, 0)
+    total = np.round(demand_interest + demand_principal + arrears, 2)
+
+    rows = []
+    for i in np.flatnonzero(total > 0):
+        loan = sched.loans[i]
+        rows.append({
+            'loan_id': loan.get('loan_id'),
+            'customer_id': loan.get('customer_id'),
+            'installment_no': int(installment_no[i]) or None,
+            'due_date': str(sched.due[i, installment_no[i] - 1]) if installment_no[i] else None,
+            'emi': float(sched.emi[i]),
+            'interest_due': round(float(demand_interest[i]), 2),
+            'principal_due': round(float(demand_principal[i]), 2),
+            'principal_arrears': float(arrears[i]),
+            'total_demand': float(total[i]),
+        })
+    totals = {
+        'loans': len(rows),
+        'interest': round(float(demand_interest.sum()), 2),
+        'principal': round(float(demand_principal.sum()), 2),
+        'arrears': round(float(arrears.sum()), 2),
+        'demand': round(float(total.sum()), 2),
+    }
+    return rows, totals
+
+
+def month_end_of(value):
+    """Last day of the month of a date or 'YYYY-MM' string."""
+    if isinstance(value, str):
+        value = datetime.strptime(value[:7], '%Y-%m').date()
+    month = np.datetime64(value, 'M')
+    return ((month + 1).astype('datetime64[D]') - 1).astype(date)
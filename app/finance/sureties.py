@@ -0,0 +1,105 @@
+"""Guarantor (surety) lookups backed by members.active_surety_count.
+
+A member may stand surety for at most MAX_ACTIVE_SURETIES approved loans.
+The count of their active sureties rows is kept on the member row by a
+trigger (supabase/migrations/20261019000200_member_active_surety_count.sql),
+so checking any number of guarantors is a single members query. Until that
+migration is applied the counts are taken from sureties in one grouped read.
+"""
+from flask import current_app
+
+from app.media_cache import thumbnail_url
+
+MAX_ACTIVE_SURETIES = 2
+MEMBER_COLUMNS = 'customer_id,name,phone,photo_url,signature_url'
+
+
+def _supabase():
+    from app.auth.routes import supabase
+    return supabase
+
+
+def _clean_ids(customer_ids):
+    ids = []
+    for cid in customer_ids or []:
+        cid = str(cid or '').strip()
+        if cid and cid not in ids:
+            ids.append(cid)
+    return ids
+
+
+def _count_active(supabase, customer_ids):
+    rows = supabase.table('sureties').select('surety_customer_id') \
+        .in_('surety_customer_id', customer_ids).eq('active', True).execute().data or []
+    counts = {}
+    for row in rows:
+        counts[row['surety_customer_id']] = counts.get(row['surety_customer_id'], 0) + 1
+    return counts
+
+
+def surety_exposure(customer_ids):
+    """{customer_id: member row + active_surety_count} for the members that exist."""
+    ids = _clean_ids(customer_ids)
+    if not ids:
+        return {}
+    supabase = _supabase()
+    try:
+        rows = supabase.table('members').select(MEMBER_COLUMNS + ',active_surety_count') \
+            .in_('customer_id', ids).execute().data or []
+    except Exception as e:
+        current_app.logger.warning(f"members.active_surety_count unavailable, counting sureties: {e}")
+        rows = supabase.table('members').select(MEMBER_COLUMNS).in_('customer_id', ids).execute().data or []
+    members = {row['customer_id']: row for row in rows}
+    uncounted = [cid for cid, row in members.items() if row.get('active_surety_count') is None]
+    if uncounted:
+        counts = _count_active(supabase, uncounted)
+        for cid in uncounted:
+            members[cid]['active_surety_count'] = counts.get(cid, 0)
+    return members
+
+
+def check_guarantors(customer_ids, borrower_id=None):
+    """Eligibility of each requested guarantor, in request order.
+
+    Each result carries the member's name, phone, photo, photo thumbnail and
+    signature URLs, active_loan_count, `available` and, when unavailable, a
+    `reason`.
+    """
+    requested = [str(cid or '').strip() for cid in customer_ids or []]
+    members = surety_exposure(requested)
+    borrower_id = str(borrower_id or '').strip()
+    seen = set()
+    results = []
+    for cid in requested:
+        member = members.get(cid)
+        result = {'customer_id': cid, 'found': member is not None, 'available': False}
+        if member:
+            result.update({
+                'name': member.get('name'),
+                'phone': member.get('phone'),
+                'photo_url': member.get('photo_url'),
+                'photo_thumb_url': thumbnail_url(member.get('photo_url')),
+                'signature_url': member.get('signature_url'),
+                'active_loan_count': member['active_surety_count'],
+            })
+        if not cid:
+            result['reason'] = 'Missing customer_id'
+        elif member is None:
+            result['reason'] = 'Customer not found'
+        elif borrower_id and cid == borrower_id:
+            result['reason'] = 'Borrower cannot be their own surety'
+        elif cid in seen:
+            result['reason'] = 'Same surety entered more than once'
+        elif member['active_surety_count'] >= MAX_ACTIVE_SURETIES:
+            result['reason'] = f'Customer is already a surety for {MAX_ACTIVE_SURETIES} active loans'
+        else:
+            result['available'] = True
+        seen.add(cid)
+        results.append(result)
+    return results
+
+
+def deactivate_for_loan(loan_uuid):
+    """Release a loan's guarantors (loan rejected or fully repaid)."""
+    if loan_uuid:
+        _supabase().table('sureties').update({'active': False}).eq('loan_id', loan_uuid).execute()
@@ -0,0 +1,188 @@
+"""Per-request performance instrumentation.
+
+init_app(app) installs hooks that time every request and attribute the time
+spent in Supabase (each postgrest `.execute()`), SMTP, PDF rendering and
+image processing.
+Each response gets a Server-Timing header and one structured log line on the
+`app.perf` logger; requests issuing more than QUERY_BUDGET Supabase queries
+are logged as warnings.
+"""
+import importlib.abc
+import importlib.machinery
+import json
+import logging
+import smtplib
+import sys
+import time
+from functools import wraps
+
+from flask import g, has_request_context, request
+
+perf_logger = logging.getLogger('app.perf')
+
+# kind -> Server-Timing metric name
+TRACKED_KINDS = ('db', 'smtp', 'pdf', 'img')
+
+
+def current_stats():
+    """The stats dict of the active request, or None outside a request."""
+    if not has_request_context():
+        return None
+    return g.get('_perf')
+
+
+_listeners = []
+
+
+def add_listener(fn):
+    """Call fn(kind, seconds) for every tracked call, in or out of a request."""
+    if fn not in _listeners:
+        _listeners.append(fn)
+
+
+def record(kind, seconds):
+    for fn in _listeners:
+        try:
+            fn(kind, seconds)
+        except Exception:
+            pass
+    stats = current_stats()
+    if stats is None:
+        return
+    stats[kind + '_ms'] += seconds * 1000.0
+    stats[kind + '_count'] += 1
+
+
+class track:
+    """Context manager attributing a block to kind ('db', 'smtp', 'pdf', 'img')."""
+
+    def __init__(self, kind):
+        self.kind = kind
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record(self.kind, time.perf_counter() - self.start)
+        return False
+
+
+def _wrap(owner, attr, kind):
+    original = getattr(owner, attr, None)
+    if original is None or getattr(original, '_perf_kind', None):
+        return
+    @wraps(original)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return original(*args, **kwargs)
+        finally:
+            record(kind, time.perf_counter() - start)
+    wrapper._perf_kind = kind
+    setattr(owner, attr, wrapper)
+
+
+class _PostImportHook(importlib.abc.MetaPathFinder):
+    """Run callback(module) once `name` has been imported, without importing it now."""
+
+    def __init__(self, name, callback):
+        self.name = name
+        self.callback = callback
+
+    def find_spec(self, fullname, path, target=None):
+        if fullname != self.name:
+            return None
+        sys.meta_path.remove(self)
+        spec = importlib.machinery.PathFinder.find_spec(fullname, path)
+        if spec is None or spec.loader is None:
+            return spec
+        exec_module = spec.loader.exec_module
+        callback = self.callback
+
+        def exec_and_patch(module):
+            exec_module(module)
+            callback(module)
+        spec.loader.exec_module = exec_and_patch
+        return spec
+
+
+def when_imported(name, callback):
+    """Call callback(module) now if `name` is loaded, else right after its first import."""
+    if name in sys.modules:
+        callback(sys.modules[name])
+    elif not any(isinstance(f, _PostImportHook) and f.name == name for f in sys.meta_path):
+        sys.meta_path.insert(0, _PostImportHook(name, callback))
+
+
+def install_hooks():
+    """Patch the client libraries once per process; safe to call repeatedly."""
+    try:
+        from postgrest._sync import request_builder as rb
+        for name in ('SyncQueryRequestBuilder', 'SyncSingleRequestBuilder',
+                     'SyncMaybeSingleRequestBuilder', 'SyncExplainRequestBuilder'):
+            cls = getattr(rb, name, None)
+            if cls is not None and 'execute' in cls.__dict__:
+                _wrap(cls, 'execute', 'db')
+    except Exception as e:
+        print(f"Supabase instrumentation skipped: {e}")
+    for attr in ('connect', 'login', 'sendmail', 'quit'):
+        _wrap(smtplib.SMTP, attr, 'smtp')
+    # xhtml2pdf is imported lazily by the PDF views; patch it when that happens
+    when_imported('xhtml2pdf.pisa', lambda pisa: _wrap(pisa, 'CreatePDF', 'pdf'))
+
+
+def _before_request():
+    stats = {'start': time.perf_counter()}
+    for kind in TRACKED_KINDS:
+        stats[kind + '_ms'] = 0.0
+        stats[kind + '_count'] = 0
+    g._perf = stats
+
+
+def _after_request(response):
+    from flask import current_app
+    stats = g.pop('_perf', None)
+    if stats is None:
+        return response
+    total_ms = (time.perf_counter() - stats['start']) * 1000.0
+    cfg = current_app.config
+    if cfg.get('SERVER_TIMING_ENABLED', True):
+        parts = [f"app;dur={total_ms:.1f}"]
+        for kind in TRACKED_KINDS:
+            if stats[kind + '_count']:
+                parts.append(f'{kind};dur={stats[kind + "_ms"]:.1f};desc="{stats[kind + "_count"]} calls"')
+        response.headers['Server-Timing'] = ', '.join(parts)
+    if cfg.get('PERF_LOG_ENABLED', True) and request.endpoint != 'static':
+        budget = int(cfg.get('QUERY_BUDGET') or 0)
+        over_budget = bool(budget) and stats['db_count'] > budget
+        line = {
+            'method': request.method,
+            'path': request.path,
+            'endpoint': request.endpoint,
+            'status': response.status_code,
+            'ms': round(total_ms, 1),
+            'db_queries': stats['db_count'],
+            'db_ms': round(stats['db_ms'], 1),
+            'smtp_ms': round(stats['smtp_ms'], 1),
+            'pdf_ms': round(stats['pdf_ms'], 1),
+            'img_ms': round(stats['img_ms'], 1),
+        }
+        if over_budget:
+            line['over_query_budget'] = budget
+            perf_logger.warning(json.dumps(line))
+        else:
+            perf_logger.info(json.dumps(line))
+    return response
+
+
+def init_app(app):
+    install_hooks()
+    if not perf_logger.handlers and not logging.getLogger().handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter('%(asctime)s %(name)s %(levelname)s %(message)s'))
+        perf_logger.addHandler(handler)
+    if perf_logger.level == logging.NOTSET:
+        perf_logger.setLevel(logging.INFO)
+    app.before_request(_before_request)
+    app.after_request(_after_request)
@@ -0,0 +1,140 @@
+"""Small TTL key/value store for per-host state (rate-limit buckets, OTPs).
+
+`LOCAL_STORE_URL` selects the backend:
+  sqlite:///path.db    - one SQLite file shared by every worker on the host
+                         (default: local_store.db in the app's instance folder)
+  memory               - process memory; only for a single process (tests,
+                         `flask run`), since each gunicorn worker would get its own
+
+Values must be JSON-serialisable. All writes go through `update`, which runs a
+read-modify-write atomically for the key.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from flask import current_app
+
+
+class MemoryStore:
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+        self._ops = 0
+
+    def update(self, key, fn, ttl):
+        """Apply fn(value or None) -> (new_value, result); new_value None deletes the key."""
+        now = time.time()
+        with self._lock:
+            entry = self._data.get(key)
+            value = entry[1] if entry and entry[0] > now else None
+            new_value, result = fn(value)
+            if new_value is None:
+                self._data.pop(key, None)
+            else:
+                self._data[key] = (now + ttl, new_value)
+            self._ops += 1
+            if self._ops % 1000 == 0:
+                for k in [k for k, (exp, _) in self._data.items() if exp <= now]:
+                    self._data.pop(k, None)
+            return result
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._data.get(key)
+            return entry[1] if entry and entry[0] > now else None
+
+    def set(self, key, value, ttl):
+        self.update(key, lambda _v: (value, None), ttl)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+
+class SqliteStore:
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+    def _conn(self):
+        # Connections are per thread and per process (never reused across a fork)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL)"
+            )
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def update(self, key, fn, ttl):
+        now = time.time()
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT value, expires FROM kv WHERE key = ?", (key,)).fetchone()
+            value = json.loads(row[0]) if row and row[1] > now else None
+            new_value, result = fn(value)
+            if new_value is None:
+                conn.execute("DELETE FROM kv WHERE key = ?", (key,))
+            else:
+                conn.execute(
+                    "INSERT OR REPLACE INTO kv (key, value, expires) VALUES (?, ?, ?)",
+                    (key, json.dumps(new_value), now + ttl),
+                )
+            if int(now) % 60 == 0:
+                conn.execute("DELETE FROM kv WHERE expires <= ?", (now,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return result
+
+    def get(self, key):
+        row = self._conn().execute("SELECT value, expires FROM kv WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row and row[1] > time.time() else None
+
+    def set(self, key, value, ttl):
+        self.update(key, lambda _v: (value, None), ttl)
+
+    def delete(self, key):
+        self._conn().execute("DELETE FROM kv WHERE key = ?", (key,))
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def default_url(app):
+    """LOCAL_STORE_URL, else a SQLite file in the instance folder (memory when testing)."""
+    url = app.config.get('LOCAL_STORE_URL')
+    if url:
+        return url
+    if app.testing:
+        return 'memory'
+    os.makedirs(app.instance_path, exist_ok=True)
+    return 'sqlite:///' + os.path.join(app.instance_path, 'local_store.db')
+
+
+def get_store(url=None):
+    """Return the process-wide store for url (defaults to LOCAL_STORE_URL)."""
+    if url is None:
+        try:
+            url = default_url(current_app)
+        except RuntimeError:
+            url = os.environ.get('LOCAL_STORE_URL', 'memory')
+    with _stores_lock:
+        store = _stores.get(url)
+        if store is None:
+            if url.startswith('sqlite:///'):
+                store = SqliteStore(url[len('sqlite:///'):])
+            else:
+                store = MemoryStore()
+            _stores[url] = store
+        return store
@@ -9,8 +9,13 @@ from . import routes
 from . import api  # noqa: F401
 
 def register_cli(app):
-    from .cli import create_manager
+    from .cli import close_balances, create_manager, import_records, post_repayments, refresh_credit_scores, startup_profile
     app.cli.add_command(create_manager)
+    app.cli.add_command(startup_profile)
+    app.cli.add_command(refresh_credit_scores)
+    app.cli.add_command(post_repayments)
+    app.cli.add_command(import_records)
+    app.cli.add_command(close_balances)
 
 def init_login(app):
     login_manager.init_app(app)
@@ -25,3 +30,8 @@ def init_login(app):
 # flask create-manager <username> <email> <password>
 # Example:
 # flask create-manager admin admin@example.com StrongPassword123
+# flask startup-profile [--budget-ms 2000]
+# flask refresh-credit-scores
+# flask post-repayments deductions.xlsx [--date 2026-10-31] [--dry-run]
+# flask import-records old_ledger.xlsx [--dry-run] [--chunk 200] [--checkpoint PATH]
+# flask close-balances [--from 2024-04]
@@ -6,9 +6,11 @@ from werkzeug.utils import secure_filename
 from io import BytesIO
 from supabase import create_client, Client
 from dotenv import load_dotenv
+from app.rate_limit import rate_limit
+from app.otp_store import issue_otp, verify_otp, discard_otp
+from app.image_utils import PHOTO, SIGNATURE, ImageProcessingError, store_images
 import smtplib
 from email.mime.text import MIMEText
-from PIL import Image  # add back PIL import
 
 # Reuse the manager blueprint defined in app.manager.__init__
 from . import manager_bp
@@ -57,36 +59,20 @@ def send_otp_email(email, otp):
         raise RuntimeError(f"SMTP error occurred: {e}")
 
 @manager_bp.route('/add-staff/send-otp', methods=['POST'])
+@rate_limit('otp')
 def send_staff_otp():
     email = request.form.get('email')
     if not email or not re.match(r"[^@]+@[^@]+\.[^@]+", email):
         return jsonify({'status': 'error', 'message': 'Invalid email'}), 400
-    otp = str(uuid.uuid4().int)[-6:]
+    # OTP lives in the OTP store; the staff row is only written by add_staff
+    otp = issue_otp('staff_registration', email)
     try:
-        # Upsert staff row with email and OTP (other fields can be null/empty for now)
-        supabase.table("staff").upsert({
-            "email": email,
-            "otp": otp
-        }, on_conflict=["email"]).execute()
         send_otp_email(email, otp)
     except Exception as e:
+        discard_otp('staff_registration', email)
         return jsonify({'status': 'error', 'message': 'Failed to send OTP', 'error': str(e)}), 500
     return jsonify({'status': 'success', 'message': 'OTP sent'})
 
-def compress_image(file_storage, max_size_kb=100):
-    img = Image.open(file_storage)
-    img_format = img.format if img.format else 'JPEG'
-    quality = 85
-    buffer = BytesIO()
-    img.save(buffer, format=img_format, optimize=True, quality=quality)
-    while buffer.tell() > max_size_kb * 1024 and quality > 10:
-        quality -= 5
-        buffer.seek(0)
-        buffer.truncate()
-        img.save(buffer, format=img_format, optimize=True, quality=quality)
-    buffer.seek(0)
-    return buffer
-
 @manager_bp.route('/add-staff', methods=['POST'])
 def add_staff():
     # Validate required fields
@@ -101,16 +87,9 @@ def add_staff():
         return jsonify({'status': 'error', 'message': 'Invalid email format'}), 400
 
     # OTP check
-    otp = data['otp']
-    # Fetch staff row by email
-    staff_rows = supabase.table("staff").select("otp").eq("email", data['email']).execute()
-    if not staff_rows.data or not staff_rows.data[0].get("otp"):
-        return jsonify({'status': 'error', 'message': 'OTP not found for this email'}), 400
-    stored_otp = staff_rows.data[0]["otp"]
-    if otp != stored_otp:
-        return jsonify({'status': 'error', 'message': 'Invalid or expired OTP'}), 400
-    # Optionally: clear OTP after use (set to NULL)
-    supabase.table("staff").update({"otp": None}).eq("email", data['email']).execute()
+    ok, otp_error = verify_otp('staff_registration', data['email'], data['otp'])
+    if not ok:
+        return jsonify({'status': 'error', 'message': otp_error}), 400
 
     # File validation (just check presence)
     photo = request.files.get('photo')
@@ -120,30 +99,22 @@ def add_staff():
     if not signature:
         return jsonify({'status': 'error', 'message': 'Missing signature file'}), 400
 
-    # Unique filenames
-    photo_filename = f"{uuid.uuid4().hex}_{secure_filename(photo.filename)}"
-    signature_filename = f"{uuid.uuid4().hex}_{secure_filename(signature.filename)}"
-
-    # Compress images before upload
-    try:
-        photo_buffer = compress_image(photo)
-        signature_buffer = compress_image(signature)
-    except Exception as e:
-        return jsonify({'status': 'error', 'message': 'Image processing failed', 'error': str(e)}), 400
-
-    # Upload to Supabase Storage - with compression, no mimetype
-    try:
-        bucket = supabase.storage.from_(SUPABASE_BUCKET)
-        bucket.upload(photo_filename, photo_buffer.read())
-        bucket.upload(signature_filename, signature_buffer.read())
-        photo_url = f"{STORAGE_PUBLIC_PATH}/{photo_filename}"
-        signature_url = f"{STORAGE_PUBLIC_PATH}/{signature_filename}"
-    except Exception as e:
-        return jsonify({
-            'status': 'error', 
-            'message': 'Image upload failed',
-            'error': str(e)
-        }), 500
+    # Resize/compress and upload photo and signature in parallel (image plus thumbnail each)
+    bucket = supabase.storage.from_(SUPABASE_BUCKET)
+    results = store_images(bucket, [(photo, PHOTO), (signature, SIGNATURE)])
+    for _name, err in results:
+        if isinstance(err, ImageProcessingError):
+            return jsonify({'status': 'error', 'message': 'Image processing failed', 'error': str(err)}), 400
+    for _name, err in results:
+        if err is not None:
+            return jsonify({
+                'status': 'error', 
+                'message': 'Image upload failed',
+                'error': str(err)
+            }), 500
+    (photo_filename, _), (signature_filename, _) = results
+    photo_url = f"{STORAGE_PUBLIC_PATH}/{photo_filename}"
+    signature_url = f"{STORAGE_PUBLIC_PATH}/{signature_filename}"
 
     # Prepare staff data for upsert
     staff_data = {
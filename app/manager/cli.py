@@ -1,5 +1,6 @@
 import click
 from flask import current_app
+from flask.cli import with_appcontext
 from werkzeug.security import generate_password_hash
 import os
 import httpx
@@ -40,3 +41,216 @@ def create_manager(username, email, password):
         click.echo("Manager created successfully.")
     else:
         click.echo(f"Error: {response.text}")
+
+
+# Modules timed by `flask startup-profile`, in the order create_app() pulls them in.
+PROFILED_MODULES = (
+    "flask",
+    "supabase",
+    "app.auth.routes",
+    "app.members.routes",
+    "app.staff.api",
+    "app.manager.api",
+    "app.finance.api",
+    "app.admin.api",
+    "app.admin.loan_views",
+    "app.certificate",
+)
+# Libraries that only specific views need; none of them should load at start-up.
+HEAVY_MODULES = ("pandas", "numpy", "PIL.Image", "xhtml2pdf.pisa", "reportlab", "inflect", "openpyxl")
+
+_PROBE = """
+import json, os, sys, time
+def rss():
+    # current RSS in KB; ru_maxrss would carry over the parent's peak across fork
+    try:
+        with open("/proc/self/statm") as fh:
+            return int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except (OSError, ValueError, AttributeError):
+        return 0
+before = rss()
+start = time.perf_counter()
+{stmt}
+elapsed = time.perf_counter() - start
+heavy = [m for m in {heavy!r} if m in sys.modules]
+print(json.dumps({{"ms": elapsed * 1000.0, "rss_kb": rss() - before, "heavy": heavy}}))
+"""
+
+_CREATE_APP = """import contextlib, io
+with contextlib.redirect_stdout(io.StringIO()):
+    from app import create_app
+    create_app()"""
+
+
+def _probe(stmt, importtime=False):
+    """Run stmt in a fresh interpreter; returns (result dict, -X importtime lines)."""
+    import json
+    import subprocess
+    import sys
+    root = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir, os.pardir))
+    cmd = [sys.executable]
+    if importtime:
+        cmd += ["-X", "importtime"]
+    cmd += ["-c", _PROBE.format(stmt=stmt, heavy=HEAVY_MODULES)]
+    proc = subprocess.run(cmd, cwd=root, capture_output=True, text=True)
+    if proc.returncode != 0:
+        tail = proc.stderr.strip().splitlines()[-1:] or ["no output"]
+        raise click.ClickException(f"probe failed: {tail[0]}")
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    return result, [l for l in proc.stderr.splitlines() if l.startswith("import time:")]
+
+
+def _slowest_imports(lines, top):
+    rows = []
+    for line in lines:
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        name = parts[2].rstrip()
+        depth = (len(name) - len(name.lstrip())) // 2
+        if depth <= 1:
+            rows.append((int(parts[1]) / 1000.0, name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+@click.command("startup-profile")
+@click.option("--budget-ms", type=float, default=None, help="Fail if create_app() takes longer than this.")
+@click.option("--top", type=int, default=10, show_default=True, help="Slowest top-level imports to list.")
+def startup_profile(budget_ms, top):
+    """Time and measure memory of each import a worker pays at start-up.
+
+    Every row runs in a fresh interpreter, so the numbers are what that
+    import costs on its own (including everything it pulls in). Exits 1 if
+    create_app() imports a heavy library or exceeds --budget-ms.
+    """
+    click.echo(f"{'import':28s} {'ms':>9s} {'RSS +MB':>12s}  heavy libs loaded")
+    for module in PROFILED_MODULES:
+        res, _ = _probe(f"import {module}")
+        click.echo(f"{module:28s} {res['ms']:9.1f} {res['rss_kb'] / 1024.0:12.1f}  {', '.join(res['heavy']) or '-'}")
+    res, lines = _probe(_CREATE_APP, importtime=True)
+    click.echo(f"{'create_app()':28s} {res['ms']:9.1f} {res['rss_kb'] / 1024.0:12.1f}  {', '.join(res['heavy']) or '-'}")
+
+    slowest = _slowest_imports(lines, top)
+    if slowest:
+        click.echo("\nSlowest imports under create_app() (cumulative):")
+        for ms, name in slowest:
+            click.echo(f"  {ms:9.1f} ms  {name}")
+
+    failures = []
+    if res["heavy"]:
+        failures.append(f"create_app() imported {', '.join(res['heavy'])}; import them inside the views that need them")
+    if budget_ms is not None and res["ms"] > budget_ms:
+        failures.append(f"create_app() took {res['ms']:.0f} ms, over the {budget_ms:.0f} ms budget")
+    for msg in failures:
+        click.echo(f"FAIL: {msg}", err=True)
+    if failures:
+        raise SystemExit(1)
+
+
+@click.command("refresh-credit-scores")
+@with_appcontext
+def refresh_credit_scores():
+    """Recompute every member's civil score into member_credit_scores.
+
+    Repayments keep individual members up to date; run this nightly (cron)
+    to pick up anything written outside the app, and once after deploying
+    the member_credit_scores migration.
+    """
+    import time
+    from app.finance.credit_scores import refresh_all
+    start = time.perf_counter()
+    written = refresh_all()
+    click.echo(f"{written} member scores written in {time.perf_counter() - start:.1f}s")
+
+
+
+@click.command("close-balances")
+@click.option("--from", "first", default=None, help="Recompute month-ends from this month (YYYY-MM); "
+              "default: the months closed since the last run.")
+@with_appcontext
+def close_balances(first):
+    """Write month-end balance snapshots per member (member_balance_snapshots).
+
+    Run monthly (cron) after the month closes. --from rebuilds older months,
+    e.g. after transactions were back-dated into them.
+    """
+    import time
+    from datetime import date
+    from app.finance.balance_snapshots import close_periods
+    try:
+        first = date.fromisoformat(f"{first}-01") if first else None
+    except ValueError:
+        raise click.ClickException("--from must be YYYY-MM")
+    start = time.perf_counter()
+    written = close_periods(first)
+    click.echo(f"{written} snapshots written in {time.perf_counter() - start:.1f}s")
+
+@click.command("post-repayments")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--date", "default_date", default=None, help="Repayment date for rows without one (YYYY-MM-DD).")
+@click.option("--dry-run", is_flag=True, help="Validate and report without posting.")
+@with_appcontext
+def post_repayments(path, default_date, dry_run):
+    """Post a payroll-deduction repayment file (CSV or XLSX) as one batch."""
+    from datetime import date
+    from app.finance.batch_repayments import BatchFileError, run
+    with open(path, "rb") as fh:
+        data = fh.read()
+    try:
+        report = run(os.path.basename(path), data,
+                     date.fromisoformat(default_date) if default_date else None, dry_run)
+    except (BatchFileError, ValueError) as e:
+        raise click.ClickException(str(e))
+    for r in report["results"]:
+        if r["status"] == "error":
+            click.echo(f"row {r['row']}: {r.get('loan_id') or r.get('kgid')}: {r['message']}")
+    verb = "valid" if dry_run else "posted"
+    click.echo(f"{report['accepted']} of {report['rows']} rows {verb}, {report['errors']} errors, "
+               f"{report['total_amount']:.2f} total, {report['loans_completed']} loans completed")
+
+
+@click.command("import-records")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--dry-run", is_flag=True, help="Validate every row and report without writing.")
+@click.option("--chunk", default=200, show_default=True, help="Rows written per chunk.")
+@click.option("--checkpoint", "checkpoint_path", default=None,
+              help="Progress file (default: PATH.checkpoint.json). Re-run to resume.")
+@with_appcontext
+def import_records(path, dry_run, chunk, checkpoint_path):
+    """Import historical member/loan/FD records (CSV or XLSX, record-entry columns)."""
+    import json
+    from app.staff import record_import as importer
+    checkpoint_path = checkpoint_path or f"{path}.checkpoint.json"
+    with open(path, "rb") as fh:
+        data = fh.read()
+    try:
+        rows = importer.read_rows(os.path.basename(path), data)
+    except importer.UploadError as e:
+        raise click.ClickException(str(e))
+
+    def load():
+        if not os.path.exists(checkpoint_path):
+            return None
+        with open(checkpoint_path) as fh:
+            return json.load(fh)
+
+    def save(state):
+        tmp = checkpoint_path + ".tmp"
+        with open(tmp, "w") as fh:
+            json.dump(state, fh)
+        os.replace(tmp, checkpoint_path)
+
+    report = importer.import_rows(rows, importer.file_digest(data), load, save, dry_run=dry_run, chunk=chunk,
+                                  progress=lambda done, total: click.echo(f"{done}/{total} rows written"))
+    for r in report["results"]:
+        for message in r["errors"]:
+            click.echo(f"row {r['row']}: {r['customer_id']}: {message}")
+        for message in r["warnings"]:
+            click.echo(f"row {r['row']}: {r['customer_id']}: warning: {message}")
+    if report["resumed_from_row"]:
+        click.echo(f"resumed after {report['resumed_from_row']} rows")
+    verb = "valid" if dry_run else "imported"
+    click.echo(f"{report['valid']} of {report['rows']} rows {verb}, {report['errors']} errors; "
+               f"sections: {report['sections']}")
+    if report["written"] is not None:
+        click.echo(f"written: {report['written']}")
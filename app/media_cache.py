@@ -0,0 +1,254 @@
+"""Local disk cache for Supabase Storage images (member photos, signatures, logo).
+
+Objects are keyed by their storage path ("<bucket>/<object>") and kept under
+MEDIA_CACHE_DIR, shared by every worker on the host. The directory is bounded
+by MEDIA_CACHE_MAX_MB with least-recently-used eviction (access time is the
+data file's mtime). A cached copy older than MEDIA_CACHE_REVALIDATE_SECONDS
+is revalidated with a conditional GET (ETag / Last-Modified); if Supabase is
+unreachable the stale copy is served.
+
+Two consumers:
+  * link_callback() for xhtml2pdf, so certificates/statements embed the
+    local file instead of fetching the URL on every render;
+  * /media/<bucket>/<object>, a same-origin proxy with long-lived cache
+    headers, used by templates through the `media` filter.
+
+thumbnail_url() (the `thumbnail` filter) points a photo URL at the small
+copy app.image_utils stores next to each upload, for avatars.
+"""
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+
+import httpx
+from flask import Blueprint, abort, current_app, has_app_context, send_file
+
+from app.auth.decorators import login_required
+from app.metrics import record_cache
+
+media_bp = Blueprint('media', __name__)
+
+PUBLIC_MARKER = '/storage/v1/object/public/'
+_KEY_RE = re.compile(r'^[A-Za-z0-9_-][A-Za-z0-9._-]*/[A-Za-z0-9._/-]+$')
+# Uploads get a uuid4 hex prefix (app.image_utils), so their content never changes
+_IMMUTABLE_RE = re.compile(r'(^|/)[0-9a-f]{32}_[^/]+$')
+
+_client = None
+_client_pid = None
+_lock = threading.Lock()
+
+
+def _cfg(name, default=None):
+    if has_app_context():
+        return current_app.config.get(name, default)
+    return default
+
+
+def cache_dir():
+    path = _cfg('MEDIA_CACHE_DIR') or os.path.join(tempfile.gettempdir(), 'society_media_cache')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _http():
+    global _client, _client_pid
+    with _lock:
+        if _client is None or _client_pid != os.getpid():
+            _client = httpx.Client(timeout=10.0, follow_redirects=True)
+            _client_pid = os.getpid()
+        return _client
+
+
+def _public_prefix():
+    base = (_cfg('SUPABASE_URL') or os.environ.get('SUPABASE_URL') or '').rstrip('/')
+    return f"{base}{PUBLIC_MARKER}"
+
+
+def storage_key(url):
+    """'<bucket>/<object>' for a public-object URL of our Supabase project or a /media/ path, else None."""
+    if not url:
+        return None
+    url = str(url)
+    if url.startswith('/media/'):
+        key = url[len('/media/'):]
+    elif url.startswith(_public_prefix()):
+        key = url[len(_public_prefix()):]
+    else:
+        return None
+    key = key.split('?', 1)[0].split('#', 1)[0]
+    if '..' in key or not _KEY_RE.match(key):
+        return None
+    return key
+
+
+def media_url(url):
+    """Jinja filter: route storage URLs through /media/; anything else is unchanged."""
+    if not _cfg('MEDIA_CACHE_ENABLED', True):
+        return url
+    key = storage_key(url)
+    return f"/media/{key}" if key else url
+
+
+def thumbnail_url(url):
+    """Public URL of the thumbnail stored next to an uploaded image; other URLs are unchanged.
+
+    Only uploads from app.image_utils have one, and older uploads may not, so
+    pages showing it fall back to the full image if it fails to load.
+    """
+    from app.image_utils import thumbnail_name
+    key = storage_key(url)
+    if not key:
+        return url
+    bucket, name = key.split('/', 1)
+    if '/' in name or not _IMMUTABLE_RE.match(name):
+        return url
+    return f"{_public_prefix()}{bucket}/{thumbnail_name(name)}"
+
+
+def _paths(key):
+    digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+    base = os.path.join(cache_dir(), digest)
+    return base + '.bin', base + '.json'
+
+
+def _write_atomic(path, data):
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, 'wb') as fh:
+        fh.write(data)
+    os.replace(tmp, path)
+
+
+def _read_meta(meta_path):
+    try:
+        with open(meta_path) as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+
+def _evict():
+    limit = int(float(_cfg('MEDIA_CACHE_MAX_MB', 200)) * 1024 * 1024)
+    entries = []
+    total = 0
+    with os.scandir(cache_dir()) as it:
+        for entry in it:
+            if not entry.name.endswith('.bin'):
+                continue
+            try:
+                st = entry.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, entry.path))
+            total += st.st_size
+    if total <= limit:
+        return
+    for _mtime, size, path in sorted(entries):
+        for victim in (path, path[:-4] + '.json'):
+            try:
+                os.remove(victim)
+            except OSError:
+                pass
+        total -= size
+        if total <= limit:
+            break
+
+
+def _origin_url(key):
+    return f"{_public_prefix()}{key}"
+
+
+def fetch(key):
+    """Local path and metadata for a storage object, fetching/revalidating as needed.
+
+    Returns (path, meta) or None when the object does not exist upstream and
+    there is no cached copy.
+    """
+    data_path, meta_path = _paths(key)
+    meta = _read_meta(meta_path) if os.path.exists(data_path) else None
+    now = time.time()
+    if meta and now - meta.get('fetched_at', 0) < float(_cfg('MEDIA_CACHE_REVALIDATE_SECONDS', 3600)):
+        record_cache('media', True)
+        os.utime(data_path)
+        return data_path, meta
+
+    headers = {}
+    if meta:
+        if meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        if meta.get('last_modified'):
+            headers['If-Modified-Since'] = meta['last_modified']
+    try:
+        resp = _http().get(_origin_url(key), headers=headers)
+    except httpx.HTTPError as e:
+        if meta:
+            current_app.logger.warning(f"media cache: serving stale {key}: {e}")
+            return data_path, meta
+        raise
+
+    if resp.status_code == 304 and meta:
+        record_cache('media', True)
+        meta['fetched_at'] = now
+        _write_atomic(meta_path, json.dumps(meta).encode('utf-8'))
+        os.utime(data_path)
+        return data_path, meta
+    record_cache('media', False)
+    if resp.status_code != 200:
+        if meta and resp.status_code >= 500:
+            return data_path, meta
+        return None
+    meta = {
+        'key': key,
+        'etag': resp.headers.get('etag'),
+        'last_modified': resp.headers.get('last-modified'),
+        'content_type': resp.headers.get('content-type', 'application/octet-stream').split(';', 1)[0],
+        'size': len(resp.content),
+        'fetched_at': now,
+    }
+    _write_atomic(data_path, resp.content)
+    _write_atomic(meta_path, json.dumps(meta).encode('utf-8'))
+    _evict()
+    return data_path, meta
+
+
+def link_callback(uri, rel):
+    """xhtml2pdf link_callback: embed storage images from the local cache."""
+    key = storage_key(uri)
+    if not key or not _cfg('MEDIA_CACHE_ENABLED', True):
+        return uri
+    try:
+        found = fetch(key)
+    except Exception as e:
+        current_app.logger.warning(f"media cache: {key} unavailable for PDF: {e}")
+        return uri
+    return found[0] if found else uri
+
+
+@media_bp.route('/media/<path:key>')
+@login_required
+def media(key):
+    key = storage_key(f"/media/{key}")
+    if not key:
+        abort(404)
+    try:
+        found = fetch(key)
+    except httpx.HTTPError:
+        abort(502)
+    if not found:
+        abort(404)
+    path, meta = found
+    immutable = bool(_IMMUTABLE_RE.search(key))
+    max_age = 365 * 24 * 3600 if immutable else 24 * 3600
+    response = send_file(path, mimetype=meta.get('content_type'), conditional=True,
+                         etag=meta.get('etag', '').strip('"') or True, max_age=max_age)
+    response.headers['Cache-Control'] = f"private, max-age={max_age}" + (", immutable" if immutable else "")
+    return response
+
+
+def init_app(app):
+    app.jinja_env.filters['media'] = media_url
+    app.jinja_env.filters['thumbnail'] = thumbnail_url
+    app.register_blueprint(media_bp)
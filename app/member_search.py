@@ -0,0 +1,377 @@
+"""Typo-tolerant member lookup by name, KGID, phone or customer_id.
+
+Each worker keeps an in-memory index of the members table:
+
+  * names as trigram postings over a phonetic key, so "Shivappa", "Sivapa"
+    and "ಶಿವಪ್ಪ" all land on the same grams (Kannada script is transliterated
+    first, then common spelling variants - sh/s, th/t, ee/i, doubled letters,
+    a trailing a - are folded);
+  * kgid, phone and customer_id (and its number without the KSTHST prefix)
+    as sorted lists for prefix search by bisect, plus reversed phone numbers
+    so the last digits of a phone also match.
+
+The index is built on the first search and kept fresh by reading only the
+members whose updated_at moved since the last refresh (at most every
+MEMBER_SEARCH_REFRESH_SECONDS; supabase/migrations/20261019000700 adds the
+column and its trigger). Without updated_at the whole table is re-read every
+MEMBER_SEARCH_FULL_REFRESH_SECONDS instead.
+
+The same index serves directory(): a compact, versioned list of every member
+that the staff dashboard caches to resolve typeahead in the browser, asking
+afterwards only for what changed since the version it holds.
+
+With MEMBER_SEARCH_BACKEND=postgres the search_members RPC from the same
+migration (pg_trgm) answers instead, for deployments that would rather not
+hold the index in every worker; it falls back to the in-memory index while
+the function is missing.
+"""
+import bisect
+import gzip
+import hashlib
+import heapq
+import json
+import re
+import threading
+import time
+import unicodedata
+from collections import defaultdict
+
+from flask import current_app, has_app_context
+
+from app.media_cache import thumbnail_url
+from app.supabase_pages import fetch_all
+
+COLUMNS = 'id,customer_id,name,kgid,phone,photo_url,status,blocked,updated_at'
+FALLBACK_COLUMNS = 'id,customer_id,name,kgid,phone,photo_url,status,blocked'
+DIRECTORY_FIELDS = ('customer_id', 'name', 'kgid', 'status', 'blocked')
+SEARCH_RPC = 'search_members'
+MIN_NAME_SCORE = 0.4
+# Defaults of MEMBER_SEARCH_REFRESH_SECONDS / MEMBER_SEARCH_FULL_REFRESH_SECONDS (app.config)
+REFRESH_SECONDS = 30
+FULL_REFRESH_SECONDS = 600
+CUSTOMER_PREFIX = 'KSTHST'
+
+# --- Kannada -> Latin ------------------------------------------------------
+
+# Long e/o are written e/o in English spellings of names (Hiremath, Gowda), so they map to e/o
+_KN_VOWELS = dict(zip('ಅಆಇಈಉಊಋಎಏಐಒಓಔ', ['a', 'aa', 'i', 'ii', 'u', 'uu', 'ru', 'e', 'e', 'ai', 'o', 'o', 'au']))
+_KN_SIGNS = dict(zip('ಾಿೀುೂೃೆೇೈೊೋೌ', ['aa', 'i', 'ii', 'u', 'uu', 'ru', 'e', 'e', 'ai', 'o', 'o', 'au']))
+_KN_CONSONANTS = dict(zip(
+    'ಕಖಗಘಙಚಛಜಝಞಟಠಡಢಣತಥದಧನಪಫಬಭಮಯರಱಲವಶಷಸಹಳೞ',
+    ['k', 'kh', 'g', 'gh', 'n', 'ch', 'chh', 'j', 'jh', 'n', 't', 'th', 'd', 'dh', 'n', 't', 'th', 'd', 'dh',
+     'n', 'p', 'ph', 'b', 'bh', 'm', 'y', 'r', 'r', 'l', 'v', 'sh', 'sh', 's', 'h', 'l', 'l']))
+_KN_OTHER = {'ಂ': 'm', 'ಃ': 'h', **{chr(0x0CE6 + d): str(d) for d in range(10)}}
+_VIRAMA = '್'
+
+
+def transliterate(text):
+    """Kannada script to plain Latin letters; anything else passes through."""
+    out = []
+    pending_a = False
+    for ch in text:
+        if ch in _KN_SIGNS:
+            out.append(_KN_SIGNS[ch])
+            pending_a = False
+            continue
+        if ch == _VIRAMA:
+            pending_a = False
+            continue
+        if pending_a:
+            out.append('a')
+            pending_a = False
+        if ch in _KN_CONSONANTS:
+            out.append(_KN_CONSONANTS[ch])
+            pending_a = True
+        else:
+            out.append(_KN_VOWELS.get(ch) or _KN_OTHER.get(ch) or ch)
+    if pending_a:
+        out.append('a')
+    return ''.join(out)
+
+
+# Applied in order to lower-case Latin text
+_FOLDS = (('ksh', 'ks'), ('x', 'ks'), ('sh', 's'), ('ch', 'c'), ('th', 't'), ('dh', 'd'), ('bh', 'b'),
+          ('ph', 'f'), ('kh', 'k'), ('gh', 'g'), ('jh', 'j'), ('w', 'v'), ('z', 'j'), ('q', 'k'), ('ck', 'k'),
+          ('ee', 'i'), ('ii', 'i'), ('oo', 'u'), ('uu', 'u'), ('aa', 'a'))
+_DOUBLED = re.compile(r'(.)\1+')
+
+
+def phonetic(text):
+    """Spelling-insensitive key of a name: 'Shivappa', 'Sivapa' and 'ಶಿವಪ್ಪ' all give 'sivap'."""
+    text = unicodedata.normalize('NFKC', transliterate(str(text or ''))).lower()
+    text = re.sub(r'[^a-z0-9]+', ' ', text)
+    for old, new in _FOLDS:
+        text = text.replace(old, new)
+    words = []
+    for word in _DOUBLED.sub(r'\1', text).split():
+        if len(word) > 3 and word[-1] in 'ay':
+            word = word[:-1] if word[-1] == 'a' else word[:-1] + 'i'
+        words.append(word)
+    return ' '.join(words)
+
+
+def trigrams(key):
+    grams = set()
+    for word in key.split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def _digits(value):
+    return re.sub(r'\D', '', str(value or ''))
+
+
+class MemberIndex:
+    """Trigram postings over names plus sorted prefix lists over ids; rebuilt on change."""
+
+    def __init__(self, members):
+        self.members = {m['customer_id']: m for m in members if m.get('customer_id')}
+        self._build()
+
+    def _build(self):
+        self.grams = {}
+        self.postings = defaultdict(set)
+        prefixes = []
+        for cid, m in self.members.items():
+            grams = trigrams(phonetic(m.get('name')))
+            self.grams[cid] = grams
+            for gram in grams:
+                self.postings[gram].add(cid)
+            upper = cid.upper()
+            prefixes.append((upper, 'customer_id', cid))
+            if upper.startswith(CUSTOMER_PREFIX):
+                prefixes.append((upper[len(CUSTOMER_PREFIX):].lstrip('0'), 'customer_id', cid))
+            if m.get('kgid'):
+                prefixes.append((str(m['kgid']).upper(), 'kgid', cid))
+            phone = _digits(m.get('phone'))[-10:]
+            if phone:
+                prefixes.append((phone, 'phone', cid))
+                prefixes.append(('~' + phone[::-1], 'phone', cid))
+        prefixes.sort()
+        self.prefixes = prefixes
+        self.prefix_keys = [p[0] for p in prefixes]
+        self.fingerprint = None
+
+    def update(self, members):
+        """Replace (or add) these members and rebuild; cheap at society size."""
+        for m in members:
+            if m.get('customer_id'):
+                self.members[m['customer_id']] = m
+        self._build()
+
+    def _prefix(self, key):
+        start = bisect.bisect_left(self.prefix_keys, key)
+        end = bisect.bisect_left(self.prefix_keys, key + '\uffff')
+        return self.prefixes[start:end]
+
+    def search(self, query, limit=10):
+        """[(score, customer_id, matched_on)] best first."""
+        query = str(query or '').strip()
+        if not query:
+            return []
+        best = {}
+
+        def offer(cid, score, field):
+            if score > best.get(cid, (0, None))[0]:
+                best[cid] = (score, field)
+
+        token = query.upper().replace(' ', '')
+        if len(token) >= 2:
+            for key, field, cid in self._prefix(token):
+                offer(cid, 1.0 if key == token else 0.9, field)
+            if token.startswith(CUSTOMER_PREFIX):
+                # A mistyped run of zeros still finds the number
+                number = token[len(CUSTOMER_PREFIX):].lstrip('0')
+                for key, field, cid in self._prefix(number):
+                    if key == number:
+                        offer(cid, 0.95, field)
+            digits = _digits(query)
+            if len(digits) >= 4 and digits == token:
+                for _key, field, cid in self._prefix('~' + digits[::-1]):
+                    offer(cid, 0.8, 'phone')
+        wanted = trigrams(phonetic(query))
+        if wanted:
+            overlap = defaultdict(int)
+            for gram in wanted:
+                for cid in self.postings.get(gram, ()):
+                    overlap[cid] += 1
+            for cid, common in overlap.items():
+                # Mostly how much of the query is found; similarity of the whole name breaks ties
+                coverage = common / len(wanted)
+                jaccard = common / (len(wanted) + len(self.grams[cid]) - common)
+                score = (2 * coverage + jaccard) / 3
+                if score >= MIN_NAME_SCORE:
+                    offer(cid, round(score * 0.95, 3), 'name')
+        top = heapq.nlargest(limit, best.items(), key=lambda item: (item[1][0], item[0]))
+        return [(score, cid, field) for cid, (score, field) in top]
+
+
+_index = None
+_last_refresh = 0.0
+_last_full = 0.0
+_high_water = None
+_has_updated_at = True
+_lock = threading.Lock()
+
+
+def _config(key, default):
+    return current_app.config.get(key, default) if has_app_context() else default
+
+
+def _refresh():
+    """Build the index, or fold in members changed since the last refresh."""
+    global _index, _last_refresh, _last_full, _high_water, _has_updated_at
+    now = time.monotonic()
+    if _index is not None and now - _last_refresh < _config('MEMBER_SEARCH_REFRESH_SECONDS', REFRESH_SECONDS):
+        return _index
+    with _lock:
+        if _index is not None and now - _last_refresh < _config('MEMBER_SEARCH_REFRESH_SECONDS', REFRESH_SECONDS):
+            return _index
+        if _index is None or now - _last_full >= _config('MEMBER_SEARCH_FULL_REFRESH_SECONDS', FULL_REFRESH_SECONDS):
+            # Periodic full read also drops deleted members
+            try:
+                members = fetch_all('members', COLUMNS) if _has_updated_at else fetch_all('members', FALLBACK_COLUMNS)
+            except Exception as e:
+                if not _has_updated_at:
+                    raise
+                current_app.logger.warning(f"members.updated_at unavailable, re-reading members periodically: {e}")
+                _has_updated_at = False
+                members = fetch_all('members', FALLBACK_COLUMNS)
+            _index = MemberIndex(members)
+            _high_water = max((str(m.get('updated_at') or '') for m in members), default='') or None
+            _last_full = now
+        elif _has_updated_at and _high_water:
+            changed = fetch_all('members', COLUMNS, filters=(('gt', 'updated_at', _high_water),))
+            if changed:
+                _index.update(changed)
+                _high_water = max(str(m.get('updated_at') or '') for m in changed) or _high_water
+        _last_refresh = now
+        return _index
+
+
+def invalidate():
+    """Drop the index so the next search rebuilds it (tests, bulk imports)."""
+    global _index
+    with _lock:
+        _index = None
+
+
+def _result(member, score, field):
+    return {
+        'customer_id': member.get('customer_id'),
+        'name': member.get('name'),
+        'kgid': member.get('kgid'),
+        'phone': member.get('phone'),
+        'photo_url': member.get('photo_url'),
+        'photo_thumb_url': thumbnail_url(member.get('photo_url')),
+        'status': member.get('status'),
+        'score': score,
+        'matched_on': field,
+    }
+
+
+_rpc_missing = False
+
+
+def _search_rpc(query, limit):
+    from app.auth.routes import supabase
+    rows = supabase.rpc(SEARCH_RPC, {'p_query': query, 'p_limit': limit}).execute().data or []
+    return [_result(r, round(float(r.get('score') or 0), 3), r.get('matched_on')) for r in rows]
+
+
+def search(query, limit=10):
+    """Ranked members matching `query` (name with typos / Kannada, or a kgid, phone or customer_id prefix)."""
+    global _rpc_missing
+    limit = max(1, min(int(limit), 50))
+    if _config('MEMBER_SEARCH_BACKEND', 'memory') == 'postgres' and not _rpc_missing:
+        try:
+            return _search_rpc(query, limit)
+        except Exception as e:
+            if 'PGRST202' not in str(e) and 'Could not find the function' not in str(e):
+                raise
+            _rpc_missing = True
+            print(f"[WARN] {SEARCH_RPC} not deployed, searching the in-memory index")
+    index = _refresh()
+    return [_result(index.members[cid], score, field) for score, cid, field in index.search(query, limit)]
+
+
+SEARCH_ROLES = ('admin', 'staff', 'manager')
+
+
+def suggest(query, limit=5):
+    """Best guesses for a lookup that found nothing exact; only for signed-in staff, never raises."""
+    from flask import has_request_context, session
+    if not has_request_context() or session.get('role') not in SEARCH_ROLES:
+        return []
+    try:
+        return search(query, limit)
+    except Exception as e:
+        print(f"[WARN] member suggestions failed: {e}")
+        return []
+
+
+# --- Typeahead directory ---------------------------------------------------
+
+def _directory_row(member):
+    row = [member.get(field) for field in DIRECTORY_FIELDS]
+    row[-1] = bool(row[-1])
+    return row
+
+
+def _version(index):
+    """'<member count>-<newest updated_at>', or a hash of the rows without updated_at."""
+    if _has_updated_at and _high_water:
+        return f"{len(index.members)}-{_high_water}"
+    if index.fingerprint is None:
+        digest = hashlib.sha1()
+        for cid in sorted(index.members):
+            digest.update(json.dumps(_directory_row(index.members[cid])).encode())
+        index.fingerprint = f"{len(index.members)}-h{digest.hexdigest()[:16]}"
+    return index.fingerprint
+
+
+def directory(since=None):
+    """Every member as a compact row (DIRECTORY_FIELDS), or only those changed after version `since`.
+
+    Returns {v, full, count, fields, rows}. A delta (full=False) carries the
+    members updated after `since`; count is the size of the whole list, so a
+    client whose merged copy comes out a different size (members deleted) asks
+    again without `since`. A version the worker cannot diff from - a hash, one
+    newer than its own index, or a delta bigger than half the list - gets the
+    full list.
+    """
+    index = _refresh()
+    version = _version(index)
+    members = index.members.values()
+    full = True
+    if since and since != version:
+        _count, _, stamp = str(since).partition('-')
+        if _has_updated_at and _high_water and stamp and not stamp.startswith('h') and stamp <= _high_water:
+            changed = [m for m in members if str(m.get('updated_at') or '') > stamp]
+            if len(changed) * 2 <= len(index.members):
+                members, full = changed, False
+    elif since:
+        members, full = [], False
+    return {
+        'v': version,
+        'full': full,
+        'count': len(index.members),
+        'fields': list(DIRECTORY_FIELDS),
+        'rows': [_directory_row(m) for m in sorted(members, key=lambda m: m['customer_id'])],
+    }
+
+
+_encoded = (None, b'', b'')
+
+
+def encode_directory(payload):
+    """(JSON bytes, gzip bytes) of a directory payload; the full list is encoded once per version."""
+    global _encoded
+    if payload['full'] and _encoded[0] == payload['v']:
+        return _encoded[1], _encoded[2]
+    body = json.dumps({'status': 'success', **payload}, separators=(',', ':')).encode()
+    packed = gzip.compress(body, 6)
+    if payload['full']:
+        _encoded = (payload['v'], body, packed)
+    return body, packed
@@ -193,18 +193,10 @@ def api_statements():
     if range_type == "last10":
         events = events[:10]
 
-    # Compute running balance_after for each event using current_balance (walk from newest -> oldest)
-    running = float(current_balance or 0)
-    for ev in events:
-        # set balance as snapshot after this event (newest first)
-        ev["balance_after"] = round(running, 2)
-        amt = float(ev.get("amount") or 0)
-        # when moving backwards: deposits increase balance going forward, so subtract deposit to step back
-        if ev.get("type") == "deposit":
-            running = round(running - amt, 2)
-        else:
-            # withdraw/withdrawal types assumed to reduce balance going forward, so add back when stepping back
-            running = round(running + amt, 2)
+    # balance_after for each event: walked back from current_balance, or forward from the
+    # month-end snapshot before from_date when the custom window ends in the past
+    from app.finance.balance_snapshots import statement_window, with_balances
+    with_balances(events, customer_id, current_balance, *statement_window(range_type, from_date, to_date))
 
     return jsonify({"status": "success", "transactions": events}), 200
 
@@ -322,8 +314,9 @@ def download_statement():
         # Pure Python PDF generation using xhtml2pdf (no external binaries required)
         try:
             from xhtml2pdf import pisa
+            from app.media_cache import link_callback
             pdf_io = io.BytesIO()
-            pisa_status = pisa.CreatePDF(html_content, dest=pdf_io)
+            pisa_status = pisa.CreatePDF(html_content, dest=pdf_io, link_callback=link_callback)
             if pisa_status.err:
                 raise Exception("xhtml2pdf failed to generate PDF")
             pdf_io.seek(0)
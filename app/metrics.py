@@ -0,0 +1,249 @@
+"""Prometheus-format metrics without extra dependencies.
+
+Counters, gauges and histograms are kept in process memory. When METRICS_DIR
+is set (one directory per deployment, shared by the gunicorn workers), each
+worker periodically writes its snapshot to METRICS_DIR/metrics_<pid>.json and
+/metrics merges every file, so a scrape sees the whole server regardless of
+which worker answers it. Counters and histograms are summed; gauges are
+summed as well (e.g. queue depth across workers).
+
+The /metrics endpoint is open to logged-in managers/admins or to a scraper
+presenting `Authorization: Bearer <METRICS_TOKEN>`.
+"""
+import atexit
+import glob
+import hmac
+import json
+import os
+import threading
+import time
+
+from flask import Blueprint, Response, current_app, g, jsonify, request, session
+
+metrics_bp = Blueprint('metrics', __name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_registry = {}
+_lock = threading.Lock()
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+
+    def _key(self, labels):
+        return tuple(str(labels.get(n, '')) for n in self.labelnames)
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1.0, **labels):
+        key = self._key(labels)
+        with _lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        with _lock:
+            self._values[self._key(labels)] = float(value)
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with _lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry['counts'][i] += 1
+                    break
+            entry['sum'] += value
+            entry['count'] += 1
+
+
+def _register(metric):
+    _registry[metric.name] = metric
+    return metric
+
+
+def counter(name, help_text, labelnames=()):
+    return _registry.get(name) or _register(Counter(name, help_text, labelnames))
+
+
+def gauge(name, help_text, labelnames=()):
+    return _registry.get(name) or _register(Gauge(name, help_text, labelnames))
+
+
+def histogram(name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+    return _registry.get(name) or _register(Histogram(name, help_text, labelnames, buckets))
+
+
+REQUEST_LATENCY = histogram('http_request_duration_seconds', 'Request latency by blueprint', ('blueprint', 'method'))
+REQUESTS = counter('http_requests_total', 'Requests by blueprint and status', ('blueprint', 'method', 'status'))
+SUPABASE_QUERIES = counter('supabase_queries_total', 'Supabase queries issued, by blueprint', ('blueprint',))
+SUPABASE_RETRIES = counter('supabase_retries_total', 'Supabase calls retried by sb_exec after a protocol error')
+PDF_RENDER = histogram('pdf_render_seconds', 'xhtml2pdf render duration')
+SMTP_CALLS = histogram('smtp_call_seconds', 'SMTP connect/login/send duration')
+CACHE_REQUESTS = counter('cache_requests_total', 'Cache lookups by cache and result', ('cache', 'result'))
+
+
+def record_cache(cache, hit):
+    CACHE_REQUESTS.inc(cache=cache, result='hit' if hit else 'miss')
+
+
+def _snapshot():
+    with _lock:
+        out = {}
+        for name, m in _registry.items():
+            values = []
+            for key, val in m._values.items():
+                if isinstance(val, dict):
+                    val = dict(val, counts=list(val['counts']))
+                values.append([list(key), val])
+            out[name] = values
+        return out
+
+
+def _flush(directory):
+    path = os.path.join(directory, f"metrics_{os.getpid()}.json")
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as fh:
+        json.dump(_snapshot(), fh)
+    os.replace(tmp, path)
+
+
+def _merged():
+    """Merge this process with the snapshots of every other worker."""
+    merged = {}
+
+    def add(name, key, val):
+        m = _registry.get(name)
+        if m is None:
+            return
+        bucket = merged.setdefault(name, {})
+        key = tuple(key)
+        if m.kind == 'histogram':
+            cur = bucket.setdefault(key, {'counts': [0] * len(m.buckets), 'sum': 0.0, 'count': 0})
+            cur['counts'] = [a + b for a, b in zip(cur['counts'], val['counts'])]
+            cur['sum'] += val['sum']
+            cur['count'] += val['count']
+        else:
+            bucket[key] = bucket.get(key, 0.0) + val
+
+    for name, values in _snapshot().items():
+        for key, val in values:
+            add(name, key, val)
+    directory = current_app.config.get('METRICS_DIR')
+    if directory:
+        own = f"metrics_{os.getpid()}.json"
+        for path in glob.glob(os.path.join(directory, 'metrics_*.json')):
+            if os.path.basename(path) == own:
+                continue
+            try:
+                with open(path) as fh:
+                    data = json.load(fh)
+            except Exception:
+                continue
+            for name, values in data.items():
+                for key, val in values:
+                    add(name, key, val)
+    return merged
+
+
+def _fmt_labels(names, key, extra=None):
+    pairs = [f'{n}="{v}"' for n, v in zip(names, key)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def render_text():
+    lines = []
+    merged = _merged()
+    for name, m in sorted(_registry.items()):
+        lines.append(f"# HELP {name} {m.help}")
+        lines.append(f"# TYPE {name} {m.kind}")
+        for key, val in sorted(merged.get(name, {}).items()):
+            if m.kind == 'histogram':
+                running = 0
+                for bound, count in zip(m.buckets, val['counts']):
+                    running += count
+                    le = 'le="%s"' % bound
+                    lines.append(f"{name}_bucket{_fmt_labels(m.labelnames, key, le)} {running}")
+                le = 'le="+Inf"'
+                lines.append(f"{name}_bucket{_fmt_labels(m.labelnames, key, le)} {val['count']}")
+                lines.append(f"{name}_sum{_fmt_labels(m.labelnames, key)} {val['sum']}")
+                lines.append(f"{name}_count{_fmt_labels(m.labelnames, key)} {val['count']}")
+            else:
+                lines.append(f"{name}{_fmt_labels(m.labelnames, key)} {val}")
+    return '\n'.join(lines) + '\n'
+
+
+@metrics_bp.route('/metrics')
+def metrics_endpoint():
+    token = current_app.config.get('METRICS_TOKEN')
+    authz = request.headers.get('Authorization', '')
+    token_ok = bool(token) and authz.lower().startswith('bearer ') and hmac.compare_digest(authz[7:], token)
+    if not token_ok and session.get('role') not in ('manager', 'admin'):
+        return jsonify({'status': 'error', 'message': 'Unauthorized'}), 401
+    return Response(render_text(), mimetype='text/plain; version=0.0.4')
+
+
+def _on_tracked(kind, seconds):
+    if kind == 'pdf':
+        PDF_RENDER.observe(seconds)
+    elif kind == 'smtp':
+        SMTP_CALLS.observe(seconds)
+
+
+_last_flush = {'at': 0.0}
+
+
+def _after_request(response):
+    stats = g.get('_perf')
+    if stats is not None:
+        blueprint = request.blueprint or 'app'
+        REQUEST_LATENCY.observe(time.perf_counter() - stats['start'], blueprint=blueprint, method=request.method)
+        REQUESTS.inc(blueprint=blueprint, method=request.method, status=response.status_code)
+        if stats.get('db_count'):
+            SUPABASE_QUERIES.inc(stats['db_count'], blueprint=blueprint)
+    directory = current_app.config.get('METRICS_DIR')
+    if directory:
+        now = time.time()
+        if now - _last_flush['at'] >= float(current_app.config.get('METRICS_FLUSH_SECONDS', 5)):
+            _last_flush['at'] = now
+            try:
+                _flush(directory)
+            except Exception as e:
+                current_app.logger.warning(f"metrics flush failed: {e}")
+    return response
+
+
+def init_app(app):
+    """Register /metrics and the collectors. Call after instrumentation.init_app."""
+    from app import instrumentation
+    instrumentation.add_listener(_on_tracked)
+    app.after_request(_after_request)
+    app.register_blueprint(metrics_bp)
+    directory = app.config.get('METRICS_DIR')
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+        atexit.register(lambda: _flush(directory))
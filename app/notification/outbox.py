@@ -0,0 +1,98 @@
+"""Send notification emails off the request path.
+
+send_later(fn, *args) queues a call such as send_loan_status_email(...) for
+a background thread of the current worker process and returns immediately,
+so the applicant's response no longer waits on SMTP. The queue lives in
+process memory: jobs still queued when a worker exits get EMAIL_OUTBOX_DRAIN_SECONDS
+to finish, anything after that is lost (the senders already only log failures).
+
+With EMAIL_OUTBOX_ENABLED=false, or under TESTING, calls run inline.
+"""
+import atexit
+import os
+import queue
+import threading
+
+from flask import current_app, has_app_context
+
+from app.metrics import counter, gauge
+
+QUEUE_DEPTH = gauge('email_queue_depth', 'Notification emails waiting to be sent')
+SENT = counter('email_outbox_jobs_total', 'Background notification jobs by result', ('result',))
+
+_queue = None
+_queue_pid = None
+_lock = threading.Lock()
+
+
+def _worker(jobs):
+    while True:
+        app, fn, args, kwargs = jobs.get()
+        try:
+            if app is not None:
+                with app.app_context():
+                    fn(*args, **kwargs)
+            else:
+                fn(*args, **kwargs)
+            SENT.inc(result='ok')
+        except Exception as e:
+            SENT.inc(result='error')
+            print(f"[WARN] background email {getattr(fn, '__name__', fn)} failed: {e}")
+        finally:
+            QUEUE_DEPTH.set(jobs.qsize())
+            jobs.task_done()
+
+
+def _get_queue():
+    """This process's queue; a forked worker starts its own thread."""
+    global _queue, _queue_pid
+    with _lock:
+        if _queue is None or _queue_pid != os.getpid():
+            _queue = queue.Queue()
+            _queue_pid = os.getpid()
+            threading.Thread(target=_worker, args=(_queue,), name='email-outbox', daemon=True).start()
+        return _queue
+
+
+def _settings():
+    cfg = current_app.config if has_app_context() else {}
+    enabled = cfg.get('EMAIL_OUTBOX_ENABLED', True) and not cfg.get('TESTING')
+    return enabled, (current_app._get_current_object() if has_app_context() else None)
+
+
+def send_later(fn, *args, **kwargs):
+    """Run fn(*args, **kwargs) on the outbox thread (inline when the outbox is off)."""
+    enabled, app = _settings()
+    if not enabled:
+        try:
+            fn(*args, **kwargs)
+        except Exception as e:
+            print(f"[WARN] email {getattr(fn, '__name__', fn)} failed: {e}")
+        return
+    jobs = _get_queue()
+    jobs.put((app, fn, args, kwargs))
+    QUEUE_DEPTH.set(jobs.qsize())
+
+
+def depth():
+    """Jobs queued in this process and not yet picked up."""
+    return _queue.qsize() if _queue is not None and _queue_pid == os.getpid() else 0
+
+
+def drain(timeout):
+    """Give queued jobs up to `timeout` seconds to finish. Returns True if the queue emptied."""
+    jobs = _queue
+    if jobs is None or _queue_pid != os.getpid():
+        return True
+    done = threading.Event()
+
+    def wait():
+        jobs.join()
+        done.set()
+    threading.Thread(target=wait, daemon=True).start()
+    return done.wait(timeout)
+
+
+def init_app(app):
+    seconds = float(app.config.get('EMAIL_OUTBOX_DRAIN_SECONDS', 10))
+    atexit.register(lambda: drain(seconds))
@@ -0,0 +1,9 @@
+"""Amounts in words for receipts and certificates."""
+from functools import lru_cache
+
+
+@lru_cache(maxsize=None)
+def inflect_engine():
+    """Shared inflect engine, built on first use (importing inflect takes seconds)."""
+    import inflect
+    return inflect.engine()
@@ -0,0 +1,63 @@
+"""One-time passwords kept out of the members/staff tables.
+
+Codes live in app.local_store under (purpose, email) with a TTL and an
+attempt counter; only an HMAC of the code is stored and comparisons are
+constant-time. Nothing is written to Supabase until the form that uses the
+OTP is actually submitted.
+"""
+import hashlib
+import hmac
+import secrets
+import time
+
+from flask import current_app
+
+from app.local_store import get_store
+
+OTP_EXPIRED_MESSAGE = 'OTP not found or expired. Please request a new OTP.'
+OTP_INVALID_MESSAGE = 'Invalid or expired OTP'
+OTP_LOCKED_MESSAGE = 'Too many incorrect attempts. Please request a new OTP.'
+
+
+def _key(purpose, email):
+    return f"otp:{purpose}:{(email or '').strip().lower()}"
+
+
+def _digest(purpose, email, code):
+    secret = (current_app.config.get('SECRET_KEY') or 'dev').encode()
+    msg = f"{purpose}:{(email or '').strip().lower()}:{(code or '').strip()}".encode()
+    return hmac.new(secret, msg, hashlib.sha256).hexdigest()
+
+
+def issue_otp(purpose, email):
+    """Create (or replace) the OTP for purpose/email and return the 6-digit code."""
+    code = f"{secrets.randbelow(10 ** 6):06d}"
+    ttl = int(current_app.config.get('OTP_TTL_SECONDS', 600))
+    get_store().set(_key(purpose, email), {'h': _digest(purpose, email, code), 'attempts': 0, 'exp': time.time() + ttl}, ttl)
+    return code
+
+
+def discard_otp(purpose, email):
+    get_store().delete(_key(purpose, email))
+
+
+def verify_otp(purpose, email, code, consume=True):
+    """Check code; returns (ok, error_message). consume=True deletes the OTP on success.
+
+    Every wrong guess counts towards OTP_MAX_ATTEMPTS, after which the OTP is dropped.
+    """
+    max_attempts = int(current_app.config.get('OTP_MAX_ATTEMPTS', 5))
+    ttl = int(current_app.config.get('OTP_TTL_SECONDS', 600))
+    candidate = _digest(purpose, email, code)
+
+    def check(state):
+        if not state or state.get('exp', 0) <= time.time():
+            return None, (False, OTP_EXPIRED_MESSAGE)
+        if hmac.compare_digest(state.get('h', ''), candidate):
+            return (None if consume else state), (True, None)
+        attempts = int(state.get('attempts', 0)) + 1
+        if attempts >= max_attempts:
+            return None, (False, OTP_LOCKED_MESSAGE)
+        return dict(state, attempts=attempts), (False, OTP_INVALID_MESSAGE)
+
+    return get_store().update(_key(purpose, email), check, ttl)
@@ -0,0 +1,83 @@
+"""Support for gunicorn's preload_app mode (see gunicorn.conf.py).
+
+With preloading the master imports wsgi.py once and forks the workers from
+it, so code, compiled templates and imported libraries are shared
+copy-on-write instead of being rebuilt per worker. Two things must not be
+shared across fork:
+
+  * Supabase clients - each wraps an httpx connection pool; sockets opened in
+    the master (or by a sibling) must not be reused. reinit_clients() builds
+    fresh clients in the worker and rebinds every module that held one.
+  * Anything pid-scoped (SQLite store connections, metrics snapshot files)
+    already keys on os.getpid() and needs no help.
+
+SMTP is not pooled: every send opens and closes its own connection.
+"""
+import gc
+import os
+import sys
+
+# Imported in the master so workers do not each pay for them on first use.
+WARM_IMPORTS = ('pandas', 'openpyxl', 'PIL.Image', 'xhtml2pdf.pisa')
+
+
+def _app_modules():
+    for name, mod in list(sys.modules.items()):
+        if mod is not None and (name == 'app' or name.startswith(('app.', 'api.'))):
+            yield name, mod
+
+
+def reinit_clients():
+    """Give this process its own Supabase clients. Returns the number rebound.
+
+    Modules that share a client (e.g. `from app.auth.routes import supabase`)
+    keep sharing the replacement.
+    """
+    from supabase import Client, create_client
+    url = os.environ.get('SUPABASE_URL')
+    key = os.environ.get('SUPABASE_KEY')
+    replaced = {}
+    rebound = 0
+    for _name, mod in _app_modules():
+        old = getattr(mod, 'supabase', None)
+        if not isinstance(old, Client):
+            continue
+        new = replaced.get(id(old))
+        if new is None:
+            new = replaced[id(old)] = create_client(url, key)
+        setattr(mod, 'supabase', new)
+        rebound += 1
+    return rebound
+
+
+def warm_up(app):
+    """Do in the master the work every worker would otherwise repeat."""
+    import importlib
+    for module in WARM_IMPORTS:
+        try:
+            importlib.import_module(module)
+        except Exception as e:
+            app.logger.warning(f"preload: import {module} failed: {e}")
+    # Amount-in-words helpers build their inflect engine lazily; build it here.
+    try:
+        from app.number_words import inflect_engine
+        inflect_engine()
+    except Exception as e:
+        app.logger.warning(f"preload: inflect engine failed: {e}")
+    compiled = 0
+    for template in app.jinja_env.list_templates():
+        try:
+            app.jinja_env.get_template(template)
+            compiled += 1
+        except Exception as e:
+            app.logger.warning(f"preload: template {template} failed to compile: {e}")
+    # Move everything allocated so far out of the GC's reach; collections in
+    # the workers would otherwise touch (and un-share) these pages.
+    gc.collect()
+    gc.freeze()
+    return compiled
+
+
+def after_fork():
+    """Per-worker initialisation; call from gunicorn's post_fork hook."""
+    return reinit_clients()
@@ -0,0 +1,72 @@
+"""Token-bucket rate limiting for login and OTP endpoints.
+
+Buckets live in app.local_store (by default a SQLite file shared by all
+workers on the host). Limits come from
+Config.RATE_LIMITS: {scope: {key_kind: (requests, per_seconds)}} where key_kind
+is 'ip' or 'email'.
+"""
+import math
+import time
+from functools import wraps
+
+from flask import current_app, jsonify, request
+
+from app.local_store import get_store
+
+
+def client_ip():
+    """Client address; honours X-Forwarded-For only for RATE_LIMIT_PROXY_HOPS trusted proxies."""
+    hops = int(current_app.config.get('RATE_LIMIT_PROXY_HOPS') or 0)
+    route = request.access_route
+    if hops and len(route) >= hops:
+        return route[-hops]
+    return request.remote_addr or 'unknown'
+
+
+def request_email():
+    email = request.form.get('email')
+    if not email:
+        email = (request.get_json(silent=True) or {}).get('email')
+    return (email or '').strip().lower() or None
+
+
+def hit(scope, key, limit, per):
+    """Take one token from the bucket; returns 0 if allowed, else seconds to wait."""
+    rate = float(limit) / float(per)
+
+    def take(state):
+        now = time.time()
+        tokens, stamp = state if state else (float(limit), now)
+        tokens = min(float(limit), tokens + (now - stamp) * rate)
+        if tokens >= 1:
+            return [tokens - 1, now], 0
+        return [tokens, now], max(1, math.ceil((1 - tokens) / rate))
+
+    return get_store().update(f"rl:{scope}:{key}", take, ttl=per)
+
+
+def rate_limit(scope, methods=('POST',)):
+    """Reject requests over the configured limits for scope with 429 + Retry-After."""
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            cfg = current_app.config
+            rules = (cfg.get('RATE_LIMITS') or {}).get(scope) or {}
+            if not cfg.get('RATE_LIMIT_ENABLED', True) or request.method not in methods:
+                return f(*args, **kwargs)
+            retry_after = 0
+            for kind, (limit, per) in rules.items():
+                key = client_ip() if kind == 'ip' else request_email()
+                if key:
+                    retry_after = max(retry_after, hit(scope, f"{kind}:{key}", limit, per))
+            if retry_after:
+                resp = jsonify({
+                    'status': 'error',
+                    'message': f'Too many attempts. Please try again in {retry_after} seconds.'
+                })
+                resp.status_code = 429
+                resp.headers['Retry-After'] = str(retry_after)
+                return resp
+            return f(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -1,20 +1,21 @@
 import os
 import uuid
 import re
-import pandas as pd
 import random
+from app.number_words import inflect_engine
 from flask import Blueprint, request, jsonify, render_template, make_response, abort, session, url_for, redirect, current_app
 from app.auth.decorators import login_required, role_required
 from werkzeug.utils import secure_filename
 from io import BytesIO
 from supabase import create_client, Client
 from dotenv import load_dotenv
+from app.rate_limit import rate_limit
+from app.otp_store import issue_otp, verify_otp, discard_otp
+from app.image_utils import PHOTO, SIGNATURE, store_images, store_images_async
+from app.staff.bulk_deposits import SHARE_CAP, split_deposit
 import smtplib
 from email.mime.text import MIMEText
-from PIL import Image
 from datetime import datetime, timedelta
-from xhtml2pdf import pisa
-import inflect
 from httpx import RemoteProtocolError
 
 staff_api_bp = Blueprint('staff_api', __name__, url_prefix='/staff/api')
@@ -209,6 +210,7 @@ def export_recent_transactions_excel():
             return jsonify({'status': 'error', 'message': 'No transactions found for the specified period'}), 404
 
         # Create DataFrame and Excel file
+        import pandas as pd
         df = pd.DataFrame(excel_data)
         output = BytesIO()
         with pd.ExcelWriter(output, engine="openpyxl") as writer:
@@ -225,28 +227,6 @@ def export_recent_transactions_excel():
 staff_bp = Blueprint('staff', __name__, url_prefix='/staff')
 
 
-# Place after imports and Blueprint definition
-import os
-import uuid
-import re
-import pandas as pd
-import random
-from flask import Blueprint, request, jsonify, render_template, make_response, abort, session, url_for, redirect, current_app
-from app.auth.decorators import login_required, role_required
-from werkzeug.utils import secure_filename
-from io import BytesIO
-from supabase import create_client, Client
-from dotenv import load_dotenv
-import smtplib
-from email.mime.text import MIMEText
-from PIL import Image
-from datetime import datetime, timedelta
-from xhtml2pdf import pisa
-import inflect
-from httpx import RemoteProtocolError
-
-staff_api_bp = Blueprint('staff_api', __name__, url_prefix='/staff/api')
-
 @staff_api_bp.route('/recent-transactions', methods=['GET'])
 @login_required
 @role_required('admin', 'staff')
@@ -485,6 +465,7 @@ def export_recent_transactions_excel_admin():
     if not txs:
         return jsonify({"status": "error", "message": "No transactions found for export."}), 404
     # Prepare DataFrame
+    import pandas as pd
     df = pd.DataFrame(txs)
     columns = [
         ("date", "Date"),
@@ -521,7 +502,7 @@ SUPABASE_BUCKET = "staff-add"
 STORAGE_PUBLIC_PATH = f"{SUPABASE_URL}/storage/v1/object/public/{SUPABASE_BUCKET}"
 
 supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-p = inflect.engine()
+
 
 def send_otp_email(email, otp):
     EMAIL_USER = os.getenv("EMAIL_USER")
@@ -615,18 +596,10 @@ def staff_statements():
     if range_type == "last10":
         events = events[:10]
 
-    # Compute running balance_after for each event using current_balance (walk from newest -> oldest)
-    running = float(current_balance or 0)
-    for ev in events:
-        # set balance as snapshot after this event (newest first)
-        ev["balance_after"] = round(running, 2)
-        amt = float(ev.get("amount") or 0)
-        # when moving backwards: deposits increase balance going forward, so subtract deposit to step back
-        if ev.get("type") == "deposit":
-            running = round(running - amt, 2)
-        else:
-            # withdraw/withdrawal types assumed to reduce balance going forward, so add back when stepping back
-            running = round(running + amt, 2)
+    # balance_after for each event: walked back from current_balance, or forward from the
+    # month-end snapshot before from_date when the custom window ends in the past
+    from app.finance.balance_snapshots import statement_window, with_balances
+    with_balances(events, customer_id, current_balance, *statement_window(range_type, from_date, to_date))
 
     # If PDF requested, render statement.html and return as PDF
     if format == "pdf":
@@ -648,8 +621,10 @@ def staff_statements():
             to_date=to_date,
             range_type=range_type
         )
+        from xhtml2pdf import pisa
+        from app.media_cache import link_callback
         pdf = BytesIO()
-        pisa.CreatePDF(html, dest=pdf)
+        pisa.CreatePDF(html, dest=pdf, link_callback=link_callback)
         response = make_response(pdf.getvalue())
         response.headers['Content-Type'] = 'application/pdf'
         response.headers['Content-Disposition'] = f'attachment; filename=statement_{customer_id}.pdf'
@@ -768,96 +743,20 @@ def loan_info():
 
 
 @staff_api_bp.route('/add-member/send-otp', methods=['POST'])
+@rate_limit('otp')
 def send_member_otp():
     email = request.form.get('email')
     if not email or not re.match(r"[^@]+@[^@]+\.[^@]+", email):
         return jsonify({'status': 'error', 'message': 'Invalid email'}), 400
-    otp = str(uuid.uuid4().int)[-6:]
+    # OTP lives in the OTP store; the member row is only written on submit
+    otp = issue_otp('member_registration', email)
     try:
-        # Check if member exists
-        member_rows = supabase.table("members").select("id").eq("email", email).execute()
-        if member_rows.data and len(member_rows.data) > 0:
-            # Update OTP only
-            supabase.table("members").update({"otp": otp}).eq("email", email).execute()
-        else:
-            # Insert with required NOT NULL fields as empty strings
-            supabase.table("members").insert({
-                "name": "",
-                "kgid": "",
-                "phone": "",
-                "email": email,
-                "aadhar_no": "",
-                "pan_no": "",
-                "salary": None,
-                "organization_name": "",
-                "address": "",
-                "photo_url": "",
-                "signature_url": "",
-                "otp": otp
-            }).execute()
         send_otp_email(email, otp)
     except Exception as e:
+        discard_otp('member_registration', email)
         return jsonify({'status': 'error', 'message': 'Failed to send OTP', 'error': str(e)}), 500
     return jsonify({'status': 'success', 'message': 'OTP sent'})
 
-def compress_image(file_storage, max_size_kb=100):
-    img = Image.open(file_storage)
-    img_format = img.format if img.format else 'JPEG'
-    quality = 85
-    buffer = BytesIO()
-    img.save(buffer, format=img_format, optimize=True, quality=quality)
-    while buffer.tell() > max_size_kb * 1024 and quality > 10:
-        quality -= 5
-        buffer.seek(0)
-        buffer.truncate()
-        img.save(buffer, format=img_format, optimize=True, quality=quality)
-    buffer.seek(0)
-    return buffer
-
-def send_member_otp():
-    email = request.form.get('email')
-    if not email or not re.match(r"[^@]+@[^@]+\.[^@]+", email):
-        return jsonify({'status': 'error', 'message': 'Invalid email'}), 400
-    
-    otp = str(uuid.uuid4().int)[-6:]
-    try:
-        # Check if member exists
-        member_rows = supabase.table("members").select("id").eq("email", email).execute()
-        if member_rows.data and len(member_rows.data) > 0:
-            # Update OTP only
-            supabase.table("members").update({"otp": otp}).eq("email", email).execute()
-        else:
-            # Insert only email and OTP for a new user.
-            # The rest of the data will be added when the form is submitted.
-            # We need to provide temporary values for NOT NULL fields
-            supabase.table("members").insert({
-                "email": email,
-                "otp": otp,
-                "name": "temp_pending",
-                "phone": "temp_pending", 
-                "organization_name": "temp_pending",
-                "address": "temp_pending",
-                "status": "pending_otp"
-            }).execute()
-        send_otp_email(email, otp)
-    except Exception as e:
-        return jsonify({'status': 'error', 'message': 'Failed to send OTP', 'error': str(e)}), 500
-    return jsonify({'status': 'success', 'message': 'OTP sent'})
-
-def compress_image(file_storage, max_size_kb=100):
-    img = Image.open(file_storage)
-    img_format = img.format if img.format else 'JPEG'
-    quality = 85
-    buffer = BytesIO()
-    img.save(buffer, format=img_format, optimize=True, quality=quality)
-    while buffer.tell() > max_size_kb * 1024 and quality > 10:
-        quality -= 5
-        buffer.seek(0)
-        buffer.truncate()
-        img.save(buffer, format=img_format, optimize=True, quality=quality)
-    buffer.seek(0)
-    return buffer
-
 def send_status_email(email, status):
     EMAIL_USER = os.getenv("EMAIL_USER")
     EMAIL_PASSWORD = os.getenv("EMAIL_PASSWORD")
@@ -890,6 +789,16 @@ def generate_customer_id(prefix="KSTHST"):
     """Generate a unique customer ID like ABCDE1234."""
     return f"{prefix}{random.randint(1000, 9999)}"
 
+def allocate_customer_id(prefix="KSTHST", candidates=5):
+    """Pick an unused customer ID, checking all candidates in one query. None if all are taken."""
+    ids = list(dict.fromkeys(generate_customer_id(prefix) for _ in range(candidates)))
+    taken = supabase.table("members").select("customer_id").in_("customer_id", ids).execute()
+    used = {r.get("customer_id") for r in (taken.data or [])}
+    for cid in ids:
+        if cid not in used:
+            return cid
+    return None
+
 def generate_stid():
     """Generate a unique Society Transaction ID (STID####), 4-digit sequence, no year."""
     stid_prefix = "STID"
@@ -914,7 +823,11 @@ def generate_stid():
 
 def generate_system_fdid():
     """Generate next sequential internal system_fdid (formerly fdid) like FD0001, FD0002."""
-    # Filter out NULL system_fdid rows and order by system_fdid DESC to find the true last value.
+    from app.staff.record_import import reserve_numbers
+    reserved = reserve_numbers('fd', 1)
+    if reserved:
+        return f"FD{reserved[0]:04d}"
+    # Before fd_number_seq is deployed: filter out NULL system_fdid rows and order by system_fdid DESC to find the true last value.
     resp = supabase.table("fixed_deposits") \
         .select("system_fdid") \
         .like("system_fdid", "FD%") \
@@ -1016,21 +929,18 @@ def add_member():
     if not re.match(r"[^@]+@[^@]+\.[^@]+", data['email']):
         return jsonify({'status': 'error', 'message': 'Invalid email format'}), 400
 
-    otp = data['otp']
-    member_rows = supabase.table("members").select("otp,customer_id").eq("email", data['email']).execute()
-    if not member_rows.data or not member_rows.data[0].get("otp"):
-        return jsonify({'status': 'error', 'message': 'OTP not found for this email'}), 400
-    stored_otp = member_rows.data[0]["otp"]
-    if otp != stored_otp:
-        return jsonify({'status': 'error', 'message': 'Invalid or expired OTP'}), 400
-    supabase.table("members").update({"otp": None}).eq("email", data['email']).execute()
+    ok, otp_error = verify_otp('member_registration', data['email'], data['otp'])
+    if not ok:
+        return jsonify({'status': 'error', 'message': otp_error}), 400
+    # Re-registration keeps the customer_id of an existing row for this email
+    member_rows = supabase.table("members").select("customer_id").eq("email", data['email']).execute()
 
     photo = files.get('photo')
     signature = files.get('signature')
     allowed_types = {'image/jpeg', 'image/png', 'image/jpg'}
     max_size = 2 * 1024 * 1024
 
-    photo_url = ""
+    uploads = []
     if photo and photo.filename != "":
         if photo.mimetype not in allowed_types:
             return jsonify({'status': 'error', 'message': 'Photo must be a JPEG or PNG image'}), 400
@@ -1038,17 +948,8 @@ def add_member():
         if photo.tell() > max_size:
             return jsonify({'status': 'error', 'message': 'Photo file too large (max 2MB)'}), 400
         photo.seek(0)
-        
-        try:
-            photo_buffer = compress_image(photo)
-            photo_filename = f"{uuid.uuid4().hex}_{secure_filename(photo.filename)}"
-            bucket = supabase.storage.from_(SUPABASE_BUCKET)
-            bucket.upload(photo_filename, photo_buffer.read())
-            photo_url = f"{STORAGE_PUBLIC_PATH}/{photo_filename}"
-        except Exception as e:
-            return jsonify({'status': 'error', 'message': 'Photo processing upload failed', 'error': str(e)}), 400
-
-    signature_url = ""
+        uploads.append(('photo', photo, PHOTO))
+
     if signature and signature.filename != "":
         if signature.mimetype not in allowed_types:
             return jsonify({'status': 'error', 'message': 'Signature must be a JPEG or PNG image'}), 400
@@ -1056,15 +957,24 @@ def add_member():
         if signature.tell() > max_size:
             return jsonify({'status': 'error', 'message': 'Signature file too large (max 2MB)'}), 400
         signature.seek(0)
-        
-        try:
-            signature_buffer = compress_image(signature)
-            signature_filename = f"{uuid.uuid4().hex}_{secure_filename(signature.filename)}"
-            bucket = supabase.storage.from_(SUPABASE_BUCKET)
-            bucket.upload(signature_filename, signature_buffer.read())
-            signature_url = f"{STORAGE_PUBLIC_PATH}/{signature_filename}"
-        except Exception as e:
-            return jsonify({'status': 'error', 'message': 'Signature processing upload failed', 'error': str(e)}), 400
+        uploads.append(('signature', signature, SIGNATURE))
+
+    # Photo and signature are processed/uploaded in parallel while the customer_id is allocated
+    bucket = supabase.storage.from_(SUPABASE_BUCKET)
+    wait_uploads = store_images_async(bucket, [(fs, spec) for _, fs, spec in uploads])
+
+    customer_id = member_rows.data[0].get("customer_id") if member_rows.data and "customer_id" in member_rows.data[0] else None
+    new_customer_id = None
+    if not customer_id:
+        new_customer_id = allocate_customer_id()
+
+    urls = {'photo': "", 'signature': ""}
+    for (kind, _fs, _spec), (filename, err) in zip(uploads, wait_uploads()):
+        if err is not None:
+            return jsonify({'status': 'error', 'message': f'{kind.title()} processing upload failed', 'error': str(err)}), 400
+        urls[kind] = f"{STORAGE_PUBLIC_PATH}/{filename}"
+    photo_url = urls['photo']
+    signature_url = urls['signature']
 
     member_data = {
         "name": data['name'],
@@ -1081,16 +991,10 @@ def add_member():
         "status": "pending"
     }
 
-    customer_id = member_rows.data[0].get("customer_id") if member_rows.data and "customer_id" in member_rows.data[0] else None
     if not customer_id:
-        for _ in range(5):
-            new_customer_id = generate_customer_id()
-            exists = supabase.table("members").select("id").eq("customer_id", new_customer_id).execute()
-            if not exists.data:
-                customer_id = new_customer_id
-                break
-        else:
+        if not new_customer_id:
             return jsonify({'status': 'error', 'message': 'Could not generate unique customer ID'}), 500
+        customer_id = new_customer_id
         member_data["customer_id"] = customer_id
 
     try:
@@ -1172,7 +1076,7 @@ def add_transaction():
     member = member_row.data[0]
     current_balance = float(member.get("balance") or 0)
     current_share_amount = float(member.get("share_amount") or 0)
-    max_share = 30000.0
+    max_share = SHARE_CAP
 
     # Calculate new balance and share_amount
     try:
@@ -1182,18 +1086,9 @@ def add_transaction():
 
     if data["type"] == "deposit":
         # Fill share_amount first up to 30,000, then excess to balance
-        if current_share_amount < max_share:
-            to_share = min(amount, max_share - current_share_amount)
-            to_balance = amount - to_share
-            new_share_amount = current_share_amount + to_share
-            new_balance = current_balance + (to_balance if to_balance > 0 else 0)
-            print(f"DEBUG DEPOSIT: amount={amount}, current_share={current_share_amount}, to_share={to_share}, to_balance={to_balance}, new_share={new_share_amount}, new_balance={new_balance}")
-        else:
-            to_share = 0
-            to_balance = amount
-            new_share_amount = current_share_amount
-            new_balance = current_balance + amount
-            print(f"DEBUG DEPOSIT (share full): amount={amount}, all to balance, new_balance={new_balance}")
+        to_share, to_balance, new_share_amount, new_balance = split_deposit(
+            amount, current_share_amount, current_balance, max_share)
+        print(f"DEBUG DEPOSIT: amount={amount}, current_share={current_share_amount}, to_share={to_share}, to_balance={to_balance}, new_share={new_share_amount}, new_balance={new_balance}")
     elif data["type"] == "withdraw":
         # Only withdraw from balance
         if amount > current_balance:
@@ -1227,6 +1122,8 @@ def add_transaction():
         # Check if member update was successful
         if not member_update.data:
             return jsonify({"status": "error", "message": "Failed to update member balance"}), 500
+        from app.finance.balance_snapshots import reopen
+        reopen([customer_id], data["date"])
         # Generate receipt URL
         stid = data["stid"]
         receipt_url = f"{os.environ.get('BASE_URL', 'https://ksthstsociety.com')}/staff/transaction/certificate/{stid}?action=view"
@@ -1282,9 +1179,38 @@ def add_transaction():
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 500
 
+@staff_api_bp.route('/bulk-deposits', methods=['POST'])
+@login_required
+@role_required('admin', 'staff')
+def bulk_deposits():
+    """
+    Post a month's thrift/share deposits in one go.
+    JSON: {rows: [{customer_id, amount}, ...], date, transaction_id, from_account,
+           to_account, from_bank_name, to_bank_name, remarks?, dry_run?, notify?}
+    Each deposit is split between share_amount and balance as in add-transaction.
+    Invalid rows are reported and left out; the rest are posted together.
+    """
+    from app.staff import bulk_deposits as bulk
+    data = request.get_json(silent=True) or {}
+    rows = data.get("rows")
+    if not isinstance(rows, list) or not rows:
+        return jsonify({'status': 'error', 'message': 'rows must be a non-empty list'}), 400
+    if len(rows) > bulk.MAX_ROWS:
+        return jsonify({'status': 'error', 'message': f'At most {bulk.MAX_ROWS} rows per batch'}), 400
+    required = [f for f in bulk.SHARED_FIELDS if f != 'remarks']
+    missing = [f for f in required if not data.get(f)]
+    if missing:
+        return jsonify({'status': 'error', 'message': f'Missing fields: {", ".join(missing)}'}), 400
+    try:
+        report = bulk.run(rows, data, dry_run=bool(data.get("dry_run")), notify=data.get("notify", True) is not False)
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': f'Posting failed: {e}'}), 500
+    return jsonify({'status': 'success', **report}), 200
+
 def amount_to_words(amount):
     try:
         n = int(float(amount))
+        p = inflect_engine()
         # Use Indian numbering system for lakhs/crores
         def indian_number_words(num):
             if num < 100000:
@@ -1408,26 +1334,21 @@ def transaction_certificate(stid):
             m_resp = supabase.table("members").select("balance").eq("customer_id", customer_id).execute()
             current_balance = float(m_resp.data[0].get("balance") or 0) if m_resp.data else 0.0
 
-            # Fetch ALL transactions for this member, ordered newest→oldest
-            all_tx_resp = supabase.table("transactions") \
-                .select("stid,type,amount,date,balance_after") \
+            # Balance at the start of the transaction's day (from the nearest month-end
+            # snapshot), then forward through that day's transactions up to ours.
+            from app.finance.balance_snapshots import balance_before, movement
+            tx_day = datetime.strptime(str(tx_date)[:10], "%Y-%m-%d").date()
+            same_day = supabase.table("transactions") \
+                .select("id,stid,type,amount") \
                 .eq("customer_id", customer_id) \
-                .order("date", desc=True) \
-                .execute()
-            all_txs = all_tx_resp.data or []
-
-            # Walk backwards from current_balance to reconstruct balance_after
-            # for every transaction that lacks it, then pick ours.
-            running = current_balance
+                .eq("date", str(tx_date)[:10]) \
+                .order("id") \
+                .execute().data or []
+            running = balance_before(customer_id, tx_day, current_balance)
             computed = {}
-            for t in all_txs:
-                computed[t["stid"]] = round(running, 2)
-                amt = float(t.get("amount") or 0)
-                ttype = str(t.get("type") or "").lower()
-                if ttype == "deposit":
-                    running = round(running - amt, 2)
-                else:
-                    running = round(running + amt, 2)
+            for t in same_day:
+                running = round(running + movement(t), 2)
+                computed[t["stid"]] = running
 
             recomputed = computed.get(stid)
             if recomputed is not None:
@@ -1474,8 +1395,10 @@ def transaction_certificate(stid):
     html = render_template("certificate.html", **template_data)
 
     if action == "download":
+        from xhtml2pdf import pisa
+        from app.media_cache import link_callback
         pdf = BytesIO()
-        result = pisa.CreatePDF(html, dest=pdf)
+        result = pisa.CreatePDF(html, dest=pdf, link_callback=link_callback)
         if result.err:
             return jsonify({"status": "error", "message": "PDF generation failed. Check certificate template for unsupported CSS (e.g. width: 100%)."}), 500
         pdf.seek(0)
@@ -1538,6 +1461,61 @@ def check_transaction(stid):
     html = render_template("check_transaction.html", **template_data)
     return html
 
+@staff_api_bp.route('/member-search', methods=['GET'])
+@login_required
+@role_required('admin', 'staff', 'manager')
+def member_search():
+    """
+    Find members by name (typos and Kannada spellings tolerated), KGID, phone or customer_id.
+    Query params: q (required), limit (default 10, max 50)
+    Returns: { status, results[{customer_id, name, kgid, phone, photo_url, photo_thumb_url, status, score, matched_on}], took_ms }
+    """
+    import time
+    from app.member_search import search
+    query = (request.args.get('q') or '').strip()
+    if not query:
+        return jsonify({'status': 'error', 'message': 'q is required'}), 400
+    try:
+        limit = int(request.args.get('limit', 10))
+    except ValueError:
+        return jsonify({'status': 'error', 'message': 'limit must be a number'}), 400
+    start = time.perf_counter()
+    try:
+        results = search(query, limit)
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+    return jsonify({'status': 'success', 'results': results,
+                    'took_ms': round((time.perf_counter() - start) * 1000, 2)}), 200
+
+
+@staff_api_bp.route('/member-directory', methods=['GET'])
+@login_required
+@role_required('admin', 'staff', 'manager')
+def member_directory():
+    """
+    Compact member list for typeahead, cached by the dashboard.
+    Query params (optional): since (a version returned earlier; only members changed after it)
+    Returns: { status, v, full, count, fields[customer_id, name, kgid, status, blocked], rows[[...]] }
+    gzip-compressed when the client accepts it; ETag / If-None-Match answers 304 when nothing changed.
+    """
+    from flask import Response
+    from app.member_search import directory, encode_directory
+    since = (request.args.get('since') or '').strip() or None
+    try:
+        payload = directory(since)
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+    body, packed = encode_directory(payload)
+    use_gzip = 'gzip' in request.headers.get('Accept-Encoding', '').lower()
+    response = Response(packed if use_gzip else body, mimetype='application/json')
+    if use_gzip:
+        response.headers['Content-Encoding'] = 'gzip'
+    response.headers['Vary'] = 'Accept-Encoding'
+    # Always revalidate; an unchanged list costs a 304
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.set_etag(f"{payload['v']}:{since or ''}{':gz' if use_gzip else ''}")
+    return response.make_conditional(request)
+
 @staff_api_bp.route('/fetch-account', methods=['GET'])
 def fetch_account_member():
     """
@@ -1557,7 +1535,8 @@ def fetch_account_member():
         .execute()
     )
     if not resp.data:
-        return jsonify({'status': 'error', 'message': 'Account not found'}), 404
+        from app.member_search import suggest
+        return jsonify({'status': 'error', 'message': 'Account not found', 'suggestions': suggest(customer_id)}), 404
     m = resp.data[0]
     return jsonify({
         'status': 'success',
@@ -1576,17 +1555,23 @@ def fetch_account_member():
     }), 200
 
 @staff_api_bp.route('/send-update-otp', methods=['POST'])
+@rate_limit('otp')
 def send_update_otp():
     data = request.get_json()
     email = data.get('email')
     if not email or not re.match(r"[^@]+@[^@]+\.[^@]+", email):
         return jsonify({'status': 'error', 'message': 'Invalid email'}), 400
-    otp = str(uuid.uuid4().int)[-6:]
     try:
-        # Update OTP for this member (do not change other fields)
-        supabase.table("members").update({"otp": otp}).eq("email", email).execute()
+        member_rows = supabase.table("members").select("id").eq("email", email).limit(1).execute()
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': 'Failed to send OTP', 'error': str(e)}), 500
+    if not member_rows.data:
+        return jsonify({'status': 'error', 'message': 'Member not found for this email'}), 404
+    otp = issue_otp('member_update', email)
+    try:
         send_otp_email(email, otp)
     except Exception as e:
+        discard_otp('member_update', email)
         return jsonify({'status': 'error', 'message': 'Failed to send OTP', 'error': str(e)}), 500
     return jsonify({'status': 'success', 'message': 'OTP sent'})
 
@@ -1597,12 +1582,10 @@ def verify_update_otp():
     otp = data.get('otp')
     if not email or not otp:
         return jsonify({'status': 'error', 'message': 'Missing email or OTP'}), 400
-    member_rows = supabase.table("members").select("otp").eq("email", email).execute()
-    if not member_rows.data or not member_rows.data[0].get("otp"):
-        return jsonify({'status': 'error', 'message': 'OTP not found for this email'}), 400
-    stored_otp = member_rows.data[0]["otp"]
-    if otp != stored_otp:
-        return jsonify({'status': 'error', 'message': 'Invalid or expired OTP'}), 400
+    # Pre-check only: the OTP stays valid for /update-customer, but wrong guesses count
+    ok, otp_error = verify_otp('member_update', email, otp, consume=False)
+    if not ok:
+        return jsonify({'status': 'error', 'message': otp_error}), 400
     return jsonify({'status': 'success'})
 
 @staff_api_bp.route('/update-customer', methods=['POST'])
@@ -1618,7 +1601,7 @@ def update_customer():
     # Fetch member (single attempt)
     try:
         member_rows = supabase.table("members") \
-            .select("email,otp") \
+            .select("email") \
             .eq("customer_id", customer_id) \
             .limit(1) \
             .execute()
@@ -1629,9 +1612,9 @@ def update_customer():
 
     if not member_rows.data or not member_rows.data[0].get("email"):
         return jsonify({'status': 'error', 'message': 'Customer not found'}), 404
-    stored_otp = member_rows.data[0].get('otp')
-    if otp != stored_otp:
-        return jsonify({'status': 'error', 'message': 'Invalid or expired OTP'}), 400
+    ok, otp_error = verify_otp('member_update', member_rows.data[0]['email'], otp)
+    if not ok:
+        return jsonify({'status': 'error', 'message': otp_error}), 400
 
     # Map & collect update fields
     update_fields = {}
@@ -1659,33 +1642,21 @@ def update_customer():
             update_fields[target_key] = val
 
     # Images
-    bucket = supabase.storage.from_(SUPABASE_BUCKET)
-    if 'photo' in files and files['photo'] and files['photo'].filename:
-        photo = files['photo']
-        try:
-            photo_filename = f"{uuid.uuid4().hex}_{secure_filename(photo.filename)}"
-            photo_buffer = compress_image(photo)
-            bucket.upload(photo_filename, photo_buffer.read())
-            update_fields['photo_url'] = f"{STORAGE_PUBLIC_PATH}/{photo_filename}"
-        except Exception as e:
-            return jsonify({'status': 'error', 'message': 'Photo upload failed', 'error': str(e)}), 500
-    if 'signature' in files and files['signature'] and files['signature'].filename:
-        signature = files['signature']
-        try:
-            signature_filename = f"{uuid.uuid4().hex}_{secure_filename(signature.filename)}"
-            signature_buffer = compress_image(signature)
-            bucket.upload(signature_filename, signature_buffer.read())
-            update_fields['signature_url'] = f"{STORAGE_PUBLIC_PATH}/{signature_filename}"
-        except Exception as e:
-            return jsonify({'status': 'error', 'message': 'Signature upload failed', 'error': str(e)}), 500
+    uploads = [(kind, files[kind], spec) for kind, spec in (('photo', PHOTO), ('signature', SIGNATURE))
+               if kind in files and files[kind] and files[kind].filename]
+    if uploads:
+        bucket = supabase.storage.from_(SUPABASE_BUCKET)
+        results = store_images(bucket, [(fs, spec) for _, fs, spec in uploads])
+        for (kind, _fs, _spec), (filename, err) in zip(uploads, results):
+            if err is not None:
+                return jsonify({'status': 'error', 'message': f'{kind.title()} upload failed', 'error': str(err)}), 500
+            update_fields[f'{kind}_url'] = f"{STORAGE_PUBLIC_PATH}/{filename}"
 
     if not update_fields:
         return jsonify({'status': 'error', 'message': 'No valid fields to update'}), 400
 
-    # Update + clear OTP
     try:
         supabase.table("members").update(update_fields).eq("customer_id", customer_id).execute()
-        supabase.table("members").update({"otp": None}).eq("customer_id", customer_id).execute()
     except RemoteProtocolError:
         return jsonify({'status': 'error', 'message': 'Upstream write issue. Retry later.'}), 500
     except Exception as e:
@@ -1733,7 +1704,8 @@ def fd_customer_info():
         .execute()
     )
     if not resp.data:
-        return jsonify({'status': 'error', 'message': 'Account not found'}), 404
+        from app.member_search import suggest
+        return jsonify({'status': 'error', 'message': 'Account not found', 'suggestions': suggest(customer_id)}), 404
     m = resp.data[0]
     return jsonify({
         'status': 'success',
@@ -2152,7 +2124,11 @@ def list_suspense_entries():
 
 def _generate_fee_id():
     """Generate next sequential share fee ID like SF0001, SF0002."""
+    from app.staff.record_import import reserve_numbers
     try:
+        reserved = reserve_numbers('share_fee', 1)
+        if reserved:
+            return f"SF{reserved[0]:04d}"
         resp = supabase.table("share_fees") \
             .select("fee_id") \
             .like("fee_id", "SF%") \
@@ -2173,19 +2149,10 @@ def _generate_fee_id():
 
 
 def _generate_loan_id_for_record():
-    """Generate next sequential loan ID like LN0001 (mirrors finance api generate_loan_id)."""
+    """Next loan ID like LN0001 (from loan_number_seq once deployed, else after the highest)."""
+    from app.staff.record_import import allocate_loan_ids
     try:
-        result = supabase.table("loans").select("loan_id").execute()
-        highest_num = 0
-        if result.data:
-            for loan in result.data:
-                lid = loan.get("loan_id", "")
-                if lid and lid.startswith("LN"):
-                    try:
-                        highest_num = max(highest_num, int(lid[2:]))
-                    except ValueError:
-                        pass
-        return f"LN{highest_num + 1:04d}"
+        return allocate_loan_ids(1)[0]
     except Exception:
         return f"LN{int(datetime.now().timestamp()) % 10000:04d}"
 
@@ -2358,6 +2325,8 @@ def record_entry():
                             "status": "active"
                         }
                         supabase.table("loan_records").insert(loan_record_row).execute()
+                        from app.finance.credit_scores import refresh_member
+                        refresh_member(customer_id)
                         results['loan_repayment'] = {
                             'total_paid': repayment_amount,
                             'remaining': remaining if remaining > 0 else 0
@@ -2457,6 +2426,48 @@ def record_entry():
         return jsonify({'status': 'error', 'message': f'Internal error: {str(e)}'}), 500
 
 
+RECORD_IMPORT_CHECKPOINT_TTL = 7 * 24 * 3600
+
+
+@staff_api_bp.route('/record-import', methods=['POST'])
+@login_required
+@role_required('admin', 'staff')
+def record_import():
+    """
+    Historical data migration from a CSV/XLSX file: one row per customer,
+    columns named like the /record-entry JSON keys.
+    Form fields: file, dry_run? ("true" to only validate).
+    Re-uploading the same file after a failure resumes from the last
+    completed chunk and never duplicates loans, FDs or share fees.
+    """
+    from app.local_store import get_store
+    from app.staff import record_import as importer
+    upload = request.files.get('file')
+    if not upload or not upload.filename:
+        return jsonify({'status': 'error', 'message': 'file is required'}), 400
+    data = upload.read()
+    dry_run = str(request.form.get('dry_run', '')).lower() in ('1', 'true', 'yes', 'on')
+    try:
+        rows = importer.read_rows(upload.filename, data)
+    except importer.UploadError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    digest = importer.file_digest(data)
+    store = get_store()
+    key = f"record-import:{digest}"
+    try:
+        report = importer.import_rows(
+            rows, digest,
+            load_checkpoint=lambda: store.get(key),
+            save_checkpoint=lambda state: store.set(key, state, RECORD_IMPORT_CHECKPOINT_TTL),
+            dry_run=dry_run,
+            recorded_by=session.get('staff_email') or session.get('email') or None,
+        )
+    except Exception as e:
+        print(f"record_import error: {e}")
+        return jsonify({'status': 'error', 'message': f'Import stopped: {e}. Upload the same file again to resume.'}), 500
+    return jsonify({'status': 'success', **report}), 200
+
+
 # ===================== Share Fees =====================
 
 @staff_api_bp.route('/share-fees', methods=['GET'])
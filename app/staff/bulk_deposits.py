@@ -0,0 +1,174 @@
+"""Month-end thrift/share deposits posted as one batch.
+
+A deposit first tops up the member's share_amount to the share cap
+(SHARE_CAP, Rs. 30,000) and the remainder goes to balance - the rule
+/staff/api/add-transaction applies to single deposits (split_deposit).
+
+post_deposits() sends the whole list to the post_bulk_deposits database
+function (supabase/migrations/20261019000400), which locks the members,
+takes a contiguous block of STIDs and inserts/updates everything in one
+transaction. Until that function is deployed the same work is done from
+here: one members read, bulk transaction inserts and one update per member.
+Receipt emails are queued on the email outbox either way.
+"""
+import os
+
+from app.supabase_pages import fetch_in
+
+SHARE_CAP = 30000.0
+POST_RPC = 'post_bulk_deposits'
+INSERT_CHUNK = 500
+MAX_ROWS = 5000
+# Transaction columns given once for the whole batch
+SHARED_FIELDS = ('date', 'transaction_id', 'from_account', 'to_account', 'from_bank_name', 'to_bank_name', 'remarks')
+
+_rpc_missing = False
+
+
+def split_deposit(amount, share_amount, balance, max_share=SHARE_CAP):
+    """(to_share, to_balance, new_share_amount, new_balance) for a deposit of `amount`."""
+    to_share = max(min(amount, max_share - share_amount), 0.0) if share_amount < max_share else 0.0
+    to_balance = amount - to_share
+    return to_share, to_balance, share_amount + to_share, balance + to_balance
+
+
+def _supabase():
+    from app.auth.routes import supabase
+    return supabase
+
+
+def plan(rows, members, max_share=SHARE_CAP):
+    """Validate and split rows in order; a member listed twice is credited cumulatively.
+
+    `members` maps customer_id to its members row (balance, share_amount).
+    Returns one result per row with status 'ok' or 'error'.
+    """
+    state = {cid: (float(m.get('share_amount') or 0), float(m.get('balance') or 0)) for cid, m in members.items()}
+    results = []
+    for index, row in enumerate(rows, start=1):
+        customer_id = str(row.get('customer_id') or '').strip()
+        result = {'row': index, 'customer_id': customer_id}
+        results.append(result)
+        try:
+            amount = round(float(row.get('amount')), 2)
+        except (TypeError, ValueError):
+            amount = 0.0
+        if not customer_id:
+            result.update(status='error', message='Missing customer_id')
+        elif amount <= 0:
+            result.update(status='error', message='Invalid amount')
+        elif customer_id not in state:
+            result.update(status='error', message='Member not found')
+        else:
+            share, balance = state[customer_id]
+            to_share, to_balance, share, balance = split_deposit(amount, share, balance, max_share)
+            state[customer_id] = (share, balance)
+            result.update(status='ok', amount=amount, to_share=to_share, to_balance=to_balance,
+                          share_amount_after=share, balance_after=balance)
+    return results
+
+
+def _stid(number):
+    return f"STID{number:04d}"
+
+
+def _post_without_rpc(accepted, fields, max_share):
+    """Fallback for post_bulk_deposits: same rows, written call by call (not atomic)."""
+    from app.staff.api import generate_stid
+    supabase = _supabase()
+    members = {m['customer_id']: m for m in fetch_in('members', 'customer_id,balance,share_amount', 'customer_id',
+                                                     [r['customer_id'] for r in accepted])}
+    results = plan(accepted, members, max_share)
+    posted = [r for r in results if r['status'] == 'ok']
+    first = int(generate_stid()[4:])
+    rows = []
+    for offset, r in enumerate(posted):
+        r['stid'] = _stid(first + offset)
+        rows.append({**fields, 'customer_id': r['customer_id'], 'type': 'deposit', 'amount': r['amount'],
+                     'balance_after': r['balance_after'], 'stid': r['stid']})
+    for start in range(0, len(rows), INSERT_CHUNK):
+        supabase.table('transactions').insert(rows[start:start + INSERT_CHUNK]).execute()
+    final = {r['customer_id']: r for r in posted}
+    for customer_id, r in final.items():
+        supabase.table('members').update({
+            'balance': float(r['balance_after']),
+            'share_amount': float(r['share_amount_after']),
+        }).eq('customer_id', customer_id).execute()
+    return results
+
+
+def post_deposits(accepted, fields, max_share=SHARE_CAP):
+    """Post [{customer_id, amount}] in one database call.
+
+    Returns one dict per row, in order, with its stid and the share/balance
+    split (or status 'error' if the member vanished since validation).
+    """
+    global _rpc_missing
+    if not _rpc_missing:
+        try:
+            resp = _supabase().rpc(POST_RPC, {
+                'p_rows': [{'customer_id': r['customer_id'], 'amount': r['amount']} for r in accepted],
+                'p_fields': fields,
+                'p_max_share': max_share,
+            }).execute()
+            return resp.data or []
+        except Exception as e:
+            text = str(e)
+            if 'PGRST202' not in text and 'Could not find the function' not in text:
+                raise
+            _rpc_missing = True
+            print(f"[WARN] {POST_RPC} not deployed, posting deposits without it")
+    return _post_without_rpc(accepted, fields, max_share)
+
+
+def send_deposit_receipts(posted):
+    """Email a receipt for each posted deposit (runs on the email outbox thread)."""
+    from app.staff.api import send_transaction_email
+    members = {m['customer_id']: m for m in fetch_in('members', 'customer_id,name,email', 'customer_id',
+                                                     [r['customer_id'] for r in posted])}
+    base_url = os.environ.get('BASE_URL', 'https://ksthstsociety.com')
+    for r in posted:
+        member = members.get(r['customer_id']) or {}
+        if not member.get('email'):
+            continue
+        receipt_url = f"{base_url}/staff/transaction/certificate/{r['stid']}?action=view"
+        try:
+            send_transaction_email(member['email'], member.get('name', ''), r['stid'], 'deposit',
+                                   r['amount'], r['balance_after'], receipt_url)
+        except Exception as e:
+            print(f"Failed to send transaction email for {r['stid']}: {e}")
+
+
+def run(rows, fields, dry_run=False, notify=True, max_share=SHARE_CAP):
+    """Validate rows against current member balances and (unless dry_run) post the valid ones."""
+    members = {m['customer_id']: m for m in fetch_in('members', 'customer_id,balance,share_amount', 'customer_id',
+                                                     [str(r.get('customer_id') or '').strip() for r in rows])}
+    results = plan(rows, members, max_share)
+    accepted = [r for r in results if r['status'] == 'ok']
+    if accepted and not dry_run:
+        posted = post_deposits(accepted, {k: fields.get(k) for k in SHARED_FIELDS}, max_share)
+        for r, p in zip(accepted, posted):
+            if p.get('status') == 'error':
+                r.update(status='error', message=p['message'])
+                continue
+            r.update(status='posted', stid=p.get('stid'), to_share=float(p['to_share']),
+                     to_balance=float(p['to_balance']), share_amount_after=float(p['share_amount_after']),
+                     balance_after=float(p['balance_after']))
+        from app.finance.balance_snapshots import reopen
+        reopen([r['customer_id'] for r in accepted if r.get('stid')], fields.get('date'))
+        if notify:
+            from app.notification.outbox import send_later
+            send_later(send_deposit_receipts, [r for r in accepted if r.get('stid')])
+        accepted = [r for r in accepted if r['status'] == 'posted']
+    return {
+        'dry_run': dry_run,
+        'rows': len(results),
+        'accepted': len(accepted),
+        'errors': len(results) - len(accepted),
+        'total_amount': round(sum(r['amount'] for r in accepted), 2),
+        'to_share': round(sum(r['to_share'] for r in accepted), 2),
+        'to_balance': round(sum(r['to_balance'] for r in accepted), 2),
+        'stid_from': accepted[0].get('stid') if accepted and not dry_run else None,
+        'stid_to': accepted[-1].get('stid') if accepted and not dry_run else None,
+        'results': results,
+    }
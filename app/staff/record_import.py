@@ -0,0 +1,471 @@
+"""Bulk historical-record migration from a CSV/XLSX file.
+
+The file has one row per customer with the same sections as
+/staff/api/record-entry (same column names as its JSON keys):
+
+  member     share_amount, balance
+  share fee  share_fees
+  loan       loan_type, loan_id, loan_amount, loan_interest, loan_date,
+             surety1_id, surety2_id, principal_paid, interest_paid, date_paid
+  FD         fd_id, fd_amount, fd_interest, fd_reg_date, fd_maturity_date, fd_nominee
+
+validate() checks every row against keys read once up front (members,
+existing loan and FD ids) and is the whole of a dry run. import_rows() then
+reserves ID blocks for the valid rows - LN, FD and SF numbers from their
+sequences (supabase/migrations/20261019000500 and 0800), which single
+entries draw from too - and writes them CHUNK rows at a time. After every
+chunk the plan (reserved IDs) and progress are saved through the caller's
+checkpoint callbacks, so an interrupted import resumes where it stopped
+with the same IDs.
+
+Each chunk also skips what is already stored: loans, FDs and fees under
+their reserved IDs (a chunk re-run after a crash), and - when the
+checkpoint is gone and the rows got fresh IDs - a loan, FD or migration
+fee of the same customer with the same amount and date, whose ID the row
+then takes over. Re-importing a file never duplicates anything.
+"""
+import hashlib
+import re
+from datetime import datetime
+
+from app.supabase_pages import fetch_all, fetch_in
+from app.tabular_upload import UploadError, read_table
+
+CHUNK = 200
+MAX_ROWS = 20000
+MIGRATION_NOTE = 'Historical record (data migration)'
+FEE_REMARKS = 'Historical record entry (data migration)'
+# kind -> (reserving RPC, table, column, prefix)
+SEQUENCES = {
+    'loan': ('reserve_loan_numbers', 'loans', 'loan_id', 'LN'),
+    'fd': ('reserve_fd_numbers', 'fixed_deposits', 'system_fdid', 'FD'),
+    'share_fee': ('reserve_share_fee_numbers', 'share_fees', 'fee_id', 'SF'),
+}
+
+FIELDS = ('customer_id', 'share_amount', 'share_fees', 'balance',
+          'loan_type', 'loan_id', 'loan_amount', 'loan_interest', 'loan_date',
+          'surety1_id', 'surety2_id', 'principal_paid', 'interest_paid', 'date_paid',
+          'fd_id', 'fd_amount', 'fd_interest', 'fd_reg_date', 'fd_maturity_date', 'fd_nominee')
+COLUMNS = {field: (field,) for field in FIELDS}
+COLUMNS['customer_id'] += ('customer', 'member_id')
+NUMERIC = ('share_amount', 'share_fees', 'balance', 'loan_amount', 'loan_interest', 'principal_paid',
+           'interest_paid', 'fd_amount', 'fd_interest')
+DATES = ('loan_date', 'date_paid', 'fd_reg_date', 'fd_maturity_date')
+LOAN_TYPES = ('normal', 'emergency')
+
+
+def _supabase():
+    from app.auth.routes import supabase
+    return supabase
+
+
+def file_digest(data):
+    """Identifies the file a checkpoint belongs to."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def read_rows(filename, data):
+    fields, rows = read_table(filename, data, COLUMNS, MAX_ROWS)
+    if 'customer_id' not in fields:
+        raise UploadError('Header must have a customer_id column')
+    return rows
+
+
+def _highest(rows, key, prefix):
+    pattern = re.compile(rf"^{prefix}(\d+)$")
+    numbers = [int(m.group(1)) for m in (pattern.match(str(r.get(key) or '')) for r in rows) if m]
+    return max(numbers, default=0)
+
+
+_missing_rpcs = set()
+
+
+def reserve_numbers(kind, count):
+    """`count` numbers taken from the sequence of `kind`, or None while its RPC is not deployed."""
+    rpc, table = SEQUENCES[kind][:2]
+    if count <= 0:
+        return []
+    if rpc in _missing_rpcs:
+        return None
+    try:
+        return [int(n) for n in _supabase().rpc(rpc, {'p_count': count}).execute().data or []]
+    except Exception as e:
+        if 'PGRST202' not in str(e) and 'Could not find the function' not in str(e):
+            raise
+        _missing_rpcs.add(rpc)
+        print(f"[WARN] {rpc} not deployed, numbering {table} after the highest existing id")
+        return None
+
+
+def allocate(kind, count):
+    """`count` fresh ids of `kind` ('loan', 'fd', 'share_fee'), e.g. LN0042.
+
+    Without the sequence they follow the highest id in the table, which
+    reserves nothing.
+    """
+    _rpc, table, column, prefix = SEQUENCES[kind]
+    numbers = reserve_numbers(kind, count)
+    if numbers is None:
+        first = _highest(fetch_all(table, f'id,{column}'), column, prefix) + 1
+        numbers = range(first, first + count)
+    return [f"{prefix}{n:04d}" for n in numbers]
+
+
+def allocate_loan_ids(count):
+    return allocate('loan', count)
+
+
+def _number(row, field, problems):
+    value = row.get(field)
+    if value in (None, ''):
+        return 0.0
+    try:
+        return float(str(value).replace(',', ''))
+    except ValueError:
+        problems.append(f"{field} is not a number")
+        return 0.0
+
+
+def _tenure_months(reg_date, maturity_date):
+    tenure_months = 12  # default, as in record_entry
+    if reg_date and maturity_date:
+        try:
+            reg_dt = datetime.strptime(reg_date, '%Y-%m-%d')
+            mat_dt = datetime.strptime(maturity_date, '%Y-%m-%d')
+            tenure_months = max(1, (mat_dt.year - reg_dt.year) * 12 + (mat_dt.month - reg_dt.month))
+        except ValueError:
+            pass
+    return tenure_months
+
+
+def validate(rows):
+    """Check every row against keys prefetched once. Returns (results, members by customer_id).
+
+    Each result has row, customer_id, status ('ok' / 'error'), errors,
+    warnings and the parsed sections (member, share_fee, loan, fd).
+    """
+    customer_ids = {str(r.get('customer_id') or '').strip() for r in rows}
+    surety_ids = {str(r.get(k) or '').strip() for r in rows for k in ('surety1_id', 'surety2_id')}
+    members = {m['customer_id']: m for m in fetch_in('members', '*', 'customer_id', customer_ids | surety_ids)}
+    taken_loans = {r['loan_id'] for r in fetch_in('loans', 'loan_id', 'loan_id', [r.get('loan_id') for r in rows])}
+    taken_fds = {r['fdid'] for r in fetch_in('fixed_deposits', 'fdid', 'fdid', [r.get('fd_id') for r in rows])}
+    seen_loans, seen_fds, seen_customers = set(), set(), set()
+    today = datetime.now().strftime('%Y-%m-%d')
+
+    results = []
+    for row in rows:
+        errors, warnings = [], []
+        customer_id = str(row.get('customer_id') or '').strip()
+        result = {'row': row['row'], 'customer_id': customer_id, 'errors': errors, 'warnings': warnings}
+        results.append(result)
+        if not customer_id:
+            errors.append('customer_id is required')
+        elif customer_id not in members:
+            errors.append(f'Customer {customer_id} not found')
+        elif customer_id in seen_customers:
+            warnings.append('Customer appears more than once; member fields of the last row win')
+        seen_customers.add(customer_id)
+        values = {f: _number(row, f, errors) for f in NUMERIC}
+        for field in DATES:
+            if row.get(field):
+                try:
+                    datetime.strptime(row[field], '%Y-%m-%d')
+                except ValueError:
+                    errors.append(f'{field} must be YYYY-MM-DD')
+
+        member = {f: values[f] for f in ('share_amount', 'balance') if values[f]}
+        if member:
+            result['member'] = member
+        if values['share_fees'] > 0:
+            result['share_fee'] = {'amount': values['share_fees']}
+
+        if values['loan_amount'] > 0 or row.get('loan_type'):
+            loan_type = (row.get('loan_type') or '').strip().lower()
+            loan_id = (row.get('loan_id') or '').strip()
+            if loan_type not in LOAN_TYPES:
+                errors.append(f"loan_type must be one of {', '.join(LOAN_TYPES)}")
+            if values['loan_amount'] <= 0:
+                errors.append('loan_amount must be positive')
+            if loan_id and loan_id in taken_loans:
+                errors.append(f'Loan ID {loan_id} already exists')
+            elif loan_id and loan_id in seen_loans:
+                errors.append(f'Loan ID {loan_id} appears twice in the file')
+            seen_loans.add(loan_id)
+            sureties = [s for s in (str(row.get(k) or '').strip() for k in ('surety1_id', 'surety2_id')) if s]
+            for sid in sureties:
+                if sid not in members:
+                    warnings.append(f'Surety {sid} not found; stored without name/phone')
+            remaining = values['loan_amount'] - values['principal_paid']
+            result['loan'] = {
+                'loan_id': loan_id or None,
+                'loan_type': loan_type,
+                'loan_amount': values['loan_amount'],
+                'interest_rate': values['loan_interest'],
+                'loan_date': row.get('loan_date') or today,
+                'status': 'completed' if remaining <= 0 else 'approved',
+                'remaining': max(remaining, 0),
+                'principal_paid': values['principal_paid'],
+                'interest_paid': values['interest_paid'],
+                'date_paid': row.get('date_paid') or today,
+                'sureties': sureties,
+            }
+
+        if values['fd_amount'] > 0:
+            fd_id = (row.get('fd_id') or '').strip()
+            if fd_id and fd_id in taken_fds:
+                errors.append(f'FD ID {fd_id} already exists')
+            elif fd_id and fd_id in seen_fds:
+                errors.append(f'FD ID {fd_id} appears twice in the file')
+            seen_fds.add(fd_id)
+            reg_date = row.get('fd_reg_date') or today
+            result['fd'] = {
+                'fdid': fd_id or None,
+                'amount': values['fd_amount'],
+                'interest_rate': values['fd_interest'],
+                'deposit_date': reg_date,
+                'tenure': _tenure_months(reg_date, row.get('fd_maturity_date') or ''),
+                'nominee_name': (row.get('fd_nominee') or '').strip() or None,
+            }
+
+        if not errors and not any(k in result for k in ('member', 'share_fee', 'loan', 'fd')):
+            errors.append('No data provided to record. Fill at least one section.')
+        result['status'] = 'error' if errors else 'ok'
+    return results, members
+
+
+def allocate_ids(results):
+    """Give every valid row its loan id, system FD id and share fee id (in place)."""
+    valid = [r for r in results if r['status'] == 'ok']
+    loans = [r['loan'] for r in valid if 'loan' in r and not r['loan']['loan_id']]
+    for loan, loan_id in zip(loans, allocate('loan', len(loans))):
+        loan.update(loan_id=loan_id, allocated=True)
+    fds = [r['fd'] for r in valid if 'fd' in r]
+    for fd, system_fdid in zip(fds, allocate('fd', len(fds))):
+        fd.update(system_fdid=system_fdid, allocated=not fd['fdid'])
+        fd['fdid'] = fd['fdid'] or system_fdid
+    fees = [r['share_fee'] for r in valid if 'share_fee' in r]
+    for fee, fee_id in zip(fees, allocate('share_fee', len(fees))):
+        fee['fee_id'] = fee_id
+
+
+def _money(value):
+    return round(float(value or 0), 2)
+
+
+def adopt_stored(chunk):
+    """Give rows with freshly allocated ids the ids of matching records already stored (in place).
+
+    A loan matches on customer, amount and loan date, an FD on customer,
+    amount and deposit date, a share fee on customer and amount among the
+    fees this import writes.
+    """
+    customers = list({r['customer_id'] for r in chunk})
+    if any(r.get('loan', {}).get('allocated') for r in chunk):
+        stored = {(row['customer_id'], _money(row.get('loan_amount')), str(row.get('created_at') or '')[:10]):
+                  row['loan_id'] for row in fetch_in('loans', 'loan_id,customer_id,loan_amount,created_at',
+                                                     'customer_id', customers)}
+        for r in chunk:
+            loan = r.get('loan')
+            if loan and loan.get('allocated'):
+                loan['loan_id'] = stored.get((r['customer_id'], _money(loan['loan_amount']), loan['loan_date']),
+                                             loan['loan_id'])
+    if any(r.get('fd', {}).get('allocated') for r in chunk):
+        stored = {(row['customer_id'], _money(row.get('amount')), str(row.get('deposit_date') or '')[:10]): row
+                  for row in fetch_in('fixed_deposits', 'system_fdid,fdid,customer_id,amount,deposit_date',
+                                      'customer_id', customers)}
+        for r in chunk:
+            fd = r.get('fd')
+            found = fd and fd.get('allocated') and stored.get(
+                (r['customer_id'], _money(fd['amount']), fd['deposit_date']))
+            if found:
+                fd.update(system_fdid=found['system_fdid'], fdid=found.get('fdid') or found['system_fdid'])
+    if any('share_fee' in r for r in chunk):
+        stored = {(row['customer_id'], _money(row.get('amount'))): row['fee_id']
+                  for row in fetch_in('share_fees', 'fee_id,customer_id,amount,remarks', 'customer_id', customers)
+                  if row.get('remarks') == FEE_REMARKS}
+        for r in chunk:
+            if 'share_fee' in r:
+                fee = r['share_fee']
+                fee['fee_id'] = stored.get((r['customer_id'], _money(fee['amount'])), fee['fee_id'])
+
+
+def _missing(table, column, values):
+    have = {r[column] for r in fetch_in(table, column, column, values)}
+    return [v for v in values if v not in have]
+
+
+def write_chunk(chunk, members, recorded_by=None):
+    """Write one chunk of allocated rows, skipping anything already stored. Returns per-table counts."""
+    supabase = _supabase()
+    counts = {'members': 0, 'share_fees': 0, 'loans': 0, 'sureties': 0, 'loan_records': 0, 'fixed_deposits': 0}
+
+    changes = {}
+    for r in chunk:
+        if 'member' in r:
+            changes.setdefault(r['customer_id'], {}).update(r['member'])
+    if changes:
+        # Upsert needs whole rows; read them fresh so other columns are not rolled back.
+        # active_surety_count belongs to its trigger and is left out.
+        current = fetch_in('members', '*', 'customer_id', list(changes))
+        updated = {m['customer_id']: {**{k: v for k, v in m.items() if k != 'active_surety_count'},
+                                      **changes[m['customer_id']]} for m in current}
+        supabase.table('members').upsert(list(updated.values())).execute()
+        counts['members'] = len(updated)
+
+    fees = {r['share_fee']['fee_id']: r for r in chunk if 'share_fee' in r}
+    new_fees = _missing('share_fees', 'fee_id', list(fees))
+    if new_fees:
+        supabase.table('share_fees').insert([{
+            'fee_id': fee_id,
+            'customer_id': fees[fee_id]['customer_id'],
+            'amount': fees[fee_id]['share_fee']['amount'],
+            'payment_mode': 'cash',
+            'remarks': FEE_REMARKS,
+            'recorded_by': recorded_by or None,
+        } for fee_id in new_fees]).execute()
+        counts['share_fees'] = len(new_fees)
+
+    loans = {r['loan']['loan_id']: r for r in chunk if 'loan' in r}
+    new_loans = _missing('loans', 'loan_id', list(loans))
+    if new_loans:
+        rows = []
+        for loan_id in new_loans:
+            r = loans[loan_id]
+            loan = r['loan']
+            purpose = 'purpose_of_loan' if loan['loan_type'] == 'normal' else 'purpose_of_emergency_loan'
+            rows.append({
+                'loan_id': loan_id,
+                'customer_id': r['customer_id'],
+                'loan_type': loan['loan_type'],
+                'loan_amount': loan['loan_amount'],
+                'interest_rate': loan['interest_rate'],
+                'loan_term_months': 0,  # historical, unknown tenure
+                'status': loan['status'],
+                'created_at': loan['loan_date'],
+                purpose: MIGRATION_NOTE,
+            })
+        supabase.table('loans').insert(rows).execute()
+        counts['loans'] = len(new_loans)
+    if loans:
+        uuids = {row['loan_id']: row['id'] for row in fetch_in('loans', 'id,loan_id', 'loan_id', list(loans))}
+        with_sureties = {row['loan_id'] for row in fetch_in('sureties', 'loan_id', 'loan_id', list(uuids.values()))}
+        surety_rows = []
+        for loan_id, r in loans.items():
+            loan_uuid = uuids.get(loan_id)
+            if not loan_uuid or loan_uuid in with_sureties:
+                continue
+            for sid in r['loan']['sureties']:
+                sm = members.get(sid, {})
+                surety_rows.append({
+                    'loan_id': loan_uuid,
+                    'surety_customer_id': sid,
+                    'surety_name': sm.get('name', ''),
+                    'surety_mobile': sm.get('phone', ''),
+                    'surety_signature_url': sm.get('signature_url'),
+                    'surety_photo_url': sm.get('photo_url'),
+                    'active': r['loan']['status'] == 'approved',
+                })
+        if surety_rows:
+            supabase.table('sureties').insert(surety_rows).execute()
+            counts['sureties'] = len(surety_rows)
+
+        paid = [loan_id for loan_id, r in loans.items()
+                if r['loan']['principal_paid'] > 0 or r['loan']['interest_paid'] > 0]
+        have_records = {row['loan_id'] for row in fetch_in('loan_records', 'loan_id', 'loan_id', paid)}
+        record_rows = []
+        for loan_id in paid:
+            if loan_id in have_records:
+                continue
+            loan = loans[loan_id]['loan']
+            record_rows.append({
+                'loan_id': loan_id,
+                'repayment_date': loan['date_paid'],
+                'repayment_amount': loan['principal_paid'] + loan['interest_paid'],
+                'principal_amount': loan['principal_paid'],
+                'interest_amount': loan['interest_paid'],
+                'remaining_principal_amount': loan['remaining'],
+                'outstanding_balance': loan['remaining'],
+                'status': 'active',
+            })
+        if record_rows:
+            supabase.table('loan_records').insert(record_rows).execute()
+            counts['loan_records'] = len(record_rows)
+
+    fds = {r['fd']['system_fdid']: r for r in chunk if 'fd' in r}
+    new_fds = _missing('fixed_deposits', 'system_fdid', list(fds))
+    if new_fds:
+        supabase.table('fixed_deposits').insert([{
+            'system_fdid': system_fdid,
+            'fdid': fds[system_fdid]['fd']['fdid'],
+            'customer_id': fds[system_fdid]['customer_id'],
+            'amount': fds[system_fdid]['fd']['amount'],
+            'deposit_date': fds[system_fdid]['fd']['deposit_date'],
+            'tenure': fds[system_fdid]['fd']['tenure'],
+            'interest_rate': fds[system_fdid]['fd']['interest_rate'],
+            'status': 'active',
+            'nominee_name': fds[system_fdid]['fd']['nominee_name'],
+        } for system_fdid in new_fds]).execute()
+        counts['fixed_deposits'] = len(new_fds)
+    return counts
+
+
+def summary(results, dry_run, written=None, resumed_from=0):
+    valid = [r for r in results if r['status'] != 'error']
+    return {
+        'dry_run': dry_run,
+        'rows': len(results),
+        'valid': len(valid),
+        'errors': len(results) - len(valid),
+        'warnings': sum(1 for r in results if r['warnings']),
+        'sections': {k: sum(1 for r in valid if k in r) for k in ('member', 'share_fee', 'loan', 'fd')},
+        'written': written,
+        'resumed_from_row': resumed_from,
+        'results': results,
+    }
+
+
+def import_rows(rows, digest, load_checkpoint, save_checkpoint, dry_run=False, chunk=CHUNK,
+                recorded_by=None, progress=None):
+    """Validate and (unless dry_run) write `rows`; resumable through the checkpoint callbacks.
+
+    load_checkpoint() returns the state last passed to save_checkpoint(state)
+    or None. A checkpoint for a different file (digest) is ignored.
+    """
+    checkpoint = None if dry_run else load_checkpoint()
+    if checkpoint and checkpoint.get('digest') == digest:
+        results = checkpoint['results']
+        members = {m['customer_id']: m for m in fetch_in(
+            'members', '*', 'customer_id',
+            {r['customer_id'] for r in results} | {s for r in results for s in r.get('loan', {}).get('sureties', [])})}
+        done = checkpoint['done']
+        written = checkpoint['written']
+    else:
+        results, members = validate(rows)
+        if dry_run:
+            return summary(results, dry_run)
+        allocate_ids(results)
+        done = 0
+        written = {}
+        save_checkpoint({'digest': digest, 'results': results, 'done': done, 'written': written})
+    resumed_from = done
+
+    valid = [r for r in results if r['status'] == 'ok']
+    while done < len(valid):
+        batch = valid[done:done + chunk]
+        adopt_stored(batch)
+        counts = write_chunk(batch, members, recorded_by)
+        for key, n in counts.items():
+            written[key] = written.get(key, 0) + n
+        done += len(batch)
+        save_checkpoint({'digest': digest, 'results': results, 'done': done, 'written': written})
+        if progress:
+            progress(done, len(valid))
+
+    customers = sorted({r['customer_id'] for r in valid if r.get('loan', {}).get('principal_paid')
+                        or r.get('loan', {}).get('interest_paid')})
+    if customers and written.get('loan_records'):
+        from app.finance.credit_scores import refresh_members
+        refresh_members(customers)
+    for r in valid:
+        r['status'] = 'imported'
+    return summary(results, dry_run, written, resumed_from)
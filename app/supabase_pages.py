@@ -0,0 +1,56 @@
+"""Reading whole Supabase tables page by page.
+
+PostgREST caps a single response (1000 rows by default), so a plain
+select() on a large table silently returns only the first page. Reports and
+batch jobs that need every row use fetch_all() instead.
+"""
+
+PAGE_SIZE = 1000
+
+
+def fetch_all(table, columns, page_size=PAGE_SIZE, filters=(), **eq):
+    """Every row of `table` (optionally filtered by column=value), ordered by id.
+
+    `columns` must include id: pages are taken in id order so rows are
+    neither skipped nor repeated between pages. `filters` adds other
+    conditions as (operator, column, value), e.g. ('gte', 'date', '2025-04-01').
+    """
+    from app.auth.routes import supabase
+    rows = []
+    offset = 0
+    while True:
+        query = supabase.table(table).select(columns)
+        for col, value in eq.items():
+            query = query.eq(col, value)
+        for op, col, value in filters:
+            query = getattr(query, op)(col, value)
+        page = query.order('id').range(offset, offset + page_size - 1).execute().data or []
+        rows.extend(page)
+        if len(page) < page_size:
+            return rows
+        offset += page_size
+
+
+IN_CHUNK = 200
+
+
+def fetch_in(table, columns, column, values, chunk=IN_CHUNK, page_size=PAGE_SIZE):
+    """Rows of `table` whose `column` is one of `values`.
+
+    The values go into the request URL, so long lists are sent in chunks
+    of `chunk` values. One value can match many rows (a loan's repayments),
+    so each chunk is read in id-ordered pages like fetch_all().
+    """
+    from app.auth.routes import supabase
+    values = list(dict.fromkeys(v for v in values if v not in (None, '')))
+    rows = []
+    for start in range(0, len(values), chunk):
+        offset = 0
+        while True:
+            page = supabase.table(table).select(columns).in_(column, values[start:start + chunk]) \
+                .order('id').range(offset, offset + page_size - 1).execute().data or []
+            rows.extend(page)
+            if len(page) < page_size:
+                break
+            offset += page_size
+    return rows
@@ -0,0 +1,72 @@
+"""Reading uploaded CSV/XLSX sheets into rows of named fields.
+
+Batch imports (repayments, historical records) accept a spreadsheet with a
+header row. read_table() maps the header cells onto field names through a
+{field: (accepted header spellings)} table, drops blank lines and returns
+one dict per data row with its 1-based line number under 'row'.
+"""
+import csv
+import io
+import re
+from datetime import date, datetime
+
+
+class UploadError(ValueError):
+    """The file itself could not be read (as opposed to a bad row)."""
+
+
+def header_key(value):
+    """Header cell as a lookup key: lower case, runs of spaces/punctuation as '_'."""
+    return re.sub(r'[\s\-./]+', '_', str(value or '').strip().lower())
+
+
+def _cell(value):
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return '' if value is None else str(value).strip()
+
+
+def _rows(table, columns, max_rows):
+    lookup = {alias: field for field, aliases in columns.items() for alias in aliases}
+    header = None
+    rows = []
+    for line, values in enumerate(table, start=1):
+        values = [_cell(v) for v in values]
+        if not any(values):
+            continue
+        if header is None:
+            header = [lookup.get(header_key(v)) for v in values]
+            continue
+        row = {'row': line}
+        for field, value in zip(header, values):
+            if field and value:
+                row[field] = value
+        rows.append(row)
+    if header is None:
+        raise UploadError('File is empty')
+    if max_rows and len(rows) > max_rows:
+        raise UploadError(f'At most {max_rows} rows per file')
+    return set(f for f in header if f), rows
+
+
+def read_table(filename, data, columns, max_rows=None):
+    """(fields present in the header, rows) of a .csv or .xlsx upload."""
+    name = (filename or '').lower()
+    if name.endswith(('.xlsx', '.xlsm')):
+        from openpyxl import load_workbook
+        try:
+            sheet = load_workbook(io.BytesIO(data), read_only=True, data_only=True).worksheets[0]
+        except Exception as e:
+            raise UploadError(f'Could not read workbook: {e}')
+        return _rows(sheet.iter_rows(values_only=True), columns, max_rows)
+    if name.endswith('.csv') or not name:
+        try:
+            text = data.decode('utf-8-sig')
+        except UnicodeDecodeError:
+            raise UploadError('CSV must be UTF-8')
+        return _rows(csv.reader(io.StringIO(text)), columns, max_rows)
+    raise UploadError('Upload a .csv or .xlsx file')
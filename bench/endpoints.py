@@ -0,0 +1,178 @@
+"""Endpoint benchmarks against an in-process fake Supabase.
+
+Drives the real Flask app through the test client, with every module's
+Supabase client swapped for bench.fake_supabase and SMTP disabled, and
+reports per endpoint: p50/p95 latency, Supabase queries per request (from
+the Server-Timing header) and peak Python memory of one request.
+
+    python -m bench.endpoints                       # 1k, 10k and 100k members
+    python -m bench.endpoints --sizes 1000 --iterations 50 --only statements
+    python -m bench.endpoints --latency-ms 25       # model Supabase round trips
+    python -m bench.endpoints --json bench_output.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import random
+import re
+import sys
+import time
+import tracemalloc
+from datetime import date
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+from bench.fake_supabase import install  # noqa: E402
+from bench.seed import STAFF_EMAIL, build_society  # noqa: E402
+
+
+class Endpoint:
+    def __init__(self, name, method, path, role='staff', data=None, heavy=False):
+        self.name = name
+        self.method = method
+        self.path = path          # str or callable(ctx) -> str
+        self.role = role
+        self.data = data          # callable(ctx) -> dict (form data)
+        self.heavy = heavy        # capped iterations (full-table exports)
+
+
+def _member(ctx):
+    return ctx['rng'].choice(ctx['members'])['customer_id']
+
+
+def _borrower(ctx):
+    return ctx['rng'].choice(ctx['borrowers'])
+
+
+def _deposit_form(ctx):
+    return {
+        'customer_id': _member(ctx), 'type': 'deposit', 'amount': '1500',
+        'from_account': 'member', 'to_account': 'society', 'date': date.today().isoformat(),
+        'transaction_id': f"UTR{ctx['rng'].randrange(10 ** 9)}", 'from_bank_name': 'SBI', 'to_bank_name': 'KDCC',
+    }
+
+
+def _ym(ctx):
+    return f"year={ctx['today'].year}&month={ctx['today'].month}"
+
+
+ENDPOINTS = [
+    Endpoint('add_transaction', 'POST', '/staff/api/add-transaction', data=_deposit_form),
+    Endpoint('recent_transactions', 'GET', lambda c: f"/staff/api/recent-transactions?{_ym(c)}"),
+    Endpoint('admin_recent_transactions', 'GET', lambda c: f"/admin/api/recent-transactions?{_ym(c)}", role='admin'),
+    Endpoint('monthly_summary', 'GET', lambda c: f"/admin/api/monthly-summary?{_ym(c)}", role='admin'),
+    Endpoint('statements', 'GET', lambda c: f"/staff/api/statements?customer_id={_member(c)}&range=1y"),
+    Endpoint('statements_pdf', 'GET', lambda c: f"/staff/api/statements?customer_id={_member(c)}&range=1y&format=pdf"),
+    Endpoint('fetch_customer_details', 'GET', lambda c: f"/loan/fetch_customer_details?customer_id={_borrower(c)}"),
+    Endpoint('recent_transactions_excel', 'GET', lambda c: f"/staff/api/recent-transactions/excel?{_ym(c)}"),
+    Endpoint('admin_recent_transactions_excel', 'GET',
+             lambda c: f"/admin/api/recent-transactions/excel?year={c['today'].year}", role='admin'),
+    Endpoint('audit_transactions_excel', 'GET', '/admin/api/audit-transactions/excel', role='admin', heavy=True),
+]
+
+_DB_TIMING = re.compile(r'db;dur=([\d.]+);desc="(\d+) calls"')
+
+
+def _client(app, role):
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['email'] = STAFF_EMAIL
+        sess['role'] = role
+        sess['staff_email'] = STAFF_EMAIL
+    return client
+
+
+def _call(client, ep, ctx):
+    path = ep.path(ctx) if callable(ep.path) else ep.path
+    if ep.method == 'POST':
+        return client.post(path, data=ep.data(ctx) if ep.data else None)
+    return client.get(path)
+
+
+def _pct(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round((len(ordered) - 1) * q)))]
+
+
+def run_size(app, size, endpoints, iterations, latency_ms, smtp_ms, verbose):
+    t0 = time.perf_counter()
+    db = build_society(size, latency_ms=latency_ms)
+    install(db, smtp_delay_ms=smtp_ms)
+    print(f"\n== {size} members (seeded in {time.perf_counter() - t0:.1f}s) ==")
+    ctx = {
+        'rng': random.Random(7),
+        'today': date.today(),
+        'members': db.tables['members'].rows,
+        'borrowers': sorted({l['customer_id'] for l in db.tables['loans'].rows}) or ['KSTHST000001'],
+    }
+    clients = {role: _client(app, role) for role in ('staff', 'admin')}
+    results = []
+    quiet = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+    with quiet:
+        for ep in endpoints:
+            client = clients[ep.role]
+            n = min(iterations, 3) if ep.heavy else iterations
+            _call(client, ep, ctx)  # warm-up (template compile, lazy imports)
+            latencies, queries, statuses = [], [], set()
+            for _ in range(n):
+                start = time.perf_counter()
+                resp = _call(client, ep, ctx)
+                latencies.append((time.perf_counter() - start) * 1000.0)
+                statuses.add(resp.status_code)
+                m = _DB_TIMING.search(resp.headers.get('Server-Timing', ''))
+                queries.append(int(m.group(2)) if m else 0)
+            tracemalloc.start()
+            _call(client, ep, ctx)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            results.append({
+                'size': size, 'endpoint': ep.name, 'iterations': n,
+                'p50_ms': round(_pct(latencies, 0.50), 2), 'p95_ms': round(_pct(latencies, 0.95), 2),
+                'queries': round(sum(queries) / len(queries), 1),
+                'peak_mb': round(peak / (1024 * 1024), 2),
+                'status': ','.join(str(s) for s in sorted(statuses)),
+            })
+    print(f"{'endpoint':34s} {'p50 ms':>9s} {'p95 ms':>9s} {'queries':>8s} {'peak MB':>8s}  status")
+    for r in results:
+        print(f"{r['endpoint']:34s} {r['p50_ms']:9.1f} {r['p95_ms']:9.1f} {r['queries']:8.1f} {r['peak_mb']:8.2f}  {r['status']}")
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='1000,10000,100000', help='comma-separated member counts')
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--only', help='comma-separated endpoint names (substring match)')
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='simulated Supabase round trip per query')
+    parser.add_argument('--smtp-ms', type=float, default=0.0, help='simulated SMTP connect/send time')
+    parser.add_argument('--json', help='write results to this file')
+    parser.add_argument('--verbose', action='store_true', help='keep the app\'s print output')
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault('SUPABASE_URL', 'https://fake.supabase.local')
+    os.environ.setdefault('SUPABASE_KEY', 'bench')
+    with contextlib.redirect_stdout(io.StringIO()):
+        from app import create_app
+        app = create_app()
+    app.config.update(TESTING=True, PERF_LOG_ENABLED=False, RATE_LIMIT_ENABLED=False)
+    if not args.verbose:
+        logging.getLogger('xhtml2pdf').setLevel(logging.CRITICAL)
+
+    endpoints = ENDPOINTS
+    if args.only:
+        wanted = [w.strip() for w in args.only.split(',') if w.strip()]
+        endpoints = [e for e in ENDPOINTS if any(w in e.name for w in wanted)]
+    results = []
+    for size in [int(s) for s in args.sizes.split(',') if s.strip()]:
+        results.extend(run_size(app, size, endpoints, args.iterations, args.latency_ms, args.smtp_ms, args.verbose))
+    if args.json:
+        with open(args.json, 'w') as fh:
+            json.dump(results, fh, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,484 @@
+"""In-memory stand-in for the Supabase client, for benchmarks only.
+
+Implements the subset of the postgrest-py builder API the app uses:
+select (with count='exact'), insert, update, upsert, delete, rpc and the
+filters eq/neq/gt/gte/lt/lte/like/ilike/in_/is_/or_/filter/match, plus
+order/limit/range/single/maybe_single. Storage uploads are accepted and kept
+in memory.
+
+Every execute() is reported to app.instrumentation as a 'db' call, so the
+Server-Timing header counts fake queries exactly like real ones. An optional
+per-query latency models the network round trip to Supabase.
+"""
+import copy
+import fnmatch
+import sys
+import time
+import uuid
+from datetime import datetime
+
+
+class FakeResponse:
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+
+class FakeAPIError(Exception):
+    pass
+
+
+def _num(v):
+    if isinstance(v, bool):
+        return None
+    if isinstance(v, (int, float)):
+        return float(v)
+    if isinstance(v, str) and (not v or v.count('-') > 1 or ':' in v or v[0].isalpha()):
+        return None  # dates, timestamps, ids: compare as text without paying for float()
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        return None
+
+
+def _cmp(a, b):
+    """Compare like Postgres would for the column types the app uses."""
+    na, nb = _num(a), _num(b)
+    if na is not None and nb is not None:
+        return (na > nb) - (na < nb)
+    sa, sb = str(a), str(b)
+    return (sa > sb) - (sa < sb)
+
+
+def _eq(a, b):
+    if a is None or b is None:
+        return False
+    if isinstance(a, bool) or isinstance(b, bool):
+        return str(a).lower() == str(b).lower()
+    return _cmp(a, b) == 0
+
+
+def _index_key(v):
+    if isinstance(v, bool) or str(v).lower() in ('true', 'false'):
+        return str(v).lower()
+    n = _num(v)
+    return repr(n) if n is not None else str(v)
+
+
+def _like(value, pattern, ci=False):
+    if value is None:
+        return False
+    pat = str(pattern).replace('%', '*').replace('_', '?')
+    v = str(value)
+    if ci:
+        return fnmatch.fnmatchcase(v.lower(), pat.lower())
+    return fnmatch.fnmatchcase(v, pat)
+
+
+def _make_pred(col, op, val):
+    if op == 'eq':
+        return lambda r: _eq(r.get(col), val)
+    if op == 'neq':
+        return lambda r: r.get(col) is not None and not _eq(r.get(col), val)
+    if op in ('gt', 'gte', 'lt', 'lte'):
+        want = {'gt': (1,), 'gte': (0, 1), 'lt': (-1,), 'lte': (-1, 0)}[op]
+        return lambda r: r.get(col) is not None and _cmp(r.get(col), val) in want
+    if op == 'like':
+        return lambda r: _like(r.get(col), val)
+    if op == 'ilike':
+        return lambda r: _like(r.get(col), val, ci=True)
+    if op == 'in':
+        vals = list(val)
+        return lambda r: any(_eq(r.get(col), v) for v in vals)
+    if op == 'is':
+        if val in (None, 'null'):
+            return lambda r: r.get(col) is None
+        return lambda r: str(r.get(col)).lower() == str(val).lower()
+    raise FakeAPIError(f"unsupported operator {op}")
+
+
+def _split_top(expr):
+    parts, depth, cur = [], 0, ''
+    for ch in expr:
+        if ch == '(':
+            depth += 1
+        elif ch == ')':
+            depth -= 1
+        if ch == ',' and depth == 0:
+            parts.append(cur)
+            cur = ''
+        else:
+            cur += ch
+    if cur:
+        parts.append(cur)
+    return parts
+
+
+def _parse_or(expr):
+    preds = []
+    for part in _split_top(expr):
+        col, op, raw = part.split('.', 2)
+        if op == 'in':
+            raw = [v.strip().strip('"') for v in raw.strip('()').split(',') if v.strip()]
+        preds.append(_make_pred(col, op, raw))
+    return lambda r: any(p(r) for p in preds)
+
+
+class _Table:
+    def __init__(self):
+        self.rows = []
+        self.version = 0
+        self._indexes = {}
+
+    def touch(self, columns=None):
+        """Drop indexes affected by a write (all of them when columns is None)."""
+        self.version += 1
+        if columns is None:
+            self._indexes.clear()
+        else:
+            for col in columns:
+                self._indexes.pop(col, None)
+
+    def add(self, rows):
+        self.rows.extend(rows)
+        self.version += 1
+        for col, idx in self._indexes.items():
+            for row in rows:
+                v = row.get(col)
+                if v is not None:
+                    idx.setdefault(_index_key(v), []).append(row)
+
+    def index(self, col):
+        idx = self._indexes.get(col)
+        if idx is None:
+            idx = {}
+            for row in self.rows:
+                v = row.get(col)
+                if v is not None:
+                    idx.setdefault(_index_key(v), []).append(row)
+            self._indexes[col] = idx
+        return idx
+
+
+class QueryBuilder:
+    def __init__(self, db, table):
+        self.db = db
+        self.table_name = table
+        self.op = 'select'
+        self.columns = '*'
+        self.count = None
+        self.payload = None
+        self.on_conflict = None
+        self.preds = []
+        self.first_eq = None
+        self.orders = []
+        self._limit = None
+        self._offset = 0
+        self._single = None
+
+    # ---- operations ----
+    def select(self, *columns, count=None, **_kw):
+        if self.op == 'select':
+            self.columns = ','.join(columns) if columns else '*'
+        self.count = count
+        return self
+
+    def insert(self, rows, **_kw):
+        self.op, self.payload = 'insert', rows
+        return self
+
+    def update(self, values, **_kw):
+        self.op, self.payload = 'update', values
+        return self
+
+    def upsert(self, rows, on_conflict=None, **_kw):
+        self.op, self.payload = 'upsert', rows
+        if isinstance(on_conflict, str):
+            on_conflict = [c.strip() for c in on_conflict.split(',') if c.strip()]
+        self.on_conflict = list(on_conflict or ['id'])
+        return self
+
+    def delete(self, **_kw):
+        self.op = 'delete'
+        return self
+
+    # ---- filters ----
+    def _add(self, col, op, val):
+        if op == 'eq' and self.first_eq is None:
+            self.first_eq = (col, val)
+        self.preds.append(_make_pred(col, op, val))
+        return self
+
+    def eq(self, col, val): return self._add(col, 'eq', val)
+    def neq(self, col, val): return self._add(col, 'neq', val)
+    def gt(self, col, val): return self._add(col, 'gt', val)
+    def gte(self, col, val): return self._add(col, 'gte', val)
+    def lt(self, col, val): return self._add(col, 'lt', val)
+    def lte(self, col, val): return self._add(col, 'lte', val)
+    def like(self, col, val): return self._add(col, 'like', val)
+    def ilike(self, col, val): return self._add(col, 'ilike', val)
+    def in_(self, col, vals): return self._add(col, 'in', vals)
+    def is_(self, col, val): return self._add(col, 'is', val)
+
+    def filter(self, col, op, val):
+        if op == 'in' and isinstance(val, str):
+            val = [v.strip().strip('"') for v in val.strip('()').split(',') if v.strip()]
+        return self._add(col, op, val)
+
+    def match(self, query):
+        for col, val in query.items():
+            self._add(col, 'eq', val)
+        return self
+
+    def or_(self, expr, **_kw):
+        self.preds.append(_parse_or(expr))
+        return self
+
+    def order(self, col, desc=False, **_kw):
+        self.orders.append((col, desc))
+        return self
+
+    def limit(self, n, **_kw):
+        self._limit = int(n)
+        return self
+
+    def range(self, start, end, **_kw):
+        self._offset = int(start)
+        self._limit = int(end) - int(start) + 1
+        return self
+
+    def single(self):
+        self._single = 'single'
+        return self
+
+    def maybe_single(self):
+        self._single = 'maybe'
+        return self
+
+    # ---- execution ----
+    def _candidates(self, table):
+        if self.first_eq is not None:
+            col, val = self.first_eq
+            return list(table.index(col).get(_index_key(val), ()))
+        return table.rows
+
+    def _matched(self, table):
+        return [r for r in self._candidates(table) if all(p(r) for p in self.preds)]
+
+    def _project(self, row):
+        if self.columns.strip() == '*':
+            return dict(row)
+        cols = [c.strip() for c in _split_top(self.columns) if c.strip() and '(' not in c]
+        if '*' in cols:
+            return dict(row)
+        return {c: row.get(c) for c in cols}
+
+    def _sort(self, rows):
+        for col, desc in reversed(self.orders):
+            present = [r for r in rows if r.get(col) is not None]
+            missing = [r for r in rows if r.get(col) is None]
+            present.sort(key=lambda r: (_num(r.get(col)) is None, _num(r.get(col)) or 0, str(r.get(col))), reverse=desc)
+            # Postgres default: NULLS LAST for ASC, NULLS FIRST for DESC
+            rows = (missing + present) if desc else (present + missing)
+        return rows
+
+    def _new_row(self, values):
+        row = copy.deepcopy(values)
+        row.setdefault('id', str(uuid.uuid4()))
+        row.setdefault('created_at', datetime.utcnow().isoformat())
+        return row
+
+    def _run(self):
+        table = self.db.tables.setdefault(self.table_name, _Table())
+        if self.op == 'select':
+            rows = self._sort(self._matched(table))
+            count = len(rows) if self.count else None
+            rows = rows[self._offset:]
+            if self._limit is not None:
+                rows = rows[:self._limit]
+            if self.db.max_rows is not None:
+                rows = rows[:self.db.max_rows]
+            data = [self._project(r) for r in rows]
+            if self._single:
+                if not data:
+                    if self._single == 'maybe':
+                        return None
+                    raise FakeAPIError('JSON object requested, multiple (or no) rows returned')
+                return FakeResponse(data[0], count)
+            return FakeResponse(data, count)
+        if self.op == 'insert':
+            payload = self.payload if isinstance(self.payload, list) else [self.payload]
+            new_rows = [self._new_row(p) for p in payload]
+            table.add(new_rows)
+            return FakeResponse([dict(r) for r in new_rows])
+        if self.op == 'update':
+            rows = self._matched(table)
+            for r in rows:
+                r.update(copy.deepcopy(self.payload))
+            table.touch(self.payload.keys())
+            return FakeResponse([dict(r) for r in rows])
+        if self.op == 'upsert':
+            payload = self.payload if isinstance(self.payload, list) else [self.payload]
+            out = []
+            for p in payload:
+                existing = None
+                key = tuple(str(p.get(c)) for c in self.on_conflict)
+                if all(p.get(c) is not None for c in self.on_conflict):
+                    candidates = table.index(self.on_conflict[0]).get(_index_key(p.get(self.on_conflict[0])), ())
+                    existing = next((r for r in candidates
+                                     if tuple(str(r.get(c)) for c in self.on_conflict) == key), None)
+                if existing is not None:
+                    existing.update(copy.deepcopy(p))
+                    table.touch(p.keys())
+                    out.append(dict(existing))
+                else:
+                    row = self._new_row(p)
+                    table.add([row])
+                    out.append(dict(row))
+            return FakeResponse(out)
+        if self.op == 'delete':
+            doomed = self._matched(table)
+            ids = set(map(id, doomed))
+            table.rows = [r for r in table.rows if id(r) not in ids]
+            table.touch()
+            return FakeResponse([dict(r) for r in doomed])
+        raise FakeAPIError(f"unsupported op {self.op}")
+
+    def execute(self):
+        return self.db._timed(self._run)
+
+
+class RpcBuilder(QueryBuilder):
+    def __init__(self, db, name, params):
+        super().__init__(db, f"rpc:{name}")
+        self.name = name
+        self.params = params or {}
+
+    def execute(self):
+        fn = self.db.rpcs.get(self.name)
+        if fn is None:
+            raise FakeAPIError(f"Could not find the function public.{self.name}")
+        return self.db._timed(lambda: FakeResponse(fn(self.db, **self.params)))
+
+
+class _Bucket:
+    def __init__(self, db, name):
+        self.db = db
+        self.name = name
+
+    def upload(self, path, file, file_options=None):
+        data = file.read() if hasattr(file, 'read') else file
+        self.db.objects[(self.name, path)] = bytes(data)
+        return {'Key': f"{self.name}/{path}"}
+
+    def download(self, path):
+        return self.db.objects[(self.name, path)]
+
+    def get_public_url(self, path):
+        return f"https://fake.supabase.local/storage/v1/object/public/{self.name}/{path}"
+
+
+class _Storage:
+    def __init__(self, db):
+        self.db = db
+
+    def from_(self, bucket):
+        return _Bucket(self.db, bucket)
+
+
+class FakeSupabase:
+    """Drop-in for supabase.Client: `table()`, `rpc()` and `storage`."""
+
+    def __init__(self, latency_ms=0.0, max_rows=None):
+        self.tables = {}
+        # PostgREST's db-max-rows: no response carries more rows than this
+        self.max_rows = max_rows
+        self.rpcs = {}
+        self.objects = {}
+        self.latency = float(latency_ms) / 1000.0
+        self.queries = 0
+        self.storage = _Storage(self)
+
+    def table(self, name):
+        return QueryBuilder(self, name)
+
+    from_ = table
+
+    def rpc(self, name, params=None, **_kw):
+        return RpcBuilder(self, name, params)
+
+    def register_rpc(self, name, fn):
+        """fn(db, **params) -> data"""
+        self.rpcs[name] = fn
+
+    def load(self, table, rows):
+        self.tables.setdefault(table, _Table()).add(rows)
+
+    def _timed(self, fn):
+        start = time.perf_counter()
+        if self.latency:
+            time.sleep(self.latency)
+        try:
+            return fn()
+        finally:
+            self.queries += 1
+            try:
+                from app import instrumentation
+                instrumentation.record('db', time.perf_counter() - start)
+            except Exception:
+                pass
+
+
+class _FakeSMTP:
+    """No-network SMTP_SSL replacement; optional delay models the Gmail round trip."""
+    delay = 0.0
+
+    def __init__(self, *args, **kwargs):
+        if self.delay:
+            time.sleep(self.delay)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def login(self, *a, **k):
+        return (235, b'ok')
+
+    def send_message(self, *a, **k):
+        if self.delay:
+            time.sleep(self.delay)
+        return {}
+
+    sendmail = send_message
+
+    def quit(self):
+        return None
+
+    def ehlo(self, *a, **k):
+        return (250, b'ok')
+
+    starttls = ehlo
+
+
+def install(fake, smtp_delay_ms=0.0):
+    """Point every loaded app module at `fake` and disable real SMTP.
+
+    Call after create_app() so all blueprint modules are imported.
+    """
+    import smtplib
+    from supabase import Client
+
+    for name, mod in list(sys.modules.items()):
+        if not mod or not (name == 'app' or name.startswith('app.') or name.startswith('api.')):
+            continue
+        client = getattr(mod, 'supabase', None)
+        if isinstance(client, (Client, FakeSupabase)):
+            setattr(mod, 'supabase', fake)
+        if getattr(mod, 'create_client', None) is not None:
+            setattr(mod, 'create_client', lambda *a, **k: fake)
+    _FakeSMTP.delay = float(smtp_delay_ms) / 1000.0
+    smtplib.SMTP_SSL = _FakeSMTP
+    smtplib.SMTP = _FakeSMTP
+    return fake
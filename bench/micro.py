@@ -0,0 +1,245 @@
+"""Micro-benchmarks for the pure computation helpers, with stored baselines.
+
+Each case times one helper on fixed synthetic input (best of --repeat runs,
+auto-ranged like timeit) and compares the per-call time with
+bench/baselines.json. --check exits non-zero when any case is slower than
+baseline x --threshold, so it can gate a change that touches these helpers.
+
+    python -m bench.micro                     # run and compare with the baselines
+    python -m bench.micro --check             # same, exit 1 on a regression
+    python -m bench.micro --save              # record new baselines
+    python -m bench.micro --only fd_ --threshold 1.3
+
+Baselines are only meaningful on the machine that recorded them; re-save
+after changing hardware or Python version (the file records both).
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import sys
+import timeit
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+BASELINES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines.json')
+
+
+def _fd_cases():
+    from app.finance.fd_projection import project_fd_book
+    from app.staff.api import _fd_interest, _fd_premature_rate
+    rng = random.Random(1)
+    fds = [(float(rng.randrange(10000, 500000, 1000)), rng.choice([7.0, 7.5, 8.0]),
+            rng.choice([12, 24, 36]), rng.randrange(1, 1200)) for _ in range(1000)]
+    days = [d for _, _, _, d in fds]
+    book = [{'amount': p, 'interest_rate': r, 'tenure': t,
+             'deposit_date': (date(2022, 1, 1) + timedelta(days=rng.randrange(1260))).isoformat()}
+            for p, r, t, _ in fds * 5]
+
+    def fd_interest():
+        for fd in fds:
+            _fd_interest(*fd)
+
+    def fd_premature_rate():
+        for d in days:
+            _fd_premature_rate(d)
+
+    def fd_projection():
+        project_fd_book(book, as_of=date(2025, 6, 15), months=36)
+
+    return {'fd_interest_x1000': fd_interest, 'fd_premature_rate_x1000': fd_premature_rate,
+            'fd_projection_5k_36m': fd_projection}
+
+
+def _words_cases():
+    from app.staff.api import amount_to_words as indian_words
+    from app.finance.api import amount_to_words
+    rng = random.Random(2)
+    amounts = [rng.choice([rng.randrange(100, 99999), rng.randrange(100000, 9999999),
+                           rng.randrange(10000000, 999999999)]) for _ in range(100)]
+
+    def words():
+        for a in amounts:
+            amount_to_words(a)
+
+    def words_indian():
+        for a in amounts:
+            indian_words(a)
+
+    return {'amount_to_words_x100': words, 'indian_number_words_x100': words_indian}
+
+
+def _image_cases():
+    from PIL import Image
+    from app.image_utils import PHOTO, process_image
+    size = (1600, 1200)
+    gradient = Image.linear_gradient('L').resize(size)
+    noise = Image.effect_noise(size, 32)
+    img = Image.merge('RGB', (gradient, noise, gradient.transpose(Image.Transpose.FLIP_LEFT_RIGHT)))
+    raw = io.BytesIO()
+    img.save(raw, format='JPEG', quality=95)
+    data = raw.getvalue()
+
+    def compress():
+        process_image(data, PHOTO)
+
+    return {'process_image_1600x1200': compress}
+
+
+def _civil_score_cases():
+    from app.finance.api import _civil_score_for_loan, _overall_civil_score
+    rng = random.Random(3)
+    histories = []
+    for i in range(200):
+        term = rng.choice([12, 24, 36])
+        paid_in = term + rng.randrange(-6, 7)
+        start = date(2020, 1, 1) + timedelta(days=rng.randrange(700))
+        amount = 120000.0
+        records = []
+        for k in range(paid_in):
+            remaining = max(0.0, round(amount - amount * (k + 1) / paid_in, 2))
+            records.append({
+                'repayment_date': (start + timedelta(days=30 * k)).isoformat(),
+                'repayment_amount': round(amount / paid_in, 2),
+                'outstanding_balance': remaining,
+            })
+        rng.shuffle(records)
+        histories.append(({'loan_id': f"LN{i:04d}", 'loan_term_months': term}, records))
+
+    def civil_score():
+        results = [r for r in (_civil_score_for_loan(loan, recs) for loan, recs in histories) if r]
+        _overall_civil_score(results)
+
+    return {'civil_score_200_loans': civil_score}
+
+
+def _bucket_cases():
+    from app.admin.api import _bucket_totals
+    rng = random.Random(4)
+    rows = [{'amount': float(rng.randrange(100, 50000)),
+             'date': (date(2025, 1, 1) + timedelta(days=rng.randrange(365))).isoformat()}
+            for _ in range(20000)]
+
+    def by_month():
+        _bucket_totals(rows, 'amount', 'date', 12, 1)
+
+    def by_day():
+        _bucket_totals(rows, 'amount', 'date', 31, 2)
+
+    return {'bucket_by_month_20k': by_month, 'bucket_by_day_20k': by_day}
+
+
+def _schedule_cases():
+    from app.finance.delinquency import aging
+    from app.finance.loan_schedule import build_schedules, demand_list
+    rng = random.Random(5)
+    loans = [{'id': f"u{i}", 'loan_id': f"LN{i:04d}", 'customer_id': f"KSTHST{i:06d}",
+              'loan_amount': float(rng.randrange(50000, 500000, 5000)), 'interest_rate': rng.choice([9.0, 10.5, 12.0]),
+              'loan_term_months': rng.choice([12, 24, 36, 60]),
+              'created_at': (date(2022, 1, 1) + timedelta(days=rng.randrange(1000))).isoformat()}
+             for i in range(1000)]
+    records = [{'loan_id': loan['loan_id'], 'repayment_amount': 1.0, 'principal_amount': 2000.0}
+               for loan in loans for _ in range(rng.randrange(6))]
+
+    def schedules():
+        build_schedules(loans)
+
+    def demand():
+        demand_list(loans, records, date(2024, 6, 30))
+
+    def par_aging():
+        aging(loans, records, date(2024, 6, 30))
+
+    return {'loan_schedules_1000': schedules, 'demand_list_1000': demand, 'par_aging_1000': par_aging}
+
+
+CASE_GROUPS = (_fd_cases, _words_cases, _image_cases, _civil_score_cases, _bucket_cases, _schedule_cases)
+
+
+def collect():
+    cases = {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        for group in CASE_GROUPS:
+            cases.update(group())
+    return cases
+
+
+def measure(fn, repeat):
+    """Best per-call time in seconds over `repeat` auto-ranged runs."""
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def load_baselines(path=BASELINES):
+    try:
+        with open(path) as fh:
+            return json.load(fh)
+    except FileNotFoundError:
+        return {'cases': {}}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--only', help='comma-separated case names (substring match)')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--threshold', type=float, default=1.5,
+                        help='fail --check when a case takes more than baseline x threshold')
+    parser.add_argument('--save', action='store_true', help='write the results as the new baselines')
+    parser.add_argument('--check', action='store_true', help='exit 1 when any case regressed')
+    parser.add_argument('--baselines', default=BASELINES)
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault('SUPABASE_URL', 'https://fake.supabase.local')
+    os.environ.setdefault('SUPABASE_KEY', 'bench')
+    cases = collect()
+    if args.only:
+        wanted = [w.strip() for w in args.only.split(',') if w.strip()]
+        cases = {k: v for k, v in cases.items() if any(w in k for w in wanted)}
+
+    stored = load_baselines(args.baselines)
+    baseline = stored.get('cases', {})
+    regressions = []
+    results = {}
+    print(f"{'case':30s} {'us/call':>12s} {'baseline':>12s} {'ratio':>7s}")
+    for name, fn in cases.items():
+        per_call = measure(fn, args.repeat)
+        results[name] = round(per_call * 1e6, 2)
+        base = baseline.get(name)
+        if base and results[name] / base > args.threshold:
+            # confirm before flagging: one noisy run should not fail the gate
+            results[name] = min(results[name], round(measure(fn, args.repeat * 2) * 1e6, 2))
+        if base:
+            ratio = results[name] / base
+            flag = '  REGRESSION' if ratio > args.threshold else ''
+            if flag:
+                regressions.append(name)
+            print(f"{name:30s} {results[name]:12.2f} {base:12.2f} {ratio:7.2f}{flag}")
+        else:
+            print(f"{name:30s} {results[name]:12.2f} {'-':>12s} {'-':>7s}")
+
+    if args.save:
+        baseline.update(results)
+        stored = {
+            'python': platform.python_version(),
+            'machine': f"{platform.system()} {platform.machine()}",
+            'unit': 'microseconds per call',
+            'cases': dict(sorted(baseline.items())),
+        }
+        with open(args.baselines, 'w') as fh:
+            json.dump(stored, fh, indent=2)
+            fh.write('\n')
+        print(f"baselines written to {args.baselines}")
+    if regressions:
+        print(f"{len(regressions)} case(s) slower than baseline x {args.threshold}: {', '.join(regressions)}")
+        if args.check:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
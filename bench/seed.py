@@ -0,0 +1,162 @@
+"""Synthetic society data for the benchmark fake.
+
+build_society(n_members) returns a FakeSupabase loaded with members and
+their transactions, loans (with repayment records and sureties), fixed
+deposits, expenses and staff salaries, shaped like the production tables.
+Generation is deterministic for a given seed.
+"""
+import random
+import uuid
+from datetime import date, timedelta
+
+from bench.fake_supabase import FakeSupabase
+
+FIRST = ['Basavaraj', 'Mallikarjun', 'Shivakumar', 'Hanumanth', 'Sharanappa', 'Veeresh', 'Lakshmi',
+         'Savitri', 'Girija', 'Manjunath', 'Rudrappa', 'Shankar', 'Parvati', 'Suresh', 'Anand']
+LAST = ['Patil', 'Hiremath', 'Gouda', 'Naik', 'Kulkarni', 'Angadi', 'Biradar', 'Desai', 'Joshi', 'Hosamani']
+STAFF_EMAIL = 'bench.staff@example.org'
+
+
+def _day(rng, start, end):
+    return start + timedelta(days=rng.randrange(max(1, (end - start).days)))
+
+
+def build_society(n_members, seed=42, tx_per_member=6, loan_ratio=0.2, records_per_loan=6,
+                  fd_ratio=0.1, latency_ms=0.0, today=None):
+    rng = random.Random(seed)
+    today = today or date.today()
+    start = today - timedelta(days=3 * 365)
+    db = FakeSupabase(latency_ms=latency_ms)
+
+    members, transactions, loans, records, sureties, fds = [], [], [], [], [], []
+    stid = 0
+    for i in range(n_members):
+        cid = f"KSTHST{i + 1:06d}"
+        name = f"{rng.choice(FIRST)} {rng.choice(LAST)}"
+        share = float(rng.choice([5000, 10000, 20000, 30000]))
+        balance = 0.0
+        joined = _day(rng, start, today - timedelta(days=30))
+        member_tx = []
+        for _ in range(tx_per_member):
+            stid += 1
+            deposit = rng.random() < 0.75 or balance < 2000
+            amount = float(rng.randrange(500, 5000, 100))
+            if not deposit:
+                amount = min(amount, balance)
+            balance += amount if deposit else -amount
+            member_tx.append({
+                'id': stid,
+                'stid': f"STID{stid:07d}",
+                'customer_id': cid,
+                'type': 'deposit' if deposit else 'withdraw',
+                'amount': amount,
+                'date': _day(rng, joined, today).isoformat(),
+                'transaction_id': f"UTR{rng.randrange(10 ** 9):09d}",
+                'from_account': 'member', 'to_account': 'society',
+                'from_bank_name': 'SBI', 'to_bank_name': 'KDCC',
+                'remarks': '', 'balance_after': round(balance, 2),
+            })
+        transactions.extend(member_tx)
+        members.append({
+            'id': i + 1,
+            'customer_id': cid,
+            'name': name,
+            'kgid': str(100000 + i),
+            'phone': f"9{rng.randrange(10 ** 9):09d}",
+            'email': f"member{i + 1}@example.org",
+            'aadhar_no': f"{rng.randrange(10 ** 12):012d}",
+            'pan_no': '',
+            'salary': float(rng.randrange(25000, 90000, 1000)),
+            'organization_name': 'Govt High School',
+            'address': 'Kushtagi',
+            'photo_url': f"https://fake.supabase.local/storage/v1/object/public/staff-add/{cid}.jpg",
+            'signature_url': f"https://fake.supabase.local/storage/v1/object/public/staff-add/{cid}_sig.jpg",
+            'status': 'approved',
+            'balance': round(balance, 2),
+            'share_amount': share,
+            'blocked': False,
+            'login_attempts': 0,
+            'created_at': joined.isoformat(),
+        })
+
+        if rng.random() < loan_ratio:
+            amount = float(rng.randrange(50000, 500000, 5000))
+            rate = rng.choice([9.0, 10.5, 12.0])
+            term = rng.choice([12, 24, 36, 60])
+            created = _day(rng, joined, today - timedelta(days=60))
+            loan_uuid = str(uuid.UUID(int=rng.getrandbits(128)))
+            loan_id = f"LN{len(loans) + 1:04d}"
+            remaining = amount
+            n_rec = rng.randrange(0, records_per_loan + 1)
+            for k in range(n_rec):
+                principal = round(amount / term, 2)
+                interest = round(remaining * rate / 1200, 2)
+                remaining = max(round(remaining - principal, 2), 0.0)
+                records.append({
+                    'id': str(uuid.UUID(int=rng.getrandbits(128))),
+                    'loan_id': loan_id,
+                    'repayment_date': (created + timedelta(days=30 * (k + 1))).isoformat(),
+                    'repayment_amount': round(principal + interest, 2),
+                    'principal_amount': principal,
+                    'interest_amount': interest,
+                    'remaining_principal_amount': remaining,
+                    'outstanding_balance': remaining,
+                    'status': 'active',
+                })
+            loans.append({
+                'id': loan_uuid,
+                'loan_id': loan_id,
+                'customer_id': cid,
+                'loan_type': rng.choice(['personal', 'education', 'housing']),
+                'loan_amount': amount,
+                'interest_rate': rate,
+                'loan_term_months': term,
+                'purpose': 'bench',
+                'status': rng.choice(['approved'] * 8 + ['completed', 'pending_approval']),
+                'staff_email': STAFF_EMAIL,
+                'created_at': created.isoformat(),
+            })
+            for _ in range(2):
+                other = rng.randrange(max(1, i)) + 1
+                sureties.append({
+                    'id': str(uuid.UUID(int=rng.getrandbits(128))),
+                    'loan_id': loan_uuid,
+                    'surety_customer_id': f"KSTHST{other:06d}",
+                    'surety_name': '', 'surety_mobile': '',
+                    'active': True,
+                })
+
+        if rng.random() < fd_ratio:
+            fid = f"FD{len(fds) + 1:04d}"
+            fds.append({
+                'id': len(fds) + 1,
+                'system_fdid': fid,
+                'fdid': fid,
+                'customer_id': cid,
+                'amount': float(rng.randrange(10000, 300000, 5000)),
+                'deposit_date': _day(rng, joined, today).isoformat(),
+                'tenure': rng.choice([12, 24, 36]),
+                'interest_rate': rng.choice([7.0, 7.5, 8.0]),
+                'status': 'approved',
+                'payment_mode': 'bank',
+            })
+
+    db.load('members', members)
+    db.load('transactions', transactions)
+    db.load('loans', loans)
+    db.load('loan_records', records)
+    db.load('sureties', sureties)
+    db.load('fixed_deposits', fds)
+    db.load('staff', [{
+        'id': 1, 'name': 'Bench Staff', 'email': STAFF_EMAIL, 'phone': '9000000000',
+        'signature_url': None, 'photo_url': None,
+    }])
+    db.load('expenses', [{
+        'id': k + 1, 'amount': float(rng.randrange(500, 20000, 100)),
+        'date': _day(rng, start, today).isoformat(), 'description': 'office', 'category': 'misc',
+    } for k in range(max(10, n_members // 100))])
+    db.load('staff_salaries', [{
+        'id': k + 1, 'staff_email': STAFF_EMAIL, 'amount': 25000.0,
+        'date': (today - timedelta(days=30 * k)).isoformat(), 'paid_date': (today - timedelta(days=30 * k)).isoformat(),
+    } for k in range(36)])
+    return db
@@ -0,0 +1,50 @@
+# Gunicorn settings, picked up automatically from the working directory:
+#   gunicorn wsgi:app
+#
+# GUNICORN_PRELOAD=1 (default) builds the app once in the master - blueprints,
+# compiled templates, pandas/PIL/xhtml2pdf - and forks workers from it, so they
+# start fast and share that memory copy-on-write. Each worker then creates its
+# own Supabase clients in post_fork. Set GUNICORN_PRELOAD=0 to build the app in
+# every worker instead (needed for `--reload`).
+#
+# Workers stay at gunicorn's default of 1 unless WEB_CONCURRENCY (or -w) says
+# otherwise; size it to the host, e.g. WEB_CONCURRENCY=4.
+import glob
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', '1'))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '120'))
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1').lower() in ('1', 'true', 'yes')
+
+
+def on_starting(server):
+    # OTPs, rate limits, revocations and cache invalidations must be seen by every worker
+    if os.environ.get('LOCAL_STORE_URL') == 'memory' and server.cfg.workers > 1:
+        raise RuntimeError("LOCAL_STORE_URL=memory keeps state per worker; "
+                           "use sqlite:///... or run a single worker")
+    # Per-worker metric snapshots from a previous run would be merged into /metrics forever
+    metrics_dir = os.environ.get('METRICS_DIR')
+    if metrics_dir:
+        for path in glob.glob(os.path.join(metrics_dir, 'metrics_*.json')):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def when_ready(server):
+    if not preload_app:
+        return
+    from app.prefork import warm_up
+    flask_app = server.app.wsgi()
+    compiled = warm_up(flask_app)
+    server.log.info(f"preload: app warmed up in master ({compiled} templates compiled)")
+
+
+def post_fork(server, worker):
+    if not preload_app:
+        return
+    from app.prefork import after_fork
+    rebound = after_fork()
+    server.log.debug(f"worker {worker.pid}: {rebound} Supabase client references re-created")
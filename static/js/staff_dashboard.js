@@ -1,43 +1,75 @@
 (function(){
   const cfg = window.STAFF_DASHBOARD_CONFIG || {};
-  /* ================= JWT Heartbeat ================= */
+  /* ================= JWT Expiry Watch ================= */
+  // The token's own `exp` drives everything: refresh shortly before it lapses,
+  // re-check when the tab becomes visible, and (when the server enables it)
+  // listen on /auth/session-events for revocation instead of polling.
+  const REFRESH_LEAD_MS = 60*1000;
+  const RETRY_MS = 30*1000;
+  const DIRECTORY_KEY = 'memberDirectory';  // cached member list, see Member Directory Typeahead
+  let refreshTimer = null;
+  let eventSource = null;
   function redirectToLogin(){
     try{ sessionStorage.removeItem('authToken'); }catch(e){}
+    try{ sessionStorage.removeItem(DIRECTORY_KEY); }catch(e){}
+    if (eventSource){ eventSource.close(); eventSource = null; }
     if (cfg.loginUrl) window.location.replace(cfg.loginUrl);
   }
-  async function validateToken(){
-    let token = null;
-    try { token = sessionStorage.getItem('authToken'); } catch(e){}
-    if (!token){ redirectToLogin(); return; }
+  function currentToken(){
+    try { return sessionStorage.getItem('authToken'); } catch(e){ return null; }
+  }
+  function tokenExpiryMs(token){
     try{
-      const res = await fetch('/auth/validate-token',{
-        method:'POST',
-        headers:{
-          'Content-Type':'application/json',
-          'Authorization':`Bearer ${token}`
-        },
-        credentials:'include',
-        body: JSON.stringify({ token })
-      });
-      if (res.status === 401) redirectToLogin();
-    }catch(e){}
+      const part = token.split('.')[1].replace(/-/g,'+').replace(/_/g,'/');
+      const payload = JSON.parse(atob(part + '='.repeat((4 - part.length % 4) % 4)));
+      return payload && payload.exp ? payload.exp*1000 : null;
+    }catch(e){ return null; }
+  }
+  function scheduleRefresh(delay){
+    clearTimeout(refreshTimer);
+    refreshTimer = setTimeout(refreshToken, Math.max(0, delay));
+  }
+  function openSessionEvents(token){
+    if (!cfg.sessionEventsUrl || !window.EventSource) return;
+    if (eventSource) eventSource.close();
+    eventSource = new EventSource(`${cfg.sessionEventsUrl}?token=${encodeURIComponent(token)}`);
+    eventSource.addEventListener('revoked', redirectToLogin);
+    eventSource.addEventListener('expired', ()=>{
+      if (eventSource){ eventSource.close(); eventSource = null; }
+      refreshToken();
+    });
+  }
+  function watchToken(){
+    const token = currentToken();
+    const exp = token ? tokenExpiryMs(token) : null;
+    // Missing or lapsed token: the cookie session decides via refresh (401 -> login)
+    if (!exp || exp - Date.now() <= REFRESH_LEAD_MS){ refreshToken(); return; }
+    scheduleRefresh(exp - Date.now() - REFRESH_LEAD_MS);
+    if (!eventSource) openSessionEvents(token);
   }
   async function refreshToken(){
     try{
-      const res = await fetch('/auth/refresh-token',{ method:'POST', credentials:'include' });
+      const res = await fetch(cfg.refreshUrl || '/auth/refresh-token',{ method:'POST', credentials:'include' });
       if (res.status === 401){ redirectToLogin(); return; }
       const data = await res.json().catch(()=>null);
       if (data && data.status==='success' && data.token){
         try{ sessionStorage.setItem('authToken', data.token); }catch(e){}
+        openSessionEvents(data.token);
+        watchToken();
+        return;
       }
     }catch(e){}
+    scheduleRefresh(RETRY_MS);
   }
-  validateToken();
-  setInterval(validateToken, 10000);
-  setInterval(refreshToken, 4*60*1000);
+  watchToken();
+  document.addEventListener('visibilitychange', ()=>{
+    if (document.visibilityState === 'visible') watchToken();
+  });
   document.addEventListener('DOMContentLoaded', ()=>{
     const logoutBtn = document.getElementById('logoutBtn');
-    if (logoutBtn) logoutBtn.addEventListener('click', ()=>{ try{ sessionStorage.removeItem('authToken'); }catch(e){} });
+    if (logoutBtn) logoutBtn.addEventListener('click', ()=>{
+      try{ sessionStorage.removeItem('authToken'); sessionStorage.removeItem(DIRECTORY_KEY); }catch(e){}
+    });
   });
 
   /* ================= Navigation / Section Loader ================= */
@@ -245,7 +277,11 @@
             </div>
             <div><label class="block font-medium mb-1">Phone</label>
               <input type="text" value="${data.member.phone||''}" readonly class="w-full px-4 py-2 border rounded bg-gray-100"/>
-            </div>`;
+            </div>
+            ${data.member.photo_url ? `<div><label class="block font-medium mb-1">Photo</label>
+              <img src="${data.member.photo_thumb_url || data.member.photo_url}" data-full="${data.member.photo_url}" onerror="this.onerror=null;this.src=this.getAttribute('data-full')" alt="Photo" class="w-20 h-20 object-cover rounded border"/>
+            </div>` : ''}
+            <div class="text-sm text-gray-500">Currently backing ${data.active_loan_count} active loan(s).</div>`;
         } else if (data.active_loan_count >= 2){
           msgDiv.textContent = "This surety is already backing 2 active loans.";
         } else {
@@ -257,13 +293,26 @@
           const kgid = kgidInput.value.trim();
           msgDiv.textContent = "Checking surety...";
           try{
-            const res = await fetch(`/loan/check-surety?customer_id=${encodeURIComponent(kgid)}`);
+            // Check this surety together with the other one already accepted, so
+            // the borrower and repeated IDs are caught in the same request
+            const otherInput = document.getElementById(kgidInputId === 'surety1KGID' ? 'surety2KGID' : 'surety1KGID');
+            const ids = [];
+            if (otherInput && otherInput.disabled && otherInput.value.trim()) ids.push(otherInput.value.trim());
+            ids.push(kgid);
+            const borrowerInput = document.getElementById('loanAccount');
+            const res = await fetch('/loan/surety/check-bulk', {
+              method: 'POST',
+              headers: { 'Content-Type': 'application/json' },
+              body: JSON.stringify({ customer_ids: ids, borrower_id: borrowerInput ? borrowerInput.value.trim() : '' })
+            });
             if (res.ok){
               const data = await res.json();
+              const result = (data.sureties || [])[ids.length - 1] || {};
               const sObj = {
-                available: !!data.available,
-                member: data.member || {},
-                active_loan_count: data.active_loan_count || 0
+                available: !!result.available,
+                member: { name: result.name, phone: result.phone, photo_url: result.photo_url, photo_thumb_url: result.photo_thumb_url },
+                active_loan_count: result.active_loan_count || 0,
+                reason: result.reason
               };
               preloadSurety(sObj);
               if (sObj.available && sObj.active_loan_count < 2){
@@ -1761,4 +1810,96 @@
     }
   });
 
+  /* ================= Member Directory Typeahead ================= */
+  // A compact copy of the member list (customer_id, name, kgid, status, blocked)
+  // is kept in sessionStorage (gone with the tab, and cleared on logout) and
+  // brought up to date with ?since=<version>, so the lookup fields below suggest
+  // members without a request per keystroke. The full-details calls behind
+  // each field are unchanged.
+  const DIRECTORY_FIELDS = ['customer_id','name','kgid','status','blocked'];
+  const DIRECTORY_MAX_AGE_MS = 60*1000;
+  const DIRECTORY_LIMIT = 8;
+  const LOOKUP_INPUT_IDS = ['kgidInput', 'loanAccountNumber', 'surety1KGID', 'surety2KGID', 'accountNumber',
+    'nomineeCustomerId', 'reSearchCustomerId', 'sfCustomerId', 'nextInstallmentAccount'];
+  let directory = null;
+  let directorySyncedAt = 0;
+  let directorySync = null;
+  function readCachedDirectory(){
+    try{ return JSON.parse(sessionStorage.getItem(DIRECTORY_KEY)); }catch(e){ return null; }
+  }
+  async function fetchDirectory(since){
+    if (!cfg.memberDirectoryUrl) throw new Error('member directory unavailable');
+    const url = since ? `${cfg.memberDirectoryUrl}?since=${encodeURIComponent(since)}` : cfg.memberDirectoryUrl;
+    const res = await fetch(url, { credentials: 'include' });
+    const data = await res.json().catch(()=>null);
+    if (!res.ok || !data || data.status!=='success') throw new Error((data && data.message) || 'member directory unavailable');
+    return data;
+  }
+  function syncDirectory(force){
+    if (directorySync) return directorySync;
+    if (!force && directory && Date.now() - directorySyncedAt < DIRECTORY_MAX_AGE_MS) return Promise.resolve(directory);
+    directorySync = (async ()=>{
+      try{
+        const sameShape = directory && JSON.stringify(directory.fields) === JSON.stringify(DIRECTORY_FIELDS);
+        let data = await fetchDirectory(sameShape ? directory.v : null);
+        if (!data.full){
+          const byId = new Map(directory.rows.map(r=>[r[0], r]));
+          data.rows.forEach(r=>byId.set(r[0], r));
+          // A size mismatch means members were removed; start over from the full list
+          data = byId.size === data.count ? { ...data, rows: Array.from(byId.values()) } : await fetchDirectory(null);
+        }
+        directory = { v: data.v, fields: data.fields, rows: data.rows };
+        directorySyncedAt = Date.now();
+        try{ sessionStorage.setItem(DIRECTORY_KEY, JSON.stringify(directory)); }catch(e){}
+      }catch(e){
+        // Keep suggesting from the copy we have
+      }finally{
+        directorySync = null;
+      }
+      return directory;
+    })();
+    return directorySync;
+  }
+  function matchMembers(query){
+    const q = query.trim().toLowerCase();
+    if (!directory || q.length < 2) return [];
+    const first = [], rest = [];
+    for (const row of directory.rows){
+      const cid = String(row[0]||'').toLowerCase();
+      const name = String(row[1]||'').toLowerCase();
+      const kgid = String(row[2]||'').toLowerCase();
+      if (cid.startsWith(q) || kgid.startsWith(q) || name.startsWith(q)) first.push(row);
+      else if (cid.includes(q) || name.includes(q)) rest.push(row);
+      if (first.length >= DIRECTORY_LIMIT) break;
+    }
+    return first.concat(rest).slice(0, DIRECTORY_LIMIT);
+  }
+  function renderSuggestions(list, query){
+    list.innerHTML = '';
+    matchMembers(query).forEach(([cid, name, kgid, status, blocked])=>{
+      const option = document.createElement('option');
+      option.value = cid;
+      const notes = [];
+      if (status && status !== 'approved') notes.push(status);
+      if (blocked) notes.push('blocked');
+      option.label = `${name || '-'} · KGID ${kgid || '-'}${notes.length ? ' · ' + notes.join(', ') : ''}`;
+      list.appendChild(option);
+    });
+  }
+  document.addEventListener('DOMContentLoaded', ()=>{
+    const inputs = LOOKUP_INPUT_IDS.map(id=>document.getElementById(id)).filter(Boolean);
+    if (!inputs.length || !cfg.memberDirectoryUrl) return;
+    const list = document.createElement('datalist');
+    list.id = 'memberDirectoryList';
+    document.body.appendChild(list);
+    directory = readCachedDirectory();
+    inputs.forEach(input=>{
+      input.setAttribute('list', list.id);
+      input.setAttribute('autocomplete', 'off');
+      input.addEventListener('focus', ()=>syncDirectory(false));
+      input.addEventListener('input', ()=>renderSuggestions(list, input.value));
+    });
+    syncDirectory(true);
+  });
+
 })();
@@ -0,0 +1,16 @@
+-- Precomputed civil (credit) scores, one row per member (app/finance/credit_scores.py).
+-- Written by `flask refresh-credit-scores` and after each repayment; read by
+-- /loan/api/check-civil-score with a single primary-key or kgid lookup.
+
+create table if not exists public.member_credit_scores (
+    customer_id   text primary key,
+    kgid          text,
+    score         text not null,
+    message       text,
+    details       jsonb not null default '[]'::jsonb,
+    loans_scored  integer not null default 0,
+    computed_at   timestamptz not null default now()
+);
+
+create index if not exists member_credit_scores_kgid_idx
+    on public.member_credit_scores (kgid);
@@ -0,0 +1,45 @@
+-- Per-member count of active surety commitments (app/finance/sureties.py).
+-- sureties.active is switched on at loan approval and off at rejection or
+-- completion; this trigger keeps members.active_surety_count in step with
+-- every insert, update and delete, so guarantor checks read one column
+-- instead of counting sureties rows.
+
+alter table public.members
+    add column if not exists active_surety_count integer not null default 0;
+
+create index if not exists sureties_active_surety_customer_idx
+    on public.sureties (surety_customer_id) where active;
+
+create or replace function public.sync_member_active_surety_count()
+returns trigger
+language plpgsql
+as $$
+begin
+    if tg_op in ('UPDATE', 'DELETE') and old.active then
+        update public.members
+           set active_surety_count = greatest(active_surety_count - 1, 0)
+         where customer_id = old.surety_customer_id;
+    end if;
+    if tg_op in ('INSERT', 'UPDATE') and new.active then
+        update public.members
+           set active_surety_count = active_surety_count + 1
+         where customer_id = new.surety_customer_id;
+    end if;
+    return null;
+end;
+$$;
+
+drop trigger if exists sureties_active_surety_count on public.sureties;
+create trigger sureties_active_surety_count
+    after insert or delete or update of active, surety_customer_id on public.sureties
+    for each row execute function public.sync_member_active_surety_count();
+
+-- Backfill from the current sureties rows
+update public.members m
+   set active_surety_count = coalesce(s.n, 0)
+  from (select m2.customer_id, count(s2.id) as n
+          from public.members m2
+          left join public.sureties s2
+            on s2.surety_customer_id = m2.customer_id and s2.active
+         group by m2.customer_id) s
+ where s.customer_id = m.customer_id;
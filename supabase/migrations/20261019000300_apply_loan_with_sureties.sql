@@ -0,0 +1,50 @@
+-- Post a loan application in one transaction (finance.api.apply_loan):
+-- the loans row, its sequential LNxxxx id and one sureties row per
+-- guarantor (name, phone, photo and signature copied from members).
+-- loan_number_seq replaces scanning every loan for the highest LN number.
+
+create sequence if not exists public.loan_number_seq;
+
+select setval('public.loan_number_seq',
+              greatest(coalesce((select max(substring(loan_id from 3)::bigint)
+                                   from public.loans
+                                  where loan_id ~ '^LN[0-9]+$'), 0), 1),
+              exists (select 1 from public.loans where loan_id ~ '^LN[0-9]+$'));
+
+create or replace function public.apply_loan_with_sureties(p_loan jsonb, p_sureties text[])
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_num     bigint := nextval('public.loan_number_seq');
+    v_loan_id text := 'LN' || case when v_num < 10000 then lpad(v_num::text, 4, '0') else v_num::text end;
+    v_id      uuid;
+begin
+    insert into public.loans (loan_id, customer_id, loan_type, loan_amount, interest_rate,
+                              loan_term_months, status, staff_email, staff_name, staff_phone,
+                              purpose_of_loan, purpose_of_emergency_loan)
+    values (v_loan_id,
+            p_loan->>'customer_id',
+            p_loan->>'loan_type',
+            (p_loan->>'loan_amount')::numeric,
+            (p_loan->>'interest_rate')::numeric,
+            (p_loan->>'loan_term_months')::int,
+            coalesce(p_loan->>'status', 'pending_approval'),
+            p_loan->>'staff_email',
+            p_loan->>'staff_name',
+            p_loan->>'staff_phone',
+            p_loan->>'purpose_of_loan',
+            p_loan->>'purpose_of_emergency_loan')
+    returning id into v_id;
+
+    insert into public.sureties (loan_id, surety_customer_id, surety_name, surety_mobile,
+                                 surety_signature_url, surety_photo_url, active)
+    select v_id, s.customer_id, coalesce(m.name, ''), coalesce(m.phone, ''),
+           m.signature_url, m.photo_url, false
+      from unnest(p_sureties) with ordinality as s(customer_id, ord)
+      left join public.members m on m.customer_id = s.customer_id
+     order by s.ord;
+
+    return jsonb_build_object('id', v_id, 'loan_id', v_loan_id);
+end;
+$$;
@@ -0,0 +1,88 @@
+-- Month-end thrift/share posting in one transaction (app/staff/bulk_deposits.py).
+-- p_rows:   [{"customer_id": ..., "amount": ...}, ...] in posting order; a
+--           member may appear more than once.
+-- p_fields: transaction columns shared by every row (date, transaction_id,
+--           from_account, to_account, from_bank_name, to_bank_name, remarks).
+-- Deposits fill share_amount up to p_max_share and the excess goes to
+-- balance, exactly as /staff/api/add-transaction does one at a time.
+-- STIDs are a contiguous block after the highest existing STIDnnnn.
+
+create or replace function public.post_bulk_deposits(p_rows jsonb, p_fields jsonb,
+                                                     p_max_share numeric default 30000)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_next    bigint;
+    v_missing text;
+    v_result  jsonb;
+begin
+    if exists (select 1 from jsonb_array_elements(p_rows) e
+                where coalesce((e->>'amount')::numeric, 0) <= 0) then
+        raise exception 'Every amount must be positive';
+    end if;
+
+    -- Lock the members being credited and the STID counter
+    perform 1 from public.members
+      where customer_id in (select e->>'customer_id' from jsonb_array_elements(p_rows) e)
+      for update;
+    select string_agg(distinct e->>'customer_id', ', ') into v_missing
+      from jsonb_array_elements(p_rows) e
+     where not exists (select 1 from public.members m where m.customer_id = e->>'customer_id');
+    if v_missing is not null then
+        raise exception 'Members not found: %', v_missing;
+    end if;
+    perform pg_advisory_xact_lock(hashtext('public.transactions.stid'));
+    select coalesce(max(substring(stid from 5)::bigint), 0) + 1 into v_next
+      from public.transactions where stid ~ '^STID[0-9]+$';
+
+    create temp table _bulk_deposit on commit drop as
+    with input as (
+        select e->>'customer_id' as customer_id, (e->>'amount')::numeric as amount, ord
+          from jsonb_array_elements(p_rows) with ordinality as t(e, ord)
+    ), running as (
+        select i.*, coalesce(m.share_amount, 0)::numeric as share0, coalesce(m.balance, 0)::numeric as balance0,
+               sum(i.amount) over (partition by i.customer_id order by i.ord) as paid_upto
+          from input i join public.members m on m.customer_id = i.customer_id
+    ), split as (
+        select r.*,
+               case when share0 >= p_max_share then share0
+                    else least(p_max_share, share0 + paid_upto) end as share_after,
+               case when share0 >= p_max_share then share0
+                    else least(p_max_share, share0 + paid_upto - amount) end as share_before
+          from running r
+    )
+    select customer_id, amount, ord, share_after,
+           share_after - share_before as to_share,
+           amount - (share_after - share_before) as to_balance,
+           balance0 + paid_upto - (share_after - share0) as balance_after,
+           'STID' || case when v_next + row_number() over (order by ord) - 1 < 10000
+                          then lpad((v_next + row_number() over (order by ord) - 1)::text, 4, '0')
+                          else (v_next + row_number() over (order by ord) - 1)::text end as stid
+      from split;
+
+    insert into public.transactions (customer_id, type, amount, from_account, to_account, date,
+                                     transaction_id, from_bank_name, to_bank_name, remarks,
+                                     balance_after, stid)
+    select t.customer_id, t.type, t.amount, t.from_account, t.to_account, t.date,
+           t.transaction_id, t.from_bank_name, t.to_bank_name, t.remarks, t.balance_after, t.stid
+      from jsonb_populate_recordset(null::public.transactions,
+               (select jsonb_agg(p_fields || jsonb_build_object(
+                            'customer_id', customer_id, 'type', 'deposit', 'amount', amount,
+                            'balance_after', balance_after, 'stid', stid) order by ord)
+                  from _bulk_deposit)) t;
+
+    update public.members m
+       set share_amount = f.share_after, balance = f.balance_after
+      from (select distinct on (customer_id) customer_id, share_after, balance_after
+              from _bulk_deposit order by customer_id, ord desc) f
+     where m.customer_id = f.customer_id;
+
+    select jsonb_agg(jsonb_build_object(
+               'customer_id', customer_id, 'amount', amount, 'stid', stid,
+               'to_share', to_share, 'to_balance', to_balance,
+               'share_amount_after', share_after, 'balance_after', balance_after) order by ord)
+      into v_result from _bulk_deposit;
+    return coalesce(v_result, '[]'::jsonb);
+end;
+$$;
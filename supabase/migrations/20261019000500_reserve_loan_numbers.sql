@@ -0,0 +1,11 @@
+-- Hand out a block of LNxxxx numbers from loan_number_seq (created with
+-- apply_loan_with_sureties) for imports that insert loans themselves
+-- (app/staff/record_import.py), so they never collide with applications
+-- posted at the same time.
+
+create or replace function public.reserve_loan_numbers(p_count integer)
+returns setof bigint
+language sql
+as $$
+    select nextval('public.loan_number_seq') from generate_series(1, greatest(p_count, 0));
+$$;
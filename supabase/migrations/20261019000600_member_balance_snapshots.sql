@@ -0,0 +1,19 @@
+-- Month-end closing balances per member (app/finance/balance_snapshots.py).
+-- Written by `flask close-balances`; statements anchor at the latest row
+-- before their window instead of walking back from members.balance.
+
+create table if not exists public.member_balance_snapshots (
+    customer_id   text not null,
+    period_end    date not null,
+    balance       numeric(14, 2) not null,
+    share_amount  numeric(14, 2) not null,
+    closed_at     timestamptz not null default now(),
+    primary key (customer_id, period_end)
+);
+
+create index if not exists member_balance_snapshots_period_idx
+    on public.member_balance_snapshots (period_end);
+
+-- Statement windows read one member's transactions by date
+create index if not exists transactions_customer_date_idx
+    on public.transactions (customer_id, date);
@@ -0,0 +1,94 @@
+-- Member search (app/member_search.py).
+--
+-- members.updated_at is the change feed the in-process search index polls:
+-- each worker re-reads only the rows whose updated_at moved since its last
+-- refresh. search_members() is the optional Postgres backend
+-- (MEMBER_SEARCH_BACKEND=postgres): pg_trgm similarity on the name plus
+-- prefix matches on customer_id, kgid and phone (or the phone's last digits).
+-- Unlike the in-process index it does not transliterate Kannada names.
+
+alter table public.members
+    add column if not exists updated_at timestamptz not null default now();
+
+create or replace function public.touch_updated_at()
+returns trigger
+language plpgsql
+as $$
+begin
+    new.updated_at := now();
+    return new;
+end;
+$$;
+
+drop trigger if exists members_touch_updated_at on public.members;
+create trigger members_touch_updated_at
+    before update on public.members
+    for each row execute function public.touch_updated_at();
+
+create index if not exists members_updated_at_idx on public.members (updated_at);
+
+create extension if not exists pg_trgm;
+
+create index if not exists members_name_trgm_idx
+    on public.members using gin (lower(name) gin_trgm_ops);
+create index if not exists members_customer_id_prefix_idx
+    on public.members (upper(customer_id) text_pattern_ops);
+create index if not exists members_kgid_prefix_idx
+    on public.members (upper(kgid::text) text_pattern_ops);
+create index if not exists members_phone_prefix_idx
+    on public.members ((phone::text) text_pattern_ops);
+create index if not exists members_phone_suffix_idx
+    on public.members (reverse(phone::text) text_pattern_ops);
+
+create or replace function public.search_members(p_query text, p_limit integer default 10)
+returns table (
+    customer_id text,
+    name        text,
+    kgid        text,
+    phone       text,
+    photo_url   text,
+    status      text,
+    score       real,
+    matched_on  text
+)
+language sql
+stable
+as $$
+    with q as (
+        select lower(trim(p_query)) as name_q,
+               upper(replace(trim(p_query), ' ', '')) as id_q,
+               regexp_replace(p_query, '\D', '', 'g') as digits
+    ),
+    hits as (
+        select m.customer_id, case when upper(m.customer_id) = q.id_q then 1.0 else 0.9 end::real as score,
+               'customer_id' as matched_on
+        from public.members m, q
+        where length(q.id_q) >= 2 and upper(m.customer_id) like q.id_q || '%'
+        union all
+        select m.customer_id, case when upper(m.kgid::text) = q.id_q then 1.0 else 0.9 end::real, 'kgid'
+        from public.members m, q
+        where length(q.id_q) >= 2 and upper(m.kgid::text) like q.id_q || '%'
+        union all
+        select m.customer_id, 0.9::real, 'phone'
+        from public.members m, q
+        where length(q.digits) >= 4 and q.digits = q.id_q and m.phone::text like q.digits || '%'
+        union all
+        select m.customer_id, 0.8::real, 'phone'
+        from public.members m, q
+        where length(q.digits) >= 4 and q.digits = q.id_q and reverse(m.phone::text) like reverse(q.digits) || '%'
+        union all
+        select m.customer_id, (similarity(lower(m.name), q.name_q) * 0.95)::real, 'name'
+        from public.members m, q
+        where lower(m.name) % q.name_q
+    ),
+    best as (
+        select distinct on (h.customer_id) h.customer_id, h.score, h.matched_on
+        from hits h
+        order by h.customer_id, h.score desc
+    )
+    select m.customer_id, m.name, m.kgid::text, m.phone::text, m.photo_url, m.status, b.score, b.matched_on
+    from best b
+    join public.members m on m.customer_id = b.customer_id
+    order by b.score desc, m.customer_id
+    limit greatest(1, least(p_limit, 50));
+$$;
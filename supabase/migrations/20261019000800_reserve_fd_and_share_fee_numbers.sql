@@ -0,0 +1,35 @@
+-- FDnnnn (fixed_deposits.system_fdid) and SFnnnn (share_fees.fee_id) from
+-- sequences, like reserve_loan_numbers. The record import reserves a whole
+-- block up front and single entries (new FD, FD renewal, share fee, record
+-- entry) draw from the same sequence, so an entry saved while an import runs
+-- can no longer take a number the import is about to write.
+
+create sequence if not exists public.fd_number_seq;
+
+select setval('public.fd_number_seq',
+              greatest(coalesce((select max(substring(system_fdid from 3)::bigint)
+                                   from public.fixed_deposits
+                                  where system_fdid ~ '^FD[0-9]+$'), 0), 1),
+              exists (select 1 from public.fixed_deposits where system_fdid ~ '^FD[0-9]+$'));
+
+create sequence if not exists public.share_fee_number_seq;
+
+select setval('public.share_fee_number_seq',
+              greatest(coalesce((select max(substring(fee_id from 3)::bigint)
+                                   from public.share_fees
+                                  where fee_id ~ '^SF[0-9]+$'), 0), 1),
+              exists (select 1 from public.share_fees where fee_id ~ '^SF[0-9]+$'));
+
+create or replace function public.reserve_fd_numbers(p_count integer)
+returns setof bigint
+language sql
+as $$
+    select nextval('public.fd_number_seq') from generate_series(1, greatest(p_count, 0));
+$$;
+
+create or replace function public.reserve_share_fee_numbers(p_count integer)
+returns setof bigint
+language sql
+as $$
+    select nextval('public.share_fee_number_seq') from generate_series(1, greatest(p_count, 0));
+$$;
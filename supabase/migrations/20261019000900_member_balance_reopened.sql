@@ -0,0 +1,10 @@
+-- Months whose balance snapshots were dropped by a back-dated transaction
+-- (app/finance/balance_snapshots.py reopen). The next `flask close-balances`
+-- rebuilds from the earliest of them and clears the rows it covered.
+
+create table if not exists public.member_balance_reopened (
+    id           bigserial primary key,
+    customer_id  text not null,
+    period_end   date not null,
+    reopened_at  timestamptz not null default now()
+);